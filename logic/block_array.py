@@ -0,0 +1,189 @@
+from typing import Iterator, Optional, TextIO
+
+import numpy as np
+
+from logic.streams import write_lines
+
+# Same edge pattern as print_block's sawtooth outline.
+WAVES_PER_EDGE = 5
+WAVE_AMPLITUDE = 0.5
+
+
+def block_outline(block_width: float, block_height: float, waveform: str,
+                  amplitude: float = WAVE_AMPLITUDE) -> np.ndarray:
+    """
+    Returns the outline points of one block relative to its start corner,
+    as an (n, 2) array of the G1 targets ``print_block`` draws.
+
+    The sawtooth outline has a tooth of ``amplitude`` at the middle of
+    each of the WAVES_PER_EDGE segments per edge, pointing out of the
+    block on the right and left edges and into it on the top and bottom
+    edges; any other waveform gives the plain rectangle.
+    """
+    if waveform != "sawtooth":
+        return np.array([[block_width, 0.0], [block_width, block_height],
+                         [0.0, block_height], [0.0, 0.0]])
+
+    n = WAVES_PER_EDGE
+    a = amplitude
+    step_x = block_width / n
+    step_y = block_height / n
+    i = np.arange(n)
+
+    def edge(along, across, tooth):
+        # Interleave the tooth tip and segment end of every wave.
+        points = np.empty((2 * n, 2))
+        points[0::2] = np.column_stack(tooth)
+        points[1::2] = np.column_stack((along, across))
+        return points
+
+    top = edge((i + 1) * step_x, np.zeros(n),
+               ((i + 0.5) * step_x, np.full(n, a)))
+    right = edge(np.full(n, block_width), (i + 1) * step_y,
+                 (np.full(n, block_width + a), (i + 0.5) * step_y))
+    j = i[::-1]
+    bottom = edge(j * step_x, np.full(n, block_height),
+                  ((j + 0.5) * step_x, np.full(n, block_height - a)))
+    left = edge(np.zeros(n), j * step_y,
+                (np.full(n, -a), (j + 0.5) * step_y))
+    return np.concatenate((
+        top, [[block_width, 0.0]],
+        right, [[block_width, block_height]],
+        bottom, [[0.0, block_height]],
+        left, [[0.0, 0.0]],
+    ))
+
+
+def block_array_origins(x_value: float, y_value: float, columns: int,
+                        rows: int, pitch_x: float, pitch_y: float
+                        ) -> np.ndarray:
+    """
+    Returns the start corner of every block in serpentine order: even rows
+    left to right, odd rows right to left.
+    """
+    col = np.tile(np.arange(columns), rows)
+    row = np.repeat(np.arange(rows), columns)
+    col = np.where(row % 2 == 1, columns - 1 - col, col)
+    return np.column_stack((x_value + col * pitch_x, y_value + row * pitch_y))
+
+
+def block_array_outlines(x_value: float, y_value: float, columns: int,
+                         rows: int, pitch_x: float, pitch_y: float,
+                         block_width: float, block_height: float,
+                         waveform: str,
+                         amplitude: float = WAVE_AMPLITUDE) -> np.ndarray:
+    """
+    Returns every block outline of an array as one (blocks, points, 2)
+    array, computed with a single broadcast of the outline template over
+    the serpentine-ordered block origins.
+    """
+    origins = block_array_origins(x_value, y_value, columns, rows,
+                                  pitch_x, pitch_y)
+    template = block_outline(block_width, block_height, waveform, amplitude)
+    return origins[:, None, :] + template[None, :, :]
+
+
+def iter_print_block_array(
+    x_value: float,
+    y_value: float,
+    columns: int,
+    rows: int,
+    pitch_x: float,
+    pitch_y: float,
+    z_value: float,
+    g0_xy_feed: str,
+    g1_xy_feed: str,
+    vertical_lift: float,
+    delay_time: Optional[float],
+    z_feed: int,
+    next_tool_angle: float,
+    a_feed: int,
+    waveform: str,
+    block_width: float = 10.0,
+    block_height: float = 10.0,
+    verbosity: str = "full",
+    amplitude: float = WAVE_AMPLITUDE,
+) -> Iterator[str]:
+    """
+    Yields an N x M array of blocks with the outlines of ``print_block``.
+
+    The A axis is rotated once and the tool is lifted once per block
+    travel, instead of the lift/rotate/approach sequence ``print_block``
+    writes for every block. Outlines are computed as one array and each
+    block is formatted with a single string operation.
+
+    :param x_value: start corner X of the first block
+    :param y_value: start corner Y of the first block
+    :param columns: blocks per row
+    :param rows: number of rows
+    :param pitch_x: distance between block start corners along X
+    :param pitch_y: distance between block start corners along Y
+    :param delay_time: dwell (G04 P) after each block, or None for none
+    :param verbosity: "none" leaves out the start/end markers
+    :param amplitude: sawtooth offset of the outline edges
+    :return: number of blocks, as the generator's return value
+    """
+    outlines = block_array_outlines(x_value, y_value, columns, rows, pitch_x,
+                                    pitch_y, block_width, block_height,
+                                    waveform, amplitude)
+    lift_z = z_value + vertical_lift
+
+    if verbosity != "none":
+        yield (f"; Print Block Array Start ({columns}x{rows}, "
+               f"{waveform} waveform)\n")
+    yield f"G1 Z{lift_z} F{z_feed}\n"
+    yield f"G1 A{next_tool_angle} F{a_feed}\n"
+
+    points = outlines.shape[1]
+    dwell = f"G04 P{delay_time}\n" if delay_time is not None else ""
+    block_format = (
+        f"G0 X%.3f Y%.3f F{g0_xy_feed}\n"
+        f"G1 Z{z_value:.3f} F{z_feed}\n"
+        f"G1 X%.3f Y%.3f F{g1_xy_feed}\n"
+        + "G1 X%.3f Y%.3f\n" * (points - 1)
+        + f"G1 Z{lift_z:.3f} F{z_feed}\n"
+        + dwell.replace("%", "%%")
+    )
+    # Each row holds the block origin followed by its outline points;
+    # every outline closes at its origin.
+    values = np.concatenate((outlines[:, -1:, :], outlines), axis=1)
+    rows_values = values.reshape(len(values), -1).tolist()
+    for block in rows_values:
+        yield block_format % tuple(block)
+
+    if verbosity != "none":
+        yield "; Print Block Array End\n"
+    return len(values)
+
+
+def print_block_array(
+    destination: TextIO,
+    x_value: float,
+    y_value: float,
+    columns: int,
+    rows: int,
+    pitch_x: float,
+    pitch_y: float,
+    z_value: float,
+    g0_xy_feed: str,
+    g1_xy_feed: str,
+    vertical_lift: float,
+    delay_time: Optional[float],
+    z_feed: int,
+    next_tool_angle: float,
+    a_feed: int,
+    waveform: str,
+    block_width: float = 10.0,
+    block_height: float = 10.0,
+    verbosity: str = "full",
+    amplitude: float = WAVE_AMPLITUDE,
+) -> int:
+    """
+    Writes the lines of ``iter_print_block_array`` to ``destination``;
+    returns the number of blocks written.
+    """
+    return write_lines(destination, iter_print_block_array(
+        x_value, y_value, columns, rows, pitch_x, pitch_y, z_value,
+        g0_xy_feed, g1_xy_feed, vertical_lift, delay_time, z_feed,
+        next_tool_angle, a_feed, waveform, block_width, block_height,
+        verbosity, amplitude))
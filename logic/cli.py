@@ -0,0 +1,483 @@
+"""
+Command-line entry point for the headless tools.
+
+Usage: ``python -m logic.cli <command> ...``; run with ``--help`` for the
+list of commands.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import List, Optional
+
+from logic.cycle_time import estimate_file, estimate_text, format_cycle_time
+from logic.gcode_diff import diff_files, format_difference
+from logic.io_utils import iter_mapped_lines, read_toolpath
+from logic.job import (Job, JobStep, iter_job_lines, load_job, run_job_file,
+                       save_job)
+from logic.motion import (MotionLimits, format_feed_report,
+                          plan_feeds_file)
+from logic.multi_tool import build_multi_tool_program, format_report
+from logic.operations import (OPERATIONS, VERBOSITY_LEVELS, iter_operation,
+                              operation_parameters, run_operation)
+from logic.postprocess import STAGES, build_pipeline, format_timings
+from logic.resample import format_resample_report, resample_file
+from logic.rotation import format_rotation_report, plan_rotations_file
+from logic.sender import (FLOW_CONTROLS, RX_BUFFER_SIZE, FakeController,
+                          format_stats, stream)
+from logic.stats import (format_program_stats, stats_file, stats_lines,
+                         write_stats_csv, write_stats_json)
+from logic.sweep import Sweep, format_sweep, load_sweep, run_sweep
+from logic.ultrasound import (format_ultrasound_report,
+                              schedule_ultrasound_file)
+from logic.validator import format_validation, load_profile, validate_file
+
+
+def cmd_diff(args: argparse.Namespace) -> int:
+    """Prints the layers whose geometry differs; exits 1 if any do."""
+    found = 0
+    for difference in diff_files(args.first, args.second,
+                                 tolerance=args.tolerance,
+                                 decimals=args.decimals):
+        found += 1
+        print(format_difference(difference))
+    if not found:
+        print("No geometric differences.")
+    return 1 if found else 0
+
+
+def cmd_estimate(args: argparse.Namespace) -> int:
+    """Estimates the cycle time of a program per layer and per operation."""
+    if (args.file is None) == (args.operation is None):
+        print("give either a file or --operation", file=sys.stderr)
+        return 2
+    if args.file is not None:
+        report = estimate_file(args.file, motion_limits(args),
+                               workers=args.workers)
+    else:
+        text = "".join(iter_operation(args.operation,
+                                      operation_parameters(args.operation),
+                                      args.waveform))
+        report = estimate_text(text, motion_limits(args))
+    print(format_cycle_time(report))
+    return 0
+
+
+def cmd_job_run(args: argparse.Namespace) -> int:
+    """Runs a job file into one output program."""
+    if args.multi_tool:
+        job = load_job(args.job)
+        if args.verbosity is not None:
+            job.verbosity = args.verbosity
+        with open(args.output, "w") as destination:
+            report = build_multi_tool_program(job, destination,
+                                              a_feed=args.a_feed)
+        print(format_report(report))
+        return 0
+    steps = run_job_file(args.job, args.output, workers=args.workers,
+                         verbosity=args.verbosity)
+    print(f"Wrote {steps} steps to {args.output}")
+    return 0
+
+
+def cmd_job_new(args: argparse.Namespace) -> int:
+    """Writes a job file listing operations with their default parameters."""
+    job = Job(name=args.name, verbosity=args.verbosity, steps=[
+        JobStep(operation, operation_parameters(operation), args.waveform,
+                args.tool)
+        for operation in args.operations])
+    save_job(job, args.output)
+    print(f"Wrote job with {len(job.steps)} steps to {args.output}")
+    return 0
+
+
+def cmd_postprocess(args: argparse.Namespace) -> int:
+    """Post-processes a file in one pass and prints per-stage timings."""
+    if args.config is not None:
+        with open(args.config, "r") as f:
+            config = json.load(f)
+    elif args.stage:
+        config = [{"stage": stage} for stage in args.stage]
+    else:
+        config = None
+    pipeline = build_pipeline(config)
+    pipeline.process_file(args.input, args.output)
+    print(format_timings(pipeline))
+    return 0
+
+
+def cmd_send(args: argparse.Namespace) -> int:
+    """Streams a G-code file or a job to a controller."""
+    if (args.file is None) == (args.job is None):
+        print("Give either a G-code file or --job", file=sys.stderr)
+        return 2
+    if args.job is not None:
+        lines = iter_job_lines(load_job(args.job))
+    else:
+        lines = iter_mapped_lines(args.file)
+    stats = asyncio.run(stream(args.endpoint, lines, flow=args.flow,
+                               buffer_size=args.buffer, baudrate=args.baud))
+    print(format_stats(stats))
+    for error in stats.errors[:10]:
+        print(error)
+    return 1 if stats.errors else 0
+
+
+def cmd_fake_controller(args: argparse.Namespace) -> int:
+    """Runs a fake controller until interrupted."""
+    controller = FakeController(buffer_size=args.buffer,
+                                line_time=args.line_time, record=False)
+
+    async def serve() -> None:
+        host, port = await controller.start(args.host, args.port)
+        print(f"Fake controller listening on {host}:{port}")
+        await controller.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def motion_limits(args: argparse.Namespace) -> MotionLimits:
+    """Builds MotionLimits from the --accel/--junction-deviation options."""
+    limits = MotionLimits(junction_deviation=args.junction_deviation,
+                          rapid_feed=args.rapid_feed)
+    if args.accel is not None:
+        limits.acceleration.update(x=args.accel, y=args.accel)
+    if args.z_accel is not None:
+        limits.acceleration["z"] = args.z_accel
+    if args.a_accel is not None:
+        limits.acceleration["a"] = args.a_accel
+    return limits
+
+
+def add_motion_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--accel", type=float,
+                        help="X/Y acceleration in mm/s^2")
+    parser.add_argument("--z-accel", type=float,
+                        help="Z acceleration in mm/s^2")
+    parser.add_argument("--a-accel", type=float,
+                        help="A acceleration in deg/s^2")
+    parser.add_argument("--junction-deviation", type=float,
+                        default=MotionLimits.junction_deviation)
+    parser.add_argument("--rapid-feed", type=float,
+                        default=MotionLimits.rapid_feed,
+                        help="G0 feed in mm/min")
+
+
+def cmd_plan_feeds(args: argparse.Namespace) -> int:
+    """Rewrites F words to the feeds the machine can hold."""
+    with open(args.output, "w") as destination:
+        report = plan_feeds_file(args.input, destination,
+                                 motion_limits(args), args.quantum)
+    print(format_feed_report(report))
+    return 0
+
+
+def cmd_rotations(args: argparse.Namespace) -> int:
+    """Merges and shortens the A-axis rotations of a file."""
+    with open(args.output, "w") as destination:
+        report = plan_rotations_file(args.input, destination,
+                                     continuous=not args.bounded)
+    print(format_rotation_report(report))
+    return 0
+
+
+def cmd_resample(args: argparse.Namespace) -> int:
+    """Keeps the feed segments of a file within the controller's rate."""
+    with open(args.output, "w") as destination:
+        report = resample_file(args.input, destination, args.max_rate,
+                               args.tolerance, args.feed,
+                               slow_down=not args.keep_feeds)
+    print(format_resample_report(report))
+    return 0
+
+
+def cmd_ultrasound(args: argparse.Namespace) -> int:
+    """Rewrites the ultrasound on/off calls and dwells of a file."""
+    with open(args.output, "w") as destination:
+        report = schedule_ultrasound_file(args.input, destination,
+                                          args.merge_gap)
+    print(format_ultrasound_report(report))
+    return 0
+
+
+def cmd_parse(args: argparse.Namespace) -> int:
+    """Parses a file, optionally across processes, and reports its size."""
+    started = time.perf_counter()
+    path = read_toolpath(args.file, workers=args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"{len(path)} lines, {int(path.is_move.sum())} moves parsed "
+          f"in {elapsed:.2f} s")
+    return 0
+
+
+def cmd_slice(args: argparse.Namespace) -> int:
+    """Slices a binary STL mesh into a layer-by-layer contour program."""
+    parameters = operation_parameters("slicer", stl_path=args.stl,
+                                      layer_thickness=args.layer_thickness)
+    with open(args.output, "w") as destination:
+        run_operation(destination, "slicer", parameters, args.waveform,
+                      args.verbosity)
+    print(f"Sliced {args.stl} into {args.output}")
+    return 0
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    """Reports per-layer lengths, calls, dwells and times of a program."""
+    if (args.file is None) == (args.operation is None):
+        print("give either a file or --operation", file=sys.stderr)
+        return 2
+    if args.file is not None:
+        stats = stats_file(args.file, motion_limits(args))
+    else:
+        lines = iter_operation(args.operation,
+                               operation_parameters(args.operation),
+                               args.waveform)
+        stats = stats_lines(lines, motion_limits(args))
+    for path, write in ((args.json, write_stats_json),
+                        (args.csv, write_stats_csv)):
+        if path is not None:
+            with open(path, "w", newline="") as destination:
+                write(stats, destination)
+    print(format_program_stats(stats))
+    return 0
+
+
+def parse_value(text: str):
+    """Reads a command-line value as JSON (numbers, true, null), else text."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def cmd_sweep(args: argparse.Namespace) -> int:
+    """Writes every variant of a parameter grid to a directory."""
+    if (args.sweep is None) == (args.operation is None):
+        print("give either a sweep file or --operation", file=sys.stderr)
+        return 2
+    if args.sweep is not None:
+        sweep = load_sweep(args.sweep)
+    else:
+        grid, parameters = {}, {}
+        for option, target, split in ((args.vary, grid, True),
+                                      (args.set, parameters, False)):
+            for item in option:
+                name, sep, text = item.partition("=")
+                if not sep:
+                    print(f"expected NAME=VALUE, got '{item}'", file=sys.stderr)
+                    return 2
+                target[name] = ([parse_value(v) for v in text.split(",")]
+                                if split else parse_value(text))
+        sweep = Sweep(args.operation, grid, parameters, args.waveform,
+                      args.verbosity)
+    started = time.perf_counter()
+    variants = run_sweep(sweep, args.output, workers=args.workers)
+    print(format_sweep(sweep, variants, time.perf_counter() - started))
+    return 0
+
+
+def cmd_validate(args: argparse.Namespace) -> int:
+    """Checks a file against a machine profile; exits 1 on any problem."""
+    report = validate_file(args.file, load_profile(args.profile))
+    print(format_validation(report))
+    return 0 if report.ok else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="simplified3d",
+                                     description="Simplified3D G-code tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    diff = commands.add_parser(
+        "diff", help="compare the geometry of two programs layer by layer")
+    diff.add_argument("first")
+    diff.add_argument("second")
+    diff.add_argument("--tolerance", type=float, default=0.001,
+                      help="ignore moves that differ by less (mm)")
+    diff.add_argument("--decimals", type=int, default=4,
+                      help="decimal places kept when normalizing numbers")
+    diff.set_defaults(func=cmd_diff)
+
+    estimate = commands.add_parser(
+        "estimate", help="cycle time per layer and per operation")
+    estimate.add_argument("file", nargs="?")
+    estimate.add_argument("--operation", choices=sorted(OPERATIONS),
+                          help="estimate a generator's output instead of a file")
+    estimate.add_argument("--waveform", default="sawtooth",
+                          choices=["sawtooth", "square"])
+    estimate.add_argument("--workers", type=int, default=None,
+                          help="parser processes (default: one per CPU)")
+    add_motion_options(estimate)
+    estimate.set_defaults(func=cmd_estimate)
+
+    job = commands.add_parser("job", help="build and run multi-operation jobs")
+    job_commands = job.add_subparsers(dest="job_command", required=True)
+    job_run = job_commands.add_parser("run", help="run a job file")
+    job_run.add_argument("job")
+    job_run.add_argument("-o", "--output", required=True)
+    job_run.add_argument("--workers", type=int, default=None,
+                         help="worker processes (default: one per CPU)")
+    job_run.add_argument("--multi-tool", action="store_true",
+                         help="group steps per tool and skip no-op A moves")
+    job_run.add_argument("--a-feed", type=float, default=800,
+                         help="A-axis feed for tool rotations (deg/min)")
+    job_run.add_argument("--verbosity", choices=VERBOSITY_LEVELS,
+                         help="override the job's comment level")
+    job_run.set_defaults(func=cmd_job_run)
+    job_new = job_commands.add_parser(
+        "new", help="create a job file from default parameters")
+    job_new.add_argument("operations", nargs="+", choices=sorted(OPERATIONS))
+    job_new.add_argument("-o", "--output", required=True)
+    job_new.add_argument("--name", default="")
+    job_new.add_argument("--waveform", default="sawtooth",
+                         choices=["sawtooth", "square"])
+    job_new.add_argument("--tool", choices=[f"T{i}" for i in range(10)],
+                         help="tool assigned to every step")
+    job_new.add_argument("--verbosity", choices=VERBOSITY_LEVELS,
+                         default="full",
+                         help="comments: none, structure (markers) or full")
+    job_new.set_defaults(func=cmd_job_new)
+
+    post = commands.add_parser(
+        "postprocess", help="run the post-processing stages over a file")
+    post.add_argument("input")
+    post.add_argument("-o", "--output", required=True)
+    post.add_argument("--config", help="JSON list of stages with options")
+    post.add_argument("--stage", action="append", choices=sorted(STAGES),
+                      help="stage with default options; repeat in order")
+    post.set_defaults(func=cmd_postprocess)
+
+    send = commands.add_parser(
+        "send", help="stream a G-code file or job to a controller")
+    send.add_argument("endpoint",
+                      help="host:port for TCP, otherwise a serial device")
+    send.add_argument("file", nargs="?")
+    send.add_argument("--job", help="stream a job file instead of a file")
+    send.add_argument("--flow", choices=FLOW_CONTROLS, default="count",
+                      help="ok: wait for every ok; count: character counting")
+    send.add_argument("--buffer", type=int, default=RX_BUFFER_SIZE,
+                      help="controller receive buffer size (bytes)")
+    send.add_argument("--baud", type=int, default=115200)
+    send.set_defaults(func=cmd_send)
+
+    fake = commands.add_parser(
+        "fake-controller", help="run a local stand-in controller on TCP")
+    fake.add_argument("--host", default="127.0.0.1")
+    fake.add_argument("--port", type=int, default=2323)
+    fake.add_argument("--buffer", type=int, default=RX_BUFFER_SIZE)
+    fake.add_argument("--line-time", type=float, default=0.0,
+                      help="seconds each line takes to execute")
+    fake.set_defaults(func=cmd_fake_controller)
+
+    plan = commands.add_parser(
+        "plan-feeds", help="rewrite feeds to what acceleration allows")
+    plan.add_argument("input")
+    plan.add_argument("-o", "--output", required=True)
+    plan.add_argument("--quantum", type=float, default=10.0,
+                      help="round feeds down to multiples of this (mm/min)")
+    add_motion_options(plan)
+    plan.set_defaults(func=cmd_plan_feeds)
+
+    rotations = commands.add_parser(
+        "rotations", help="merge A moves and rotate the short way round")
+    rotations.add_argument("input")
+    rotations.add_argument("-o", "--output", required=True)
+    rotations.add_argument("--bounded", action="store_true",
+                           help="A axis has end stops; keep angles as given")
+    rotations.set_defaults(func=cmd_rotations)
+
+    resample = commands.add_parser(
+        "resample", help="merge or slow short segments to a segment rate")
+    resample.add_argument("input")
+    resample.add_argument("-o", "--output", required=True)
+    resample.add_argument("--max-rate", type=float, required=True,
+                          help="segments per second the controller plans")
+    resample.add_argument("--tolerance", type=float, default=0.02,
+                          help="largest path deviation of a dropped point (mm)")
+    resample.add_argument("--feed", type=float,
+                          help="feed the moves run at if not their F (mm/min)")
+    resample.add_argument("--keep-feeds", action="store_true",
+                          help="do not lower the feed of segments that "
+                               "stay too short")
+    resample.set_defaults(func=cmd_resample)
+
+    ultrasound = commands.add_parser(
+        "ultrasound", help="switch the transducer only at deposit transitions")
+    ultrasound.add_argument("input")
+    ultrasound.add_argument("-o", "--output", required=True)
+    ultrasound.add_argument("--merge-gap", type=float, default=0.0,
+                            help="keep ultrasound on across travel up to "
+                                 "this length (mm)")
+    ultrasound.set_defaults(func=cmd_ultrasound)
+
+    parse = commands.add_parser(
+        "parse", help="parse a file and report its lines and moves")
+    parse.add_argument("file")
+    parse.add_argument("--workers", type=int, default=None,
+                       help="parser processes (default: one per CPU)")
+    parse.set_defaults(func=cmd_parse)
+
+    slice_parser = commands.add_parser(
+        "slice", help="slice a binary STL mesh into layer contours")
+    slice_parser.add_argument("stl")
+    slice_parser.add_argument("-o", "--output", required=True)
+    slice_parser.add_argument("--layer-thickness", type=float, default=0.3)
+    slice_parser.add_argument("--waveform", default="sawtooth",
+                              choices=["sawtooth", "square"])
+    slice_parser.add_argument("--verbosity", choices=VERBOSITY_LEVELS,
+                              default="full")
+    slice_parser.set_defaults(func=cmd_slice)
+
+    stats = commands.add_parser(
+        "stats", help="per-layer lengths, ultrasound calls, dwells and times")
+    stats.add_argument("file", nargs="?")
+    stats.add_argument("--operation", choices=sorted(OPERATIONS),
+                       help="report on a generator's output instead of a file")
+    stats.add_argument("--waveform", default="sawtooth",
+                       choices=["sawtooth", "square"])
+    stats.add_argument("--json", help="also write the report as JSON")
+    stats.add_argument("--csv", help="also write the report as CSV")
+    add_motion_options(stats)
+    stats.set_defaults(func=cmd_stats)
+
+    sweep = commands.add_parser(
+        "sweep", help="generate every variant of a parameter grid")
+    sweep.add_argument("sweep", nargs="?", help="JSON sweep file")
+    sweep.add_argument("-o", "--output", required=True,
+                       help="directory for the programs and index.json")
+    sweep.add_argument("--operation", choices=sorted(OPERATIONS),
+                       help="sweep this operation instead of a file")
+    sweep.add_argument("--vary", action="append", default=[],
+                       metavar="NAME=V1,V2", help="values of one grid axis")
+    sweep.add_argument("--set", action="append", default=[],
+                       metavar="NAME=VALUE", help="fixed parameter")
+    sweep.add_argument("--waveform", default="sawtooth",
+                       choices=["sawtooth", "square"])
+    sweep.add_argument("--verbosity", choices=VERBOSITY_LEVELS,
+                       default="full")
+    sweep.add_argument("--workers", type=int, default=None,
+                       help="processes (default: one per CPU)")
+    sweep.set_defaults(func=cmd_sweep)
+
+    validate = commands.add_parser(
+        "validate", help="check a program against machine limits")
+    validate.add_argument("file")
+    validate.add_argument("--profile",
+                          help="JSON machine profile (default limits if omitted)")
+    validate.set_defaults(func=cmd_validate)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
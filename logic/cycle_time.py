@@ -0,0 +1,232 @@
+"""
+Cycle-time estimates for quoting jobs without running them.
+
+The toolpath is planned once with ``logic.motion.plan_motion``: feeds,
+per-axis acceleration and junction speeds shape a trapezoidal speed
+profile for every move, A rotations included. G4 dwells are added on
+top. Every line is then given a layer, from
+``logic.layer_index.find_layer_starts`` like the layer index and
+``logic.stats``, and an operation, from the ``; <Operation> Start`` and
+``End`` comments the generators write. The times are summed per layer
+and per operation with ``np.bincount``, so a program of millions of
+moves takes a few array passes.
+"""
+import mmap
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from logic.io_utils import build_line_index, line_index, mapped_file, read_toolpath
+from logic.layer_index import find_layer_starts, layer_of_rows, marker_rows
+from logic.motion import MotionLimits, plan_motion
+from logic.toolpath import Toolpath, parse_bytes, resolve_modal
+
+# Start/end comment label of each generator -> operation name.
+OPERATION_LABELS = {
+    "Print Block Array": "print_block_array",
+    "Print Block": "print_block",
+    "Clean No Tool Block": "clean_no_tool_block",
+    "Clean Block": "clean_block",
+    "Print Cylinder": "print_cylinder",
+    "Print Layer0": "print_layer0",
+    "Print ZigZag": "print_zigzag",
+    "Rotate": "rotate",
+    "Slicer": "slicer",
+}
+# Lines outside every operation's markers.
+OTHER = "other"
+
+OPERATION_MARKER_RE = re.compile(
+    rb"(?m)^[ \t]*;[ \t]*(" + b"|".join(
+        re.escape(label.encode()) for label in OPERATION_LABELS)
+    + rb") (Start|End)\b")
+
+
+@dataclass
+class TimeShare:
+    """
+    Estimated time of one part of a program, in seconds. Rotation time
+    is that of moves that turn the A axis; travel time that of the other
+    G0 moves and feed time that of the other G1/G2/G3 moves.
+    """
+    label: str
+    moves: int = 0
+    travel_time: float = 0.0
+    feed_time: float = 0.0
+    rotation_time: float = 0.0
+    dwell_time: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return (self.travel_time + self.feed_time + self.rotation_time
+                + self.dwell_time)
+
+
+@dataclass
+class CycleTimeReport:
+    """
+    The estimated time of a program, per layer and per operation.
+    ``operation_markers`` is False when the program has no operation
+    start/end comments (generated with verbosity "none"), so no
+    per-operation breakdown could be made.
+    """
+    total: TimeShare = field(default_factory=lambda: TimeShare("total"))
+    layers: List[TimeShare] = field(default_factory=list)
+    operations: List[TimeShare] = field(default_factory=list)
+    operation_markers: bool = True
+
+
+def operation_rows(data: Union[bytes, mmap.mmap], lines: np.ndarray,
+                   rows: int) -> Tuple[np.ndarray, List[str]]:
+    """
+    Returns ``(codes, names)``: the index into ``names`` of the operation
+    each of ``rows`` lines belongs to, from the generators' start and end
+    comments. Lines outside them belong to ``other`` (code 0).
+
+    :param lines: line index of ``data`` (see ``build_line_index``)
+    """
+    names = [OTHER] + sorted(set(OPERATION_LABELS.values()))
+    # Code each line switches to, -1 where the line keeps the current one.
+    events = np.full(rows, -1, dtype=np.int64)
+    for match in OPERATION_MARKER_RE.finditer(data):
+        row = int(np.searchsorted(lines, match.start(), side="right")) - 1
+        if row >= rows:
+            break
+        events[row] = names.index(OPERATION_LABELS[match.group(1).decode()])
+        # The end marker is the operation's last line.
+        if match.group(2) == b"End" and row + 1 < rows:
+            events[row + 1] = 0
+    last = np.maximum.accumulate(np.where(events >= 0, np.arange(rows), -1))
+    codes = np.zeros(rows, dtype=np.int64)
+    known = last >= 0
+    codes[known] = events[last[known]]
+    return codes, names
+
+
+def _shares(labels: List[str], index: np.ndarray, size: int,
+            times: dict) -> List[TimeShare]:
+    sums = {name: np.bincount(index, weights, size)
+            for name, weights in times.items()}
+    return [TimeShare(label, int(round(sums["moves"][i])),
+                      *(float(sums[name][i]) for name in
+                        ("travel_time", "feed_time", "rotation_time",
+                         "dwell_time")))
+            for i, label in enumerate(labels)]
+
+
+def estimate_cycle_time(path: Toolpath, limits: Optional[MotionLimits] = None,
+                        operations: Optional[np.ndarray] = None,
+                        names: Optional[List[str]] = None,
+                        markers: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                        ) -> CycleTimeReport:
+    """
+    Estimates how long a resolved toolpath runs.
+
+    :param operations: operation code of every line, as returned by
+        ``operation_rows``; the operation breakdown is empty without it,
+        and when no line belongs to an operation
+    :param names: operation names of the codes
+    :param markers: layer markers of the program, as returned by
+        ``marker_rows``; layers follow Z changes alone without them
+    """
+    plan = plan_motion(path, limits)
+    n = len(path)
+    rows = plan.rows
+    # Each line holds the position after it, so a move starts where the
+    # line before it ended (A0 before the first line).
+    turning = path.a[rows] != np.where(
+        rows > 0, path.a[np.maximum(rows - 1, 0)], 0.0)
+    times = {name: np.zeros(n) for name in
+             ("moves", "travel_time", "feed_time", "rotation_time",
+              "dwell_time")}
+    times["moves"][rows] = 1.0
+    times["rotation_time"][rows] = np.where(turning, plan.time, 0.0)
+    times["travel_time"][rows] = np.where(~turning & plan.travel,
+                                          plan.time, 0.0)
+    times["feed_time"][rows] = np.where(~turning & ~plan.travel,
+                                        plan.time, 0.0)
+    columns = path.columns
+    times["dwell_time"] = np.where(columns.g4,
+                                   np.nan_to_num(columns.p) / 1000.0, 0.0)
+
+    report = CycleTimeReport()
+    report.total = _shares(["total"], np.zeros(n, dtype=np.int64), 1,
+                           times)[0]
+    if markers is None:
+        markers = (np.empty(0, dtype=np.int64), np.empty(0))
+    starts, heights, _ = find_layer_starts(path, markers)
+    heights = [0.0] + heights.tolist()
+    report.layers = _shares([f"{i} (Z{z:.3f})" for i, z in enumerate(heights)],
+                            layer_of_rows(starts, n), len(heights), times)
+    if report.layers and report.layers[0].total == 0.0:
+        del report.layers[0]
+    if operations is not None and names is not None and not operations.any():
+        report.operation_markers = False
+    elif operations is not None and names is not None:
+        shares = _shares(names, operations, len(names), times)
+        report.operations = [share for share in shares
+                             if share.moves or share.dwell_time]
+    return report
+
+
+def estimate_bytes(data: Union[bytes, mmap.mmap],
+                   limits: Optional[MotionLimits] = None) -> CycleTimeReport:
+    """Estimates the cycle time of a program held in a buffer or an mmap."""
+    path = resolve_modal(parse_bytes(data))
+    lines = build_line_index(data)
+    codes, names = operation_rows(data, lines, len(path))
+    return estimate_cycle_time(path, limits, codes, names,
+                               marker_rows(data, lines))
+
+
+def estimate_text(text: str, limits: Optional[MotionLimits] = None
+                  ) -> CycleTimeReport:
+    """Estimates the cycle time of G-code held in a string."""
+    return estimate_bytes(text.encode("ascii", "replace"), limits)
+
+
+def estimate_file(path: str, limits: Optional[MotionLimits] = None,
+                  workers: Optional[int] = 1) -> CycleTimeReport:
+    """
+    Estimates the cycle time of a G-code file through a memory map.
+
+    :param workers: processes used to parse; see ``parse_file_parallel``
+    """
+    toolpath = read_toolpath(path, workers=workers)
+    lines = line_index(path)
+    with mapped_file(path) as data:
+        codes, names = operation_rows(data, lines, len(toolpath))
+        markers = marker_rows(data, lines)
+    return estimate_cycle_time(toolpath, limits, codes, names, markers)
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60.0)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours}:{minutes:02d}:{seconds:05.2f}"
+
+
+def format_cycle_time(report: CycleTimeReport) -> str:
+    """Formats a CycleTimeReport as tables for the results pane or the CLI."""
+    header = (f"{'':<22} {'moves':>8} {'travel s':>9} {'feed s':>9} "
+              f"{'rotate s':>9} {'dwell s':>9} {'total':>12}")
+
+    def row(share: TimeShare) -> str:
+        return (f"{share.label:<22} {share.moves:8d} "
+                f"{share.travel_time:9.1f} {share.feed_time:9.1f} "
+                f"{share.rotation_time:9.1f} {share.dwell_time:9.1f} "
+                f"{_format_seconds(share.total):>12}")
+
+    out = [f"Estimated cycle time: {_format_seconds(report.total.total)}",
+           "", header, row(report.total)]
+    if report.operations:
+        out += ["", "Per operation", header]
+        out += [row(share) for share in report.operations]
+    elif not report.operation_markers:
+        out += ["", "Per operation: unavailable, the program has no "
+                "operation start/end comments (verbosity \"none\")"]
+    out += ["", "Per layer", header]
+    out += [row(share) for share in report.layers]
+    return "\n".join(out)
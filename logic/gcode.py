@@ -0,0 +1,25 @@
+import re
+
+M3_RE = re.compile(r'^\s*M3(\s*;.*)?$')
+M5_RE = re.compile(r'^\s*M5(\s*;.*)?$')
+
+
+def m3_m5_line(line: str) -> str:
+    """
+    Replaces an M3 line with M98 P"us.g" and comments out an M5 line;
+    other lines are returned unchanged.
+    """
+    if "M" not in line:
+        return line
+    if M3_RE.match(line):
+        return 'M98 P"us.g"'
+    if M5_RE.match(line):
+        return ';M5'
+    return line
+
+
+def replace_m3_m5(gcode: str) -> str:
+    """
+    Replaces M3 with M98 P"us.g" and comments out M5 lines in the G-code string.
+    """
+    return "\n".join(m3_m5_line(line) for line in gcode.splitlines())
@@ -0,0 +1,237 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from logic import layer_index
+from logic.toolpath import MM_PER_INCH, parse_line
+
+# The marker pattern of the layer index, matched one line at a time.
+LAYER_MARKER_RE = re.compile(layer_index.LAYER_MARKER_RE.pattern.decode())
+MAX_REPORTED_LINES = 20
+
+
+@dataclass
+class DiffLayer:
+    """One layer of a program reduced to what ``diff_programs`` compares."""
+    number: int
+    first_line: int
+    digest: bytes
+    lines: np.ndarray
+    points: np.ndarray
+
+
+@dataclass
+class LayerDifference:
+    """
+    Geometric difference between the same layer of two programs.
+
+    ``max_deviation`` is the largest per-axis distance between matching
+    moves; ``lines_a``/``lines_b`` list (up to MAX_REPORTED_LINES) source
+    lines of moves that moved by more than the tolerance.
+    """
+    number: int
+    first_line_a: Optional[int]
+    first_line_b: Optional[int]
+    moves_a: int
+    moves_b: int
+    max_deviation: float
+    lines_a: List[int] = field(default_factory=list)
+    lines_b: List[int] = field(default_factory=list)
+
+
+def _format_number(value: float, decimals: int) -> str:
+    text = f"{value:.{decimals}f}".rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def iter_diff_layers(lines: Iterable[str], decimals: int = 4
+                     ) -> Iterator[DiffLayer]:
+    """
+    Splits a program into normalized layers in one streaming pass.
+
+    Each line is reduced to its words with numbers rounded to ``decimals``
+    places, G-codes and feeds that repeat the modal value dropped, and
+    comments removed. The normalized text is hashed per layer and the
+    absolute X/Y/Z/A machine position after every move is kept for the
+    geometric comparison; as in ``resolve_modal``, G92 shifts the
+    coordinates of the moves after it and does not move the position.
+    Moves that do not change the position are ignored.
+
+    Layers follow the rule of ``find_layer_starts``: every ``; Layer N at
+    Z`` marker starts one, and before the first marker a layer starts at
+    the line that changed Z when the next print move runs at a new Z.
+    Lines after a Z change are held until that print move places them,
+    so only they and one layer are in memory at a time. Anything before
+    the first layer is reported as layer 0.
+    """
+    position = {"X": 0.0, "Y": 0.0, "Z": 0.0, "A": 0.0}
+    offset = dict.fromkeys(position, 0.0)
+    motion: Optional[float] = None
+    feed: Optional[float] = None
+    relative = inches = False
+    markers = False
+    print_z: Optional[float] = None
+
+    number = 0
+    first_line = 1
+    digest = hashlib.blake2b(digest_size=16)
+    move_lines: List[int] = []
+    points: List[Tuple[float, ...]] = []
+    # Lines from the last Z change on, until a print move places them.
+    pending: List[Tuple[int, bytes, Optional[Tuple[float, ...]]]] = []
+
+    def add(line_no: int, text: bytes,
+            point: Optional[Tuple[float, ...]]) -> None:
+        if point is not None:
+            move_lines.append(line_no)
+            points.append(point)
+        digest.update(text)
+
+    def finish() -> DiffLayer:
+        return DiffLayer(number, first_line, digest.digest(),
+                         np.array(move_lines, dtype=np.int64),
+                         np.array(points, dtype=np.float64).reshape(-1, 4))
+
+    for line_no, line in enumerate(lines, 1):
+        marker = LAYER_MARKER_RE.match(line) is not None
+        words = parse_line(line)
+        is_g92 = ("G", 92.0) in words
+
+        normalized = []
+        target = dict(position)
+        for letter, value in words:
+            if letter == "G":
+                if value in (0.0, 1.0, 2.0, 3.0):
+                    if value == motion:
+                        continue
+                    motion = value
+                elif value in (90.0, 91.0):
+                    relative = value == 91.0
+                elif value in (20.0, 21.0):
+                    inches = value == 20.0
+            elif letter in target:
+                if inches and letter != "A":
+                    value *= MM_PER_INCH
+                if is_g92:
+                    offset[letter] = position[letter] - value
+                else:
+                    value += position[letter] if relative else offset[letter]
+                    target[letter] = value
+            elif letter == "F":
+                if inches:
+                    value *= MM_PER_INCH
+                if value == feed:
+                    continue
+                feed = value
+            normalized.append(letter + _format_number(value, decimals))
+
+        text = " ".join(normalized).encode() + b"\n" if normalized else b""
+        point = None
+        printing = z_change = False
+        if target != position:
+            point = (target["X"], target["Y"], target["Z"], target["A"])
+            printing = (motion not in (None, 0.0)
+                        and (target["X"], target["Y"])
+                        != (position["X"], position["Y"]))
+            z_change = target["Z"] != position["Z"]
+            position = target
+
+        markers = markers or marker
+        if z_change and not markers or marker:
+            # Only the last Z change before a print can start its layer.
+            for held in pending:
+                add(*held)
+            pending = []
+        new_layer = marker or (not markers and printing
+                               and target["Z"] != print_z)
+        if printing:
+            print_z = target["Z"]
+        if new_layer:
+            yield finish()
+            number += 1
+            first_line = pending[0][0] if pending else line_no
+            digest = hashlib.blake2b(digest_size=16)
+            move_lines, points = [], []
+        if new_layer or printing:
+            for held in pending:
+                add(*held)
+            pending = []
+        if pending or z_change and not markers:
+            pending.append((line_no, text, point))
+        else:
+            add(line_no, text, point)
+
+    for held in pending:
+        add(*held)
+    yield finish()
+
+
+def compare_layers(a: Optional[DiffLayer], b: Optional[DiffLayer],
+                   tolerance: float) -> Optional[LayerDifference]:
+    """
+    Compares one layer of two programs move by move.
+
+    Returns None when the normalized layers hash the same, or when every
+    move is within ``tolerance`` and both layers have the same number of
+    moves.
+    """
+    if a is not None and b is not None and a.digest == b.digest:
+        return None
+    points_a = a.points if a is not None else np.empty((0, 4))
+    points_b = b.points if b is not None else np.empty((0, 4))
+    common = min(len(points_a), len(points_b))
+    deviation = np.abs(points_a[:common] - points_b[:common]).max(axis=1,
+                                                               initial=0.0)
+    moved = np.flatnonzero(deviation > tolerance)
+    if len(moved) == 0 and len(points_a) == len(points_b):
+        return None
+
+    extra_a = np.arange(common, len(points_a))
+    extra_b = np.arange(common, len(points_b))
+    lines_a = a.lines[np.concatenate((moved, extra_a))] if a is not None else []
+    lines_b = b.lines[np.concatenate((moved, extra_b))] if b is not None else []
+    return LayerDifference(
+        number=(a or b).number,
+        first_line_a=a.first_line if a is not None else None,
+        first_line_b=b.first_line if b is not None else None,
+        moves_a=len(points_a),
+        moves_b=len(points_b),
+        max_deviation=float(deviation.max(initial=0.0)),
+        lines_a=[int(n) for n in lines_a[:MAX_REPORTED_LINES]],
+        lines_b=[int(n) for n in lines_b[:MAX_REPORTED_LINES]],
+    )
+
+
+def diff_programs(lines_a: Iterable[str], lines_b: Iterable[str],
+                  tolerance: float = 0.001,
+                  decimals: int = 4) -> Iterator[LayerDifference]:
+    """
+    Streams the layers of two programs side by side and yields the
+    layers whose geometry differs by more than ``tolerance`` mm.
+    """
+    for a, b in zip_longest(iter_diff_layers(lines_a, decimals),
+                            iter_diff_layers(lines_b, decimals)):
+        difference = compare_layers(a, b, tolerance)
+        if difference is not None:
+            yield difference
+
+
+def diff_files(path_a: str, path_b: str, tolerance: float = 0.001,
+               decimals: int = 4) -> Iterator[LayerDifference]:
+    """File version of ``diff_programs``; both files are read lazily."""
+    with open(path_a, "r") as a, open(path_b, "r") as b:
+        yield from diff_programs(a, b, tolerance, decimals)
+
+
+def format_difference(difference: LayerDifference) -> str:
+    """Formats a layer difference as a one-line report."""
+    text = (f"Layer {difference.number}: {difference.moves_a} vs "
+            f"{difference.moves_b} moves, max deviation "
+            f"{difference.max_deviation:.4f} mm")
+    if difference.lines_a or difference.lines_b:
+        text += (f" (lines {difference.lines_a} vs {difference.lines_b})")
+    return text
@@ -0,0 +1,164 @@
+import mmap
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from logic.parallel_parse import parse_file_parallel
+from logic.toolpath import Toolpath, parse_bytes, resolve_modal
+
+CHUNK_SIZE = 64 * 1024 * 1024
+
+# Files whose artifacts are kept; the least recently used is dropped.
+FILE_CACHE_SIZE = 4
+
+# realpath -> ((size, mtime_ns), {artifact name: artifact}), oldest first
+_file_cache: "OrderedDict[str, Tuple[Tuple[int, int], dict]]" = OrderedDict()
+
+
+def file_cache(path: str) -> dict:
+    """
+    Returns the artifact cache for a file (line index, toolpath, ...).
+
+    The cache is dropped automatically when the file's size or
+    modification time changes. Only the ``FILE_CACHE_SIZE`` most recently
+    used files are cached, since a toolpath holds tens of bytes per line.
+    """
+    real = os.path.realpath(path)
+    stat = os.stat(real)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    entry = _file_cache.pop(real, None)
+    if entry is None or entry[0] != signature:
+        entry = (signature, {})
+    _file_cache[real] = entry
+    while len(_file_cache) > FILE_CACHE_SIZE:
+        _file_cache.popitem(last=False)
+    return entry[1]
+
+
+def forget_file(path: str) -> None:
+    """Drops the cached artifacts of a file after it was edited in place."""
+    _file_cache.pop(os.path.realpath(path), None)
+
+
+def open_mapped(path: str) -> Union[mmap.mmap, bytes]:
+    """
+    Maps a file read-only into memory. Empty files return ``b""``
+    because they cannot be mapped.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextmanager
+def mapped_file(path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    """Maps a file like ``open_mapped`` and closes the mapping on exit."""
+    data = open_mapped(path)
+    try:
+        yield data
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def build_line_index(data: Union[bytes, mmap.mmap]) -> np.ndarray:
+    """
+    Returns the byte offset of the start of every line, followed by the
+    total length, so line ``i`` (0-based) spans
+    ``data[index[i]:index[i + 1]]``.
+    """
+    size = len(data)
+    starts = [np.zeros(1, dtype=np.int64)]
+    for lo in range(0, size, CHUNK_SIZE):
+        chunk = np.frombuffer(data, dtype=np.uint8,
+                              count=min(CHUNK_SIZE, size - lo), offset=lo)
+        starts.append(np.flatnonzero(chunk == 10).astype(np.int64) + lo + 1)
+    index = np.concatenate(starts)
+    if index[-1] != size:
+        index = np.append(index, size)
+    return index
+
+
+def line_index(path: str) -> np.ndarray:
+    """Returns the cached line index of a file (see ``build_line_index``)."""
+    cache = file_cache(path)
+    if "line_index" not in cache:
+        with mapped_file(path) as data:
+            cache["line_index"] = build_line_index(data)
+    return cache["line_index"]
+
+
+def iter_mapped_lines(path: str) -> Iterator[bytes]:
+    """
+    Yields the lines of a file as bytes, including their line endings,
+    straight from a memory map so large programs are never read whole.
+    """
+    index = line_index(path)
+    with mapped_file(path) as data:
+        for start, end in zip(index[:-1].tolist(), index[1:].tolist()):
+            yield data[start:end]
+
+
+def count_lines(data: Union[bytes, mmap.mmap]) -> int:
+    """Counts the lines of a buffer in CHUNK_SIZE slices."""
+    size = len(data)
+    count = sum(data[lo:lo + CHUNK_SIZE].count(b"\n")
+                for lo in range(0, size, CHUNK_SIZE))
+    if size and data[size - 1:size] != b"\n":
+        count += 1
+    return count
+
+
+def count_file_lines(path: str) -> int:
+    """Counts the lines of a file through a memory map."""
+    with mapped_file(path) as data:
+        return count_lines(data)
+
+
+def read_head_tail(path: str, head_lines: int,
+                   tail_lines: int) -> Tuple[str, Optional[str], int]:
+    """
+    Reads the first ``head_lines`` and last ``tail_lines`` lines of a file
+    without reading the lines in between, so the memory used does not
+    depend on the file size.
+
+    :return: ``(head, tail, total_lines)``; ``tail`` is None and ``head``
+        the whole file when it has no more than ``head_lines + tail_lines``
+        lines
+    """
+    with mapped_file(path) as data:
+        total = count_lines(data)
+        if total <= head_lines + tail_lines:
+            return bytes(data).decode("ascii", "replace"), None, total
+        end = 0
+        for _ in range(head_lines):
+            end = data.find(b"\n", end) + 1
+        start = len(data)
+        if data[start - 1:start] == b"\n":
+            start -= 1
+        for _ in range(tail_lines):
+            start = data.rfind(b"\n", 0, start)
+        head = data[:end].decode("ascii", "replace")
+        tail = data[start + 1:].decode("ascii", "replace")
+        return head, tail, total
+
+
+def read_toolpath(path: str, workers: Optional[int] = 1) -> Toolpath:
+    """
+    Parses and resolves a G-code file, caching the result.
+
+    :param workers: processes used to parse; see ``parse_file_parallel``
+    """
+    cache = file_cache(path)
+    if "toolpath" not in cache:
+        if workers == 1:
+            with mapped_file(path) as data:
+                columns = parse_bytes(data)
+        else:
+            columns = parse_file_parallel(path, workers)
+        cache["toolpath"] = resolve_modal(columns)
+    return cache["toolpath"]
@@ -0,0 +1,146 @@
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from logic.operations import (VERBOSITY_LEVELS, operation_parameters,
+                              run_operation)
+from logic.postprocess import Pipeline, build_pipeline
+
+
+@dataclass
+class JobStep:
+    """
+    One operation of a job; missing parameters take the defaults.
+    ``tool`` (T0-T9) is only used by the multi-tool builder.
+    """
+    operation: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    waveform: str = "sawtooth"
+    tool: Optional[str] = None
+
+
+@dataclass
+class Job:
+    """
+    An ordered list of operations that make up one program, generated
+    with one comment ``verbosity`` (see VERBOSITY_LEVELS).
+    """
+    steps: List[JobStep] = field(default_factory=list)
+    name: str = ""
+    verbosity: str = "full"
+
+
+def job_from_dict(data: Dict[str, Any]) -> Job:
+    """Builds a job from its JSON form, validating every step."""
+    steps = []
+    for raw in data.get("steps", []):
+        step = JobStep(operation=raw["operation"],
+                       parameters=dict(raw.get("parameters", {})),
+                       waveform=raw.get("waveform", "sawtooth"),
+                       tool=raw.get("tool"))
+        operation_parameters(step.operation, **step.parameters)
+        steps.append(step)
+    verbosity = data.get("verbosity", "full")
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity '{verbosity}'")
+    return Job(steps=steps, name=data.get("name", ""), verbosity=verbosity)
+
+
+def load_job(path: str) -> Job:
+    """Reads a job from a JSON file."""
+    with open(path, "r") as f:
+        return job_from_dict(json.load(f))
+
+
+def save_job(job: Job, path: str) -> None:
+    """Writes a job to a JSON file."""
+    with open(path, "w") as f:
+        json.dump(asdict(job), f, indent=2)
+
+
+def render_step(step: JobStep, index: int = 0,
+                verbosity: str = "full") -> str:
+    """
+    Generates the G-code of one job step, preceded by a step comment
+    unless ``verbosity`` is "none", and ending with a newline. The text
+    is not post-processed; ``post_process`` does that for the program.
+    """
+    buffer = io.StringIO()
+    if verbosity != "none":
+        buffer.write(f"; Step {index + 1}: {step.operation} ({step.waveform})\n")
+    run_operation(buffer, step.operation,
+                  operation_parameters(step.operation, **step.parameters),
+                  step.waveform, verbosity)
+    text = buffer.getvalue()
+    return text if text.endswith("\n") else text + "\n"
+
+
+def post_process(texts: Iterable[str],
+                 pipeline: Optional[Pipeline] = None) -> Iterator[str]:
+    """
+    Runs generated texts through a post-processing pipeline as one
+    program and yields its lines with newlines.
+
+    :param pipeline: the configured pipeline; the default one (M3/M5 to
+        ultrasound macros) when omitted
+    """
+    pipeline = pipeline if pipeline is not None else build_pipeline()
+    lines = (line for text in texts for line in text.splitlines())
+    for line in pipeline.process(lines):
+        yield line + "\n"
+
+
+def run_job(job: Job, destination: TextIO, workers: Optional[int] = None,
+            pipeline: Optional[Pipeline] = None) -> int:
+    """
+    Generates every step of a job and writes them to one stream in order,
+    post-processed by ``pipeline`` (see ``post_process``).
+
+    Steps do not depend on each other, so with more than one worker they
+    are generated concurrently in a process pool and written as soon as
+    every earlier step is done.
+
+    :param workers: number of processes; 1 generates in this process,
+        None uses one per CPU
+    :return: number of steps written
+    """
+    indices = list(range(len(job.steps)))
+    if workers == 1 or len(job.steps) <= 1:
+        texts = (render_step(step, index, job.verbosity)
+                 for step, index in zip(job.steps, indices))
+        destination.writelines(post_process(texts, pipeline))
+        return len(job.steps)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        texts = pool.map(render_step, job.steps, indices,
+                         [job.verbosity] * len(indices))
+        destination.writelines(post_process(texts, pipeline))
+    return len(job.steps)
+
+
+def iter_job_lines(job: Job,
+                   pipeline: Optional[Pipeline] = None) -> Iterator[str]:
+    """
+    Yields the post-processed lines of a job as each step is generated,
+    so they can be streamed to a machine without writing the program to
+    disk.
+    """
+    return post_process((render_step(step, index, job.verbosity)
+                         for index, step in enumerate(job.steps)), pipeline)
+
+
+def run_job_file(job_path: str, output_path: str,
+                 workers: Optional[int] = None,
+                 verbosity: Optional[str] = None,
+                 pipeline: Optional[Pipeline] = None) -> int:
+    """
+    Runs a job file into an output file; used by the UI and the CLI.
+    ``verbosity`` overrides the job's own comment level.
+    """
+    job = load_job(job_path)
+    if verbosity is not None:
+        job.verbosity = verbosity
+    with open(output_path, "w") as destination:
+        return run_job(job, destination, workers, pipeline)
@@ -0,0 +1,254 @@
+import io
+import mmap
+import os
+import re
+from dataclasses import dataclass
+from typing import (Callable, Dict, List, NamedTuple, Optional, TextIO, Tuple,
+                    Union)
+
+import numpy as np
+
+from logic.io_utils import (build_line_index, file_cache, forget_file,
+                            line_index, mapped_file)
+from logic.toolpath import AXES, Toolpath, parse_bytes, resolve_modal
+
+LAYER_MARKER_RE = re.compile(rb"(?m)^;\s*Layer (\d+) at Z([-+]?\d*\.?\d+)")
+
+COPY_CHUNK = 1024 * 1024
+
+
+class Layer(NamedTuple):
+    """
+    One layer of a program. Bytes ``start:end`` hold the layer, which
+    covers ``line_count`` lines starting at 1-based ``first_line``.
+    """
+    number: int
+    z: float
+    start: int
+    end: int
+    first_line: int
+    line_count: int
+
+
+@dataclass
+class LayerState:
+    """
+    Layer detection carried from one chunk of a program to the next:
+    the Z of the current layer (None before the first) and whether a
+    ``; Layer N at Z`` marker has been seen.
+    """
+    z: Optional[float] = None
+    markers: bool = False
+
+
+def marker_rows(data: Union[bytes, mmap.mmap],
+                lines: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the 0-based lines of the ``; Layer N at Z`` markers written
+    by ``slicer()`` and their Z.
+
+    :param lines: line index of ``data`` (see ``build_line_index``)
+    """
+    starts, heights = [], []
+    for match in LAYER_MARKER_RE.finditer(data):
+        starts.append(match.start())
+        heights.append(float(match.group(2)))
+    rows = np.searchsorted(lines, np.array(starts, dtype=np.int64),
+                           side="right") - 1
+    return rows, np.array(heights)
+
+
+def find_layer_starts(path: Toolpath, markers: Tuple[np.ndarray, np.ndarray],
+                      state: Optional[LayerState] = None,
+                      start: Optional[Dict[str, float]] = None,
+                      final: bool = True) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Finds where layers start in a resolved toolpath: the one rule shared
+    by the layer index, the statistics report and the cycle-time
+    estimate.
+
+    From the first ``; Layer N at Z`` marker on, every marker starts a
+    layer. Before it, a layer starts where Z changes and the next print
+    move (a feed move with an XY displacement) runs at that new Z; it
+    starts at the line that set the Z. A Z hop that returns to the
+    layer's height before printing does not start a layer.
+
+    :param markers: ``(rows, heights)`` of the markers, see ``marker_rows``
+    :param state: layer state before the toolpath; updated in place
+    :param start: position before the first line, (0, 0, 0, 0) if omitted
+    :param final: no lines follow. Otherwise lines after the last print
+        that moved to a new Z cannot be assigned yet, and ``cut`` is the
+        first of them; the caller passes them again with the next chunk.
+    :return: ``(rows, heights, cut)`` with the first line and Z of every
+        layer that starts before ``cut``
+    """
+    state = state if state is not None else LayerState()
+    start = start if start is not None else dict.fromkeys(AXES, 0.0)
+    n = len(path)
+    marker_at, marker_z = markers
+    limit = 0 if state.markers else (int(marker_at[0]) if len(marker_at)
+                                     else n)
+    previous = {axis: np.concatenate(([start[axis]],
+                                      getattr(path, axis)))[:limit]
+                for axis in ("x", "y", "z")}
+    z = path.z[:limit]
+    changes = np.flatnonzero(z != previous["z"])
+    printing = np.flatnonzero(
+        path.is_move[:limit] & (path.motion[:limit] != 0.0)
+        & (np.hypot(path.x[:limit] - previous["x"],
+                    path.y[:limit] - previous["y"]) > 0.0))
+    print_z = z[printing]
+    last_z = np.nan if state.z is None else state.z
+    new = print_z != np.concatenate(([last_z], print_z[:-1]))
+    first_print = printing[new]
+    setter = np.searchsorted(changes, first_print, side="right") - 1
+    setters = changes[np.maximum(setter, 0)] if len(changes) else first_print
+    rows = np.where(setter >= 0, setters, first_print)
+    heights = print_z[new]
+    if len(printing):
+        state.z = float(print_z[-1])
+
+    cut = n
+    if not final and limit == n and n:
+        last_print = printing[-1] if len(printing) else -1
+        pending = changes[changes > last_print]
+        if len(pending) and z[-1] != (np.nan if state.z is None
+                                      else state.z):
+            cut = int(pending[-1])
+    if len(marker_at):
+        state.markers = True
+        rows = np.concatenate((rows, marker_at))
+        heights = np.concatenate((heights, marker_z))
+    return rows.astype(np.int64), heights.astype(float), cut
+
+
+def layer_of_rows(rows: np.ndarray, n: int) -> np.ndarray:
+    """
+    Numbers every line by the layer it belongs to, counting the layers
+    that start at ``rows`` from 1; lines before the first are layer 0.
+    """
+    starts = np.zeros(n, dtype=np.int64)
+    starts[rows] = 1
+    return np.cumsum(starts)
+
+
+def build_layer_index(data: Union[bytes, mmap.mmap],
+                      lines: Optional[np.ndarray] = None) -> List[Layer]:
+    """
+    Indexes the layers of a program, numbered from 1 in program order.
+
+    Layers follow ``find_layer_starts``: ``; Layer N at Z...`` markers
+    written by ``slicer()`` where present, and otherwise Z changes
+    followed by a print move, which fits programs from other slicers.
+    Only the lines before the first marker are parsed.
+
+    :param data: program bytes or an mmap of the file
+    :param lines: line index of ``data``; built when omitted
+    """
+    if lines is None:
+        lines = build_line_index(data)
+    markers = marker_rows(data, lines)
+    end = int(lines[markers[0][0]]) if len(markers[0]) else len(data)
+    head = data if end == len(data) else data[:end]
+    path = resolve_modal(parse_bytes(head))
+    # The head ends where the first marker's line starts, so marker rows
+    # beyond it are only used as layer starts.
+    rows, heights, _ = find_layer_starts(path, markers)
+    starts = lines[rows].tolist()
+    ends = starts[1:] + [len(data)]
+    last = np.searchsorted(lines, ends, side="left")
+    return [Layer(i + 1, float(heights[i]), starts[i], ends[i],
+                  int(rows[i]) + 1, int(last[i] - rows[i]))
+            for i in range(len(starts))]
+
+
+def layer_index_for_file(path: str) -> List[Layer]:
+    """Returns the layer index of a G-code file, built once per file."""
+    cache = file_cache(path)
+    if "layer_index" not in cache:
+        with mapped_file(path) as data:
+            cache["layer_index"] = build_layer_index(data, line_index(path))
+    return cache["layer_index"]
+
+
+def find_layer(layers: List[Layer], number: int) -> Layer:
+    """Returns the layer with the given number."""
+    for layer in layers:
+        if layer.number == number:
+            return layer
+    raise KeyError(f"Layer {number} not found")
+
+
+def extract_layer(path: str, number: int) -> bytes:
+    """Returns the bytes of one layer without reading the rest of the file."""
+    layer = find_layer(layer_index_for_file(path), number)
+    with open(path, "rb") as f:
+        f.seek(layer.start)
+        return f.read(layer.end - layer.start)
+
+
+def _move_tail(f, source: int, target: int, size: int) -> None:
+    """Moves ``size`` bytes from ``source`` to ``target`` within a file."""
+    if target < source:
+        done = 0
+        while done < size:
+            n = min(COPY_CHUNK, size - done)
+            f.seek(source + done)
+            chunk = f.read(n)
+            f.seek(target + done)
+            f.write(chunk)
+            done += n
+    elif target > source:
+        remaining = size
+        while remaining > 0:
+            n = min(COPY_CHUNK, remaining)
+            remaining -= n
+            f.seek(source + remaining)
+            chunk = f.read(n)
+            f.seek(target + remaining)
+            f.write(chunk)
+
+
+def replace_layer(path: str, number: int, content: Union[str, bytes]) -> Layer:
+    """
+    Replaces one layer in place.
+
+    Only the bytes after the layer are moved, and only when the new
+    content has a different length; everything before it is untouched.
+
+    :return: the layer as it is stored after the replacement
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    layer = find_layer(layer_index_for_file(path), number)
+    size = os.path.getsize(path)
+    new_end = layer.start + len(content)
+
+    with open(path, "r+b") as f:
+        _move_tail(f, layer.end, new_end, size - layer.end)
+        f.seek(layer.start)
+        f.write(content)
+        f.truncate(size - layer.end + new_end)
+
+    forget_file(path)
+    return find_layer(layer_index_for_file(path), number)
+
+
+def regenerate_layer(path: str, number: int,
+                     generate: Callable[[TextIO, Layer], object]) -> Layer:
+    """
+    Regenerates the body of one layer in place.
+
+    The layer's first line (its ``; Layer N at Z`` marker or Z move) is
+    kept and ``generate(destination, layer)`` writes the rest, e.g.
+    ``lambda dest, layer: print_layer0(dest, 0, 0, 20, 0, layer.z, 1000,
+    "square")``.
+    """
+    original = extract_layer(path, number)
+    newline = original.find(b"\n")
+    head = original if newline == -1 else original[:newline + 1]
+    if not head.endswith(b"\n"):
+        head += b"\n"
+    buffer = io.StringIO()
+    generate(buffer, find_layer(layer_index_for_file(path), number))
+    return replace_layer(path, number, head + buffer.getvalue().encode())
@@ -0,0 +1,186 @@
+"""
+Binary STL meshes and their layer contours.
+
+A mesh is read straight into an (n x 3 x 3) float array with
+``np.frombuffer``. Slicing finds every (triangle, layer) pair whose
+z range spans the layer plane, intersects all pairs in one vectorized
+pass, and links the resulting segments of each layer into closed
+contours through a map from quantized endpoints to segments.
+
+Contours follow the right-hand rule of the facet normals: outer
+boundaries run counter-clockwise seen from above and holes clockwise.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+STL_HEADER_BYTES = 80
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)),
+                       ("attribute", "<u2")])
+# Endpoints closer than this (mm) are joined when contours are linked.
+ENDPOINT_TOLERANCE = 1e-4
+
+
+@dataclass
+class MeshSlices:
+    """
+    Contours of a sliced mesh: ``contours[k]`` holds the closed polygons
+    (m x 2 arrays of XY vertices, not repeating the first) cut at
+    ``heights[k]``. ``open_chains`` counts chains that did not close, which
+    points to holes in the mesh.
+    """
+    heights: np.ndarray
+    contours: List[List[np.ndarray]]
+    open_chains: int = 0
+
+
+def parse_stl(data: bytes) -> np.ndarray:
+    """Returns the triangles of a binary STL as an (n x 3 x 3) float array."""
+    if len(data) < STL_HEADER_BYTES + 4:
+        raise ValueError("Not a binary STL: file too short")
+    count = int(np.frombuffer(data, dtype="<u4", count=1,
+                              offset=STL_HEADER_BYTES)[0])
+    expected = STL_HEADER_BYTES + 4 + count * STL_RECORD.itemsize
+    if len(data) < expected:
+        if data[:5].lower() == b"solid":
+            raise ValueError("ASCII STL is not supported; export binary STL")
+        raise ValueError(f"Truncated STL: {count} triangles need {expected} "
+                         f"bytes, got {len(data)}")
+    records = np.frombuffer(data, dtype=STL_RECORD, count=count,
+                            offset=STL_HEADER_BYTES + 4)
+    return records["vertices"].astype(np.float64)
+
+
+def load_stl(path: str) -> np.ndarray:
+    """Reads the triangles of a binary STL file."""
+    with open(path, "rb") as f:
+        return parse_stl(f.read())
+
+
+def layer_heights(triangles: np.ndarray, layer_thickness: float) -> np.ndarray:
+    """
+    Heights of the planes cutting a mesh into layers of ``layer_thickness``,
+    at the middle of each layer above the mesh's lowest point.
+    """
+    if layer_thickness <= 0:
+        raise ValueError("layer_thickness must be positive")
+    if not len(triangles):
+        return np.zeros(0)
+    z = triangles[:, :, 2]
+    bottom, top = float(z.min()), float(z.max())
+    count = int(np.floor((top - bottom) / layer_thickness + 1e-9))
+    return bottom + (np.arange(count) + 0.5) * layer_thickness
+
+
+def _intersect(triangles: np.ndarray, heights: np.ndarray):
+    """
+    Cuts every triangle with every plane it spans. Returns ``(layer,
+    start, end)``: the layer of each segment and its XY endpoints, ordered
+    so the solid lies to the left of the segment.
+    """
+    z = triangles[:, :, 2]
+    first = np.searchsorted(heights, z.min(axis=1), side="left")
+    last = np.searchsorted(heights, z.max(axis=1), side="left")
+    spans = last - first
+    triangle = np.repeat(np.arange(len(triangles)), spans)
+    offsets = np.arange(len(triangle)) - np.repeat(np.cumsum(spans) - spans,
+                                                   spans)
+    layer = np.repeat(first, spans) + offsets
+    vertices = triangles[triangle]
+    plane = heights[layer]
+
+    # Edge i runs from vertex i to vertex i + 1.
+    a = vertices
+    b = np.roll(vertices, -1, axis=1)
+    above_a = a[:, :, 2] > plane[:, None]
+    above_b = b[:, :, 2] > plane[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (plane[:, None] - a[:, :, 2]) / (b[:, :, 2] - a[:, :, 2])
+        points = a[:, :, :2] + t[:, :, None] * (b[:, :, :2] - a[:, :, :2])
+    # Each spanning triangle has one edge going up through the plane and
+    # one going down; the contour runs from the down to the up crossing.
+    up = np.argmax(~above_a & above_b, axis=1)
+    down = np.argmax(above_a & ~above_b, axis=1)
+    rows = np.arange(len(layer))
+    return layer, points[rows, down], points[rows, up]
+
+
+def _drop_collinear(polygon: np.ndarray) -> np.ndarray:
+    """Removes the vertices lying on the line through their neighbours."""
+    before = polygon - np.roll(polygon, 1, axis=0)
+    after = np.roll(polygon, -1, axis=0) - polygon
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    scale = np.hypot(before[:, 0], before[:, 1]) * np.hypot(after[:, 0],
+                                                            after[:, 1])
+    return polygon[np.abs(cross) > 1e-9 * scale]
+
+
+def _link(start: np.ndarray, end: np.ndarray, tolerance: float):
+    """
+    Links the segments of one layer into chains. Returns the closed
+    contours and the number of chains left open.
+    """
+    keys = np.round(np.concatenate((start, end)) / tolerance).astype(np.int64)
+    _, ids = np.unique(keys, axis=0, return_inverse=True)
+    ids = ids.reshape(-1)
+    start_id, end_id = ids[:len(start)], ids[len(start):]
+    keep = start_id != end_id
+    start, start_id, end_id = start[keep], start_id[keep], end_id[keep]
+    # Endpoint id -> the segment starting there.
+    by_start = np.full(len(keys), -1, dtype=np.int64)
+    by_start[start_id] = np.arange(len(start_id))
+    following = by_start[end_id].tolist()
+
+    contours = []
+    open_chains = 0
+    visited = np.zeros(len(start_id), dtype=bool)
+    for first in range(len(start_id)):
+        if visited[first]:
+            continue
+        chain = []
+        segment = first
+        while segment != -1 and not visited[segment]:
+            visited[segment] = True
+            chain.append(segment)
+            segment = following[segment]
+        if segment != first:
+            open_chains += 1
+        elif len(chain) >= 3:
+            contour = _drop_collinear(start[chain])
+            if len(contour) >= 3:
+                contours.append(contour)
+    return contours, open_chains
+
+
+def slice_mesh(triangles: np.ndarray, layer_thickness: float,
+               heights: Optional[np.ndarray] = None,
+               tolerance: float = ENDPOINT_TOLERANCE) -> MeshSlices:
+    """
+    Cuts a mesh into closed contours, one list per layer.
+
+    :param heights: plane heights; by default the middle of each layer of
+        ``layer_thickness`` from the bottom of the mesh
+    :param tolerance: distance (mm) within which endpoints are joined
+    """
+    if heights is None:
+        heights = layer_heights(triangles, layer_thickness)
+    heights = np.asarray(heights, dtype=np.float64)
+    slices = MeshSlices(heights=heights, contours=[[] for _ in heights])
+    if not len(triangles) or not len(heights):
+        return slices
+    layer, start, end = _intersect(triangles, heights)
+    order = np.argsort(layer, kind="stable")
+    bounds = np.searchsorted(layer[order], np.arange(len(heights) + 1))
+    for k in range(len(heights)):
+        rows = order[bounds[k]:bounds[k + 1]]
+        if len(rows):
+            slices.contours[k], open_chains = _link(start[rows], end[rows],
+                                                    tolerance)
+            slices.open_chains += open_chains
+    return slices
+
+
+def slice_stl(path: str, layer_thickness: float) -> MeshSlices:
+    """Reads a binary STL file and cuts it into layer contours."""
+    return slice_mesh(load_stl(path), layer_thickness)
@@ -0,0 +1,290 @@
+"""
+Trapezoidal motion model of a look-ahead motion controller.
+
+Every move accelerates from its entry speed towards its commanded speed
+and decelerates to its exit speed at a limited acceleration. Junction
+speeds come from the junction deviation model, so a sharp corner
+(the tip of a sawtooth) is taken almost at rest while a straight
+continuation is not slowed at all.
+
+Entry and exit speeds are found with a forward and a backward pass,
+each a closed-form min-plus scan. With ``c = 2 * a * L`` per move and
+``S`` its running sum, the forward limit at junction ``k`` is
+``S[k] + min(J[j] - S[j] for j <= k)``. That is one
+``np.minimum.accumulate``, so millions of moves are planned in a few
+array passes.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+import numpy as np
+
+from logic.io_utils import iter_mapped_lines, read_toolpath
+from logic.toolpath import AXES, Toolpath, parse_bytes, resolve_modal
+
+# mm/s^2 per axis (deg/s^2 for A).
+DEFAULT_ACCELERATION = {"x": 500.0, "y": 500.0, "z": 100.0, "a": 1000.0}
+# Slowest feed (mm/min) assumed for moves commanded with F0.
+MIN_FEED = 1.0
+
+FEED_WORD_RE = re.compile(r"F\s*[-+]?(?:\d+\.?\d*|\.\d+)", re.IGNORECASE)
+
+
+@dataclass
+class MotionLimits:
+    """
+    Planner settings of a machine.
+
+    :param acceleration: maximum acceleration per axis; a move is limited
+        by the axis that reaches its limit first
+    :param junction_deviation: mm; larger values take corners faster
+    :param rapid_feed: mm/min used for G0 moves
+    """
+    acceleration: Dict[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_ACCELERATION))
+    junction_deviation: float = 0.05
+    rapid_feed: float = 5000.0
+
+
+@dataclass
+class MotionPlan:
+    """
+    Planned moves of a toolpath, one entry per move that changes the
+    position. ``rows`` are the 0-based source lines. Lengths are in mm.
+    Speeds are in mm/s, and both count A degrees as millimetres, like the
+    controller's own feed calculation. Times are in seconds.
+    """
+    rows: np.ndarray
+    travel: np.ndarray
+    length: np.ndarray
+    acceleration: np.ndarray
+    nominal: np.ndarray
+    entry: np.ndarray
+    exit: np.ndarray
+    peak: np.ndarray
+    time: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+@dataclass
+class FeedReport:
+    """
+    Commanded and achievable feeds of the cutting moves (G1/G2/G3).
+
+    ``commanded_feed`` is the length-weighted mean of the F words and
+    ``achievable_feed`` the mean speed the motion model reaches with
+    them, both in mm/min; ``changed`` moves get a lower F.
+    """
+    moves: int = 0
+    changed: int = 0
+    length: float = 0.0
+    commanded_feed: float = 0.0
+    achievable_feed: float = 0.0
+    commanded_time: float = 0.0
+    planned_time: float = 0.0
+
+
+def move_deltas(path: Toolpath) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns ``(rows, deltas)``: the rows of the moves that change the
+    position and their per-axis displacement (n x 4, AXES order).
+    """
+    moves = np.flatnonzero(path.is_move)
+    prev = np.maximum(moves - 1, 0)
+    deltas = np.empty((len(moves), len(AXES)))
+    for i, axis in enumerate(AXES):
+        position = getattr(path, axis)
+        deltas[:, i] = np.where(moves == 0, position[moves],
+                                position[moves] - position[prev])
+    moving = np.any(deltas != 0.0, axis=1)
+    return moves[moving], deltas[moving]
+
+
+def _stops_before(path: Toolpath, rows: np.ndarray) -> np.ndarray:
+    """
+    Marks the moves preceded by a line the controller must finish motion
+    for (dwell, M code, G92) since the previous move.
+    """
+    columns = path.columns
+    stop = columns.g4 | columns.g92 | ~np.isnan(columns.m)
+    count = np.cumsum(stop)
+    before = np.zeros(len(rows), dtype=bool)
+    if len(rows) > 1:
+        before[1:] = count[rows[1:]] > count[rows[:-1]]
+    return before
+
+
+def junction_speeds(units: np.ndarray, acceleration: np.ndarray,
+                    deviation: float) -> np.ndarray:
+    """
+    Maximum squared speeds at the junctions between consecutive moves
+    (length n - 1), from the junction deviation model.
+
+    :param units: unit direction vectors of the moves (n x axes)
+    """
+    cos_theta = -np.einsum("ij,ij->i", units[:-1], units[1:])
+    cos_theta = np.clip(cos_theta, -1.0, 1.0)
+    sin_half = np.sqrt(0.5 * (1.0 - cos_theta))
+    accel = np.minimum(acceleration[:-1], acceleration[1:])
+    with np.errstate(divide="ignore"):
+        speed2 = accel * deviation * sin_half / (1.0 - sin_half)
+    return np.where(cos_theta > 0.999999, 0.0, speed2)
+
+
+def _forward_backward(limits: np.ndarray, cost: np.ndarray) -> np.ndarray:
+    """
+    Squared speeds at every junction that respect both the junction
+    ``limits`` (n + 1) and ``v[k+1]^2 <= v[k]^2 + cost[k]`` in both
+    directions, where ``cost = 2 * a * L`` of the n moves.
+    """
+    reach = np.concatenate(([0.0], np.cumsum(cost)))
+    forward = reach + np.minimum.accumulate(limits - reach)
+    backward = np.minimum.accumulate((limits + reach)[::-1])[::-1] - reach
+    return np.maximum(np.minimum(forward, backward), 0.0)
+
+
+def trapezoid_times(length: np.ndarray, entry: np.ndarray, exit: np.ndarray,
+                    nominal: np.ndarray, acceleration: np.ndarray
+                    ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns ``(peak, time)`` of trapezoidal (or triangular) speed
+    profiles over moves with the given entry and exit speeds.
+    """
+    reachable = np.sqrt(acceleration * length + 0.5 * (entry ** 2 + exit ** 2))
+    peak = np.maximum(np.minimum(nominal, reachable), np.maximum(entry, exit))
+    ramp_up = (peak ** 2 - entry ** 2) / (2.0 * acceleration)
+    ramp_down = (peak ** 2 - exit ** 2) / (2.0 * acceleration)
+    cruise = np.maximum(length - ramp_up - ramp_down, 0.0)
+    time = ((peak - entry) + (peak - exit)) / acceleration + cruise / peak
+    return peak, time
+
+
+def plan_motion(path: Toolpath,
+                limits: Optional[MotionLimits] = None) -> MotionPlan:
+    """
+    Plans the speed profile of every move of a resolved toolpath. G2/G3
+    arcs are planned as their chords. The machine is at rest at the
+    start, at the end and around dwells and M codes.
+    """
+    limits = limits if limits is not None else MotionLimits()
+    rows, deltas = move_deltas(path)
+    length = np.sqrt(np.einsum("ij,ij->i", deltas, deltas))
+    units = deltas / length[:, None] if len(rows) else deltas
+    axis_accel = np.array([limits.acceleration.get(axis, np.inf)
+                           for axis in AXES])
+    with np.errstate(divide="ignore"):
+        acceleration = np.min(axis_accel / np.abs(units), axis=1,
+                              initial=np.inf)
+    travel = path.motion[rows] == 0.0
+    nominal = np.where(travel, limits.rapid_feed,
+                       np.maximum(path.f[rows], MIN_FEED)) / 60.0
+
+    junction = np.zeros(len(rows) + 1)
+    if len(rows) > 1:
+        junction[1:-1] = np.minimum(
+            junction_speeds(units, acceleration, limits.junction_deviation),
+            np.minimum(nominal[:-1], nominal[1:]) ** 2)
+        junction[1:-1][_stops_before(path, rows)[1:]] = 0.0
+    speed2 = _forward_backward(junction, 2.0 * acceleration * length)
+    entry = np.sqrt(speed2[:-1])
+    exit = np.sqrt(speed2[1:])
+    peak, time = trapezoid_times(length, entry, exit, nominal, acceleration)
+    return MotionPlan(rows=rows, travel=travel, length=length,
+                      acceleration=acceleration, nominal=nominal,
+                      entry=entry, exit=exit, peak=peak, time=time)
+
+
+def plan_feeds(path: Toolpath, limits: Optional[MotionLimits] = None,
+               quantum: float = 10.0
+               ) -> Tuple[np.ndarray, np.ndarray, FeedReport]:
+    """
+    Computes the F each cutting move can actually reach: its planned peak
+    speed, rounded down to ``quantum`` mm/min. Moves that reach their
+    commanded feed keep it. Commanding reachable feeds on runs of short
+    segments keeps the controller from planning towards a speed it never
+    gets to, so the tool speed stays steadier.
+
+    :return: ``(rows, feeds, report)`` with the rows of the cutting moves
+        and their new F values in mm/min
+    """
+    if np.any(path.columns.g_units == 20.0):
+        raise ValueError("Feed planning supports G21 (mm) programs only")
+    plan = plan_motion(path, limits)
+    cutting = ~plan.travel
+    rows = plan.rows[cutting]
+    length = plan.length[cutting]
+    time = plan.time[cutting]
+    commanded = np.maximum(path.f[rows], MIN_FEED)
+    # The small offset keeps moves that reach their feed from rounding down.
+    steps = np.floor(plan.peak[cutting] * 60.0 / quantum + 1e-6)
+    feeds = np.minimum(np.maximum(steps * quantum, quantum), commanded)
+    report = FeedReport(moves=len(rows), changed=int(np.sum(feeds < commanded)))
+    if len(rows):
+        report.length = float(length.sum())
+        report.commanded_time = float(np.sum(length / commanded) * 60.0)
+        report.planned_time = float(time.sum())
+        report.commanded_feed = report.length / report.commanded_time * 60.0
+        report.achievable_feed = report.length / report.planned_time * 60.0
+    return rows, feeds, report
+
+
+def rewrite_feeds(lines: Iterable[str], rows: np.ndarray,
+                  feeds: np.ndarray) -> Iterator[str]:
+    """
+    Yields the lines (without newlines) with the F word of line
+    ``rows[i]`` set to ``feeds[i]``. An F word is added only where the
+    modal feed changes, and F words in comments are left alone.
+    """
+    targets = dict(zip(rows.tolist(), feeds.tolist()))
+    current = None
+    for number, line in enumerate(lines):
+        line = line.rstrip("\r\n")
+        code, semicolon, comment = line.partition(";")
+        match = FEED_WORD_RE.search(code)
+        feed = targets.get(number)
+        if feed is None:
+            if match is not None:
+                current = float(match.group(0)[1:])
+            yield line
+            continue
+        word = f"F{feed:g}"
+        if match is not None:
+            code = code[:match.start()] + word + code[match.end():]
+        elif feed != current:
+            stripped = code.rstrip()
+            code = f"{stripped} {word}" + code[len(stripped):]
+        current = feed
+        yield code + semicolon + comment
+
+
+def plan_feeds_text(text: str, limits: Optional[MotionLimits] = None,
+                    quantum: float = 10.0) -> Tuple[str, FeedReport]:
+    """Rewrites the feeds of G-code held in a string; see ``plan_feeds``."""
+    path = resolve_modal(parse_bytes(text.encode("ascii", "replace")))
+    rows, feeds, report = plan_feeds(path, limits, quantum)
+    return "\n".join(rewrite_feeds(text.split("\n"), rows, feeds)), report
+
+
+def plan_feeds_file(input_path: str, destination: TextIO,
+                    limits: Optional[MotionLimits] = None,
+                    quantum: float = 10.0) -> FeedReport:
+    """Rewrites the feeds of a file line by line into ``destination``."""
+    rows, feeds, report = plan_feeds(read_toolpath(input_path), limits,
+                                     quantum)
+    lines = (line.decode("ascii", "replace")
+             for line in iter_mapped_lines(input_path))
+    for line in rewrite_feeds(lines, rows, feeds):
+        destination.write(line + "\n")
+    return report
+
+
+def format_feed_report(report: FeedReport) -> str:
+    """Formats a FeedReport for the results pane or the CLI."""
+    return (f"{report.moves} cutting moves, {report.length:.1f} mm: "
+            f"commanded {report.commanded_feed:.0f} mm/min "
+            f"({report.commanded_time:.1f} s), achievable "
+            f"{report.achievable_feed:.0f} mm/min "
+            f"({report.planned_time:.1f} s); {report.changed} feeds lowered")
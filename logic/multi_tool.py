@@ -0,0 +1,237 @@
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from logic.job import Job, JobStep, post_process, render_step
+from logic.operations import operation_parameters
+from logic.postprocess import Pipeline
+
+TOOLS = tuple(f"T{i}" for i in range(10))
+# Tools sit evenly around the A axis unless configured otherwise.
+DEFAULT_TOOL_ANGLES: Dict[str, float] = {tool: i * 36.0
+                                         for i, tool in enumerate(TOOLS)}
+
+
+@dataclass
+class ToolPlanReport:
+    """Tool changes and A-axis work of a planned program vs. job order."""
+    tool_changes: int
+    naive_tool_changes: int
+    a_moves: int
+    naive_a_moves: int
+    a_travel: float
+    naive_a_travel: float
+    seconds_saved: float
+
+
+def _is_barrier(step: JobStep) -> bool:
+    """Steps that cannot be moved: untooled steps and explicit rotations."""
+    return step.tool is None or step.operation == "rotate"
+
+
+def _groups(steps: List[JobStep]) -> List[List[JobStep]]:
+    """
+    Splits steps into runs that may be reordered: consecutive tooled steps
+    at the same Z height. Barriers form groups of their own.
+    """
+    groups: List[List[JobStep]] = []
+    current_z = None
+    for step in steps:
+        if _is_barrier(step):
+            groups.append([step])
+            current_z = None
+            continue
+        z = operation_parameters(step.operation, **step.parameters).get(
+            "z_value", current_z)
+        if groups and current_z is not None and z == current_z \
+                and not _is_barrier(groups[-1][0]):
+            groups[-1].append(step)
+        else:
+            groups.append([step])
+        current_z = z
+    return groups
+
+
+def order_tools(tools: List[str], angle: float,
+                tool_angles: Dict[str, float]) -> List[str]:
+    """
+    Orders the tools of one group for the least A travel from ``angle``.
+
+    Angles lie on a line, so the shortest path that visits them all sweeps
+    to the nearer end first and then to the other end; a tool already at
+    ``angle`` is visited first without moving.
+    """
+    below = sorted((t for t in tools if tool_angles[t] <= angle),
+                   key=lambda t: -tool_angles[t])
+    above = sorted((t for t in tools if tool_angles[t] > angle),
+                   key=lambda t: tool_angles[t])
+    if not below or not above:
+        return below + above
+    low = tool_angles[below[-1]]
+    high = tool_angles[above[-1]]
+    down_first = (angle - low) + (high - low)
+    up_first = (high - angle) + (high - low)
+    if down_first <= up_first:
+        return below + above
+    # Sweep up, then down through the tools at or below the start angle.
+    return above + below
+
+
+def plan_steps(steps: List[JobStep], tool: Optional[str], angle: float,
+               tool_angles: Dict[str, float]) -> List[JobStep]:
+    """
+    Reorders job steps so each group runs tool by tool, keeping the order
+    of the steps that share a tool.
+    """
+    planned: List[JobStep] = []
+    for group in _groups(steps):
+        if _is_barrier(group[0]):
+            planned.extend(group)
+            if group[0].operation == "rotate":
+                angle = float(operation_parameters(
+                    "rotate", **group[0].parameters)["angle"])
+            continue
+        tools = list(dict.fromkeys(step.tool for step in group))
+        order = order_tools(tools, angle, tool_angles)
+        for t in order:
+            planned.extend(step for step in group if step.tool == t)
+        tool, angle = order[-1], tool_angles[order[-1]]
+    return planned
+
+
+def _own_rotations(step: JobStep) -> List[float]:
+    """A angles the output of a step moves to by itself, in order."""
+    if step.operation not in ("rotate", "print_block", "print_block_array"):
+        return []
+    parameters = operation_parameters(step.operation, **step.parameters)
+    if step.operation == "rotate":
+        return [float(parameters["angle"])]
+    target = float(parameters["next_tool_angle"])
+    if (step.operation == "print_block"
+            and parameters["current_tool_angle"] == target):
+        return []
+    return [target]
+
+
+# A step with the tool to change to and the A angle to rotate to first.
+ToolStep = Tuple[JobStep, Optional[str], Optional[float]]
+
+
+def _tooled_steps(steps: List[JobStep], tool: Optional[str], angle: float,
+                  tool_angles: Dict[str, float]) -> Iterator[ToolStep]:
+    """
+    Yields every step of a planned program with the tool to change to
+    and the A angle to rotate to before it (None for neither). Tooled
+    ``print_block`` and ``print_block_array`` steps are given the tool's
+    angle: the block skips its own A move, and the array makes the
+    rotation itself.
+    """
+    for step in steps:
+        change = rotation = None
+        if step.tool is not None and step.operation != "rotate":
+            if step.tool != tool:
+                change = tool = step.tool
+            target = tool_angles[step.tool]
+            if step.operation == "print_block_array":
+                step = replace(step, parameters=dict(
+                    step.parameters, next_tool_angle=target))
+            else:
+                if target != angle:
+                    rotation = angle = target
+                if step.operation == "print_block":
+                    step = replace(step, parameters=dict(
+                        step.parameters, next_tool_angle=target,
+                        current_tool_angle=target))
+        for own in _own_rotations(step):
+            angle = own
+        yield step, change, rotation
+
+
+def _walk(steps: Iterable[ToolStep], tool: Optional[str],
+          angle: float) -> Tuple[int, int, float]:
+    """
+    Counts tool changes, A moves and A travel of steps run in order, each
+    with the A angle it is rotated to beforehand (or None), and the moves
+    its own output makes. A tool change is counted whenever a tooled step
+    follows a step with another tool.
+    """
+    changes = moves = 0
+    travel = 0.0
+    for step, _, rotation in steps:
+        if step.tool is not None and step.operation != "rotate":
+            if step.tool != tool:
+                changes += 1
+                tool = step.tool
+        targets = ([rotation] if rotation is not None else []) \
+            + _own_rotations(step)
+        for target in targets:
+            moves += 1
+            travel += abs(target - angle)
+            angle = target
+    return changes, moves, travel
+
+
+def build_multi_tool_program(job: Job, destination: TextIO,
+                             tool_angles: Optional[Dict[str, float]] = None,
+                             a_feed: float = 800,
+                             tool_change_seconds: float = 5.0,
+                             a_move_seconds: float = 0.1,
+                             start_tool: Optional[str] = None,
+                             start_angle: float = 0.0,
+                             pipeline: Optional[Pipeline] = None
+                             ) -> ToolPlanReport:
+    """
+    Writes a job as one multi-tool program and reports what it saved.
+
+    Tooled steps are grouped per tool within each run of steps at the same
+    Z height, with the tools ordered for the least A travel. A ``T<n>``
+    line is written only when the tool changes and a ``G1 A`` move only
+    when the tool's angle differs from the current one; ``print_block``
+    steps are given the tool's angle so they skip their own A move.
+    Untooled steps and ``rotate`` steps stay where they are. The job's
+    own order is measured by the A moves its steps write themselves:
+    ``print_block`` to its ``next_tool_angle`` and ``rotate`` to its
+    angle.
+
+    :param tool_angles: A angle per tool; tools 36 degrees apart by default
+    :param a_feed: A-axis feed (degrees/min) used for tool rotations and
+        for the cycle time estimate
+    :param tool_change_seconds: time charged per tool change
+    :param a_move_seconds: time charged per A move for the stop and settle
+        around it, on top of its travel time
+    :param pipeline: post-processing of the program; see ``post_process``
+    :return: ToolPlanReport comparing the plan with the job's own order
+    """
+    angles = dict(DEFAULT_TOOL_ANGLES if tool_angles is None else tool_angles)
+    planned = plan_steps(job.steps, start_tool, start_angle, angles)
+
+    run = list(_tooled_steps(planned, start_tool, start_angle, angles))
+
+    def program() -> Iterator[str]:
+        for index, (step, change, rotation) in enumerate(run):
+            if change is not None:
+                yield f"{change}\n"
+            if rotation is not None:
+                yield f"G1 A{rotation:.3f} F{a_feed}\n"
+            yield render_step(step, index, job.verbosity)
+
+    destination.writelines(post_process(program(), pipeline))
+
+    changes, moves, travel = _walk(run, start_tool, start_angle)
+    naive_changes, naive_moves, naive_travel = _walk(
+        ((step, None, None) for step in job.steps), start_tool, start_angle)
+    saved = ((naive_travel - travel) / a_feed * 60.0
+             + (naive_changes - changes) * tool_change_seconds
+             + (naive_moves - moves) * a_move_seconds)
+    return ToolPlanReport(tool_changes=changes,
+                          naive_tool_changes=naive_changes,
+                          a_moves=moves, naive_a_moves=naive_moves,
+                          a_travel=travel, naive_a_travel=naive_travel,
+                          seconds_saved=saved)
+
+
+def format_report(report: ToolPlanReport) -> str:
+    """Formats a ToolPlanReport for the status bar or the CLI."""
+    return (f"Tool changes {report.naive_tool_changes} -> "
+            f"{report.tool_changes}, A moves {report.naive_a_moves} -> "
+            f"{report.a_moves}, A travel {report.naive_a_travel:.1f} -> "
+            f"{report.a_travel:.1f} deg, saves {report.seconds_saved:.1f} s")
@@ -0,0 +1,198 @@
+from typing import Any, Callable, Dict, Iterator, TextIO
+
+from logic.block_array import iter_print_block_array, print_block_array
+from logic.clean_block import clean_block, iter_clean_block
+from logic.clean_no_tool_block import (clean_no_tool_block,
+                                       iter_clean_no_tool_block)
+from logic.print_block import iter_print_block, print_block
+from logic.print_cylinder import iter_print_cylinder, print_cylinder
+from logic.print_layer0 import iter_print_layer0, print_layer0
+from logic.print_zigzag import iter_print_zigzag, print_zigzag
+from logic.rotate import iter_rotate, rotate
+from logic.slicer import iter_slicer, slicer
+from logic.streams import CHUNK_BYTES, GeneratedLines, iter_chunks
+
+# Operation name -> generator writing G-code to a destination.
+OPERATIONS: Dict[str, Callable[..., Any]] = {
+    "print_block": print_block,
+    "clean_block": clean_block,
+    "clean_no_tool_block": clean_no_tool_block,
+    "print_cylinder": print_cylinder,
+    "print_layer0": print_layer0,
+    "rotate": rotate,
+    "slicer": slicer,
+    "print_zigzag": print_zigzag,
+    "print_block_array": print_block_array,
+}
+
+# Operation name -> generator yielding its G-code as text pieces.
+ITERATORS: Dict[str, Callable[..., Iterator[str]]] = {
+    "print_block": iter_print_block,
+    "clean_block": iter_clean_block,
+    "clean_no_tool_block": iter_clean_no_tool_block,
+    "print_cylinder": iter_print_cylinder,
+    "print_layer0": iter_print_layer0,
+    "rotate": iter_rotate,
+    "slicer": iter_slicer,
+    "print_zigzag": iter_print_zigzag,
+    "print_block_array": iter_print_block_array,
+}
+
+# Comment levels every generator accepts: no comments, only the
+# start/end and layer markers, or everything.
+VERBOSITY_LEVELS = ("none", "structure", "full")
+
+# Parameters used by the UI buttons for each operation (everything except
+# ``destination``, ``waveform`` and ``verbosity``).
+DEFAULT_PARAMETERS: Dict[str, Dict[str, Any]] = {
+    "print_block": {
+        "z_value": 0.3,
+        "g0_xy_feed": "1500",
+        "g1_xy_feed": "1200",
+        "deposition": False,
+        "x_value": 10.0,
+        "y_value": 10.0,
+        "vertical_lift": 0.5,
+        "delay_time": 100,
+        "step_button": False,
+        "ultrasound_state": False,
+        "z_feed": 1500,
+        "next_tool_angle": 90.0,
+        "a_feed": 800,
+        "current_tool_angle": None,
+        "amplitude": 0.5,
+    },
+    "clean_block": {
+        "z_value": 0.3,
+        "g0_xy_feed": 5000,
+        "g1_xy_feed": 1000,
+        "x_value": 0.0,
+        "y_value": 0.0,
+        "x_end": 20.0,
+        "y_end": 20.0,
+        "z_feed": 800,
+    },
+    "clean_no_tool_block": {
+        "z_value": 0.3,
+        "g0_xy_feed": 5000,
+        "x_value": 0.0,
+        "y_value": 0.0,
+        "x_end": 20.0,
+        "y_end": 20.0,
+        "z_feed": 800,
+    },
+    "print_cylinder": {
+        "x_center": 10.0,
+        "y_center": 10.0,
+        "z_value": 0.3,
+        "radius": 5.0,
+        "segments": 36,
+        "feedrate": 1200,
+        "amplitude": None,
+    },
+    "print_layer0": {
+        "x_start": 0.0,
+        "y_start": 0.0,
+        "x_end": 20.0,
+        "y_end": 0.0,
+        "z_value": 0.3,
+        "feedrate": 1000,
+    },
+    "rotate": {
+        "angle": 90.0,
+        "a_feed": 1200,
+    },
+    "slicer": {
+        "z_height": 1.5,
+        "fill_density": 0.8,
+        "layer_thickness": 0.3,
+        "nozzle_diameter": 0.4,
+        "g0_feed": 5000,
+        "g1_feed": 1000,
+        "x_min": 0.0,
+        "x_max": 20.0,
+        "y_min": 0.0,
+        "y_max": 20.0,
+        "stl_path": None,
+        "walls": 2,
+    },
+    "print_zigzag": {
+        "x_start": 0.0,
+        "x_end": 20.0,
+        "y_value": 10.0,
+        "z_value": 0.3,
+        "passes": 10,
+        "feedrate": 1000,
+        "amplitude": 0.2,
+    },
+    "print_block_array": {
+        "x_value": 10.0,
+        "y_value": 10.0,
+        "columns": 5,
+        "rows": 4,
+        "pitch_x": 15.0,
+        "pitch_y": 15.0,
+        "z_value": 0.3,
+        "g0_xy_feed": "1500",
+        "g1_xy_feed": "1200",
+        "vertical_lift": 0.5,
+        "delay_time": 100,
+        "z_feed": 1500,
+        "next_tool_angle": 90.0,
+        "a_feed": 800,
+        "block_width": 10.0,
+        "block_height": 10.0,
+        "amplitude": 0.5,
+    },
+}
+
+
+def operation_parameters(operation: str, **overrides: Any) -> Dict[str, Any]:
+    """Returns the default parameters of an operation with overrides applied."""
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation '{operation}'")
+    unknown = set(overrides) - set(DEFAULT_PARAMETERS[operation])
+    if unknown:
+        raise ValueError(
+            f"Unknown parameters for {operation}: {', '.join(sorted(unknown))}")
+    parameters = dict(DEFAULT_PARAMETERS[operation])
+    parameters.update(overrides)
+    return parameters
+
+
+def run_operation(destination: TextIO, operation: str,
+                  parameters: Dict[str, Any], waveform: str,
+                  verbosity: str = "full") -> Any:
+    """Writes the G-code of one operation and returns the generator's result."""
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation '{operation}'")
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity '{verbosity}'")
+    return OPERATIONS[operation](destination=destination, waveform=waveform,
+                                 verbosity=verbosity, **parameters)
+
+
+def iter_operation(operation: str, parameters: Dict[str, Any], waveform: str,
+                   verbosity: str = "full") -> GeneratedLines:
+    """
+    Returns the G-code of one operation as an iterable of text pieces made
+    of whole lines; the generator's result is in ``result`` once it has
+    been iterated.
+    """
+    if operation not in ITERATORS:
+        raise ValueError(f"Unknown operation '{operation}'")
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity '{verbosity}'")
+    return GeneratedLines(ITERATORS[operation](
+        waveform=waveform, verbosity=verbosity, **parameters))
+
+
+def operation_chunks(operation: str, parameters: Dict[str, Any],
+                     waveform: str, verbosity: str = "full",
+                     chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Yields the G-code of one operation as ASCII byte chunks, for
+    ``writelines`` on a binary file, socket or compressor.
+    """
+    return iter_chunks(iter_operation(operation, parameters, waveform,
+                                      verbosity), chunk_bytes)
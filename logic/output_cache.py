@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, TextIO, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "simplified3d")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+LOGIC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def logic_version() -> str:
+    """
+    Returns a hash of the sources of the logic package, so cached output
+    is regenerated whenever any generator changes.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(LOGIC_DIR)):
+        if name.endswith(".py"):
+            digest.update(name.encode())
+            with open(os.path.join(LOGIC_DIR, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Counters for one OutputCache instance."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    bytes_written: int = 0
+
+
+class OutputCache:
+    """
+    Content-addressed on-disk cache of generated G-code.
+
+    Each entry is stored as ``<key>.gcode`` with a ``<key>.json`` metadata
+    file that also records the generator's return value. Entries are
+    evicted least recently used first (by modification time, refreshed on
+    every hit) once the directory grows beyond ``max_bytes``.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, operation: str, parameters: Dict[str, Any],
+            waveform: str, verbosity: str = "full") -> str:
+        """
+        Hashes (operation, parameters, waveform, verbosity, logic version).
+        Input files named by ``*_path`` parameters (e.g. an STL mesh) add
+        their size and modification time, so editing them regenerates.
+        """
+        inputs = {}
+        for name, value in parameters.items():
+            if name.endswith("_path") and value and os.path.isfile(value):
+                stat = os.stat(value)
+                inputs[name] = [stat.st_size, stat.st_mtime_ns]
+        payload = json.dumps([operation, parameters, waveform, verbosity,
+                              logic_version(), inputs],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".gcode", base + ".json"
+
+    def lookup(self, key: str) -> Optional[Tuple[str, Any]]:
+        """
+        Returns (path of the cached G-code, generator result) on a hit,
+        or None on a miss.
+        """
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                result = json.load(f)["result"]
+            os.utime(data_path)
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError):
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return data_path, result
+
+    def store(self, key: str, write: Callable[[TextIO], Any],
+              metadata: Optional[Dict[str, Any]] = None) -> Tuple[str, Any]:
+        """
+        Generates an entry with ``write(destination)`` and stores it.
+
+        The G-code is written to a temporary file and renamed into place,
+        so readers never see a partial entry.
+        """
+        data_path, meta_path = self._paths(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                result = write(f)
+            os.replace(temp_path, data_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        with open(meta_path, "w") as f:
+            json.dump(dict(metadata or {}, result=result), f, default=str)
+        self.stats.bytes_written += os.path.getsize(data_path)
+        self.evict(keep=key)
+        return data_path, result
+
+    def get_or_generate(self, operation: str, parameters: Dict[str, Any],
+                        waveform: str,
+                        write: Callable[[TextIO], Any],
+                        verbosity: str = "full") -> Tuple[str, Any, bool]:
+        """
+        Returns (cache file path, generator result, hit) for an operation,
+        generating it with ``write(destination)`` on a miss.
+        """
+        key = self.key(operation, parameters, waveform, verbosity)
+        found = self.lookup(key)
+        if found is not None:
+            return found[0], found[1], True
+        metadata = {"operation": operation, "parameters": parameters,
+                    "waveform": waveform, "verbosity": verbosity}
+        path, result = self.store(key, write, metadata)
+        return path, result, False
+
+    def size(self) -> int:
+        """Returns the total size of the cache directory in bytes."""
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                   if entry.is_file())
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Removes least recently used entries until under ``max_bytes``,
+        never removing the entry ``keep``.
+        """
+        entries: Dict[str, Tuple[float, int]] = {}
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            key = os.path.splitext(entry.name)[0]
+            stat = entry.stat()
+            used, size = entries.get(key, (0.0, 0))
+            entries[key] = (max(used, stat.st_mtime), size + stat.st_size)
+
+        total = sum(size for _, size in entries.values())
+        for key, (_, size) in sorted(entries.items(), key=lambda e: e[1][0]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self._paths(key):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.stats.evictions += 1
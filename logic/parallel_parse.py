@@ -0,0 +1,167 @@
+"""
+Parsing of large G-code files across processes.
+
+The file is split at newline boundaries into one byte range per chunk.
+Each worker maps the file itself, counts or tokenizes its own range and
+writes its word columns straight into one shared memory block, so only
+offsets and names cross process boundaries. The modal state is then
+resolved over the joined columns in one sequential pass, which carries
+positions, offsets and modes across the chunk boundaries.
+"""
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from logic.toolpath import (PARSE_CHUNK_BYTES, Toolpath, WordColumns,
+                            columns_from_tokens, parse_bytes, resolve_modal,
+                            tokenize)
+
+COLUMNS = [f.name for f in fields(WordColumns)]
+FLAG_COLUMNS = ("g92", "g4")
+
+# (start, end) byte offsets of one chunk.
+Span = Tuple[int, int]
+
+
+def _map(path: str) -> mmap.mmap:
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def split_spans(data: Union[bytes, mmap.mmap], chunk_bytes: int) -> List[Span]:
+    """Byte ranges of about ``chunk_bytes`` that end at line boundaries."""
+    spans = []
+    size = len(data)
+    lo = 0
+    while lo < size:
+        hi = data.find(b"\n", min(lo + chunk_bytes, size - 1))
+        hi = size if hi < 0 else hi + 1
+        spans.append((lo, hi))
+        lo = hi
+    return spans
+
+
+def _layout(rows: int) -> Dict[str, Tuple[int, np.dtype]]:
+    """Byte offset and dtype of every column in the shared block."""
+    layout = {}
+    offset = 0
+    for name in COLUMNS:
+        dtype = np.dtype(bool if name in FLAG_COLUMNS else np.float64)
+        layout[name] = (offset, dtype)
+        offset += rows * dtype.itemsize
+    return layout
+
+
+def _block_size(rows: int) -> int:
+    return sum(rows * dtype.itemsize for _, dtype in _layout(rows).values())
+
+
+def _views(buffer, rows: int) -> Dict[str, np.ndarray]:
+    return {name: np.ndarray(rows, dtype=dtype, buffer=buffer, offset=offset)
+            for name, (offset, dtype) in _layout(rows).items()}
+
+
+def _count_lines(path: str, span: Span) -> int:
+    """Lines in a byte range; the last may lack its newline."""
+    data = _map(path)
+    try:
+        lo, hi = span
+        count = data[lo:hi].count(b"\n")
+        if hi > lo and data[hi - 1] != ord("\n"):
+            count += 1
+        return count
+    finally:
+        data.close()
+
+
+def _attach(block: str) -> shared_memory.SharedMemory:
+    """
+    Opens the parent's shared block without tracking it, so the worker's
+    resource tracker does not unlink it when the worker exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=block, track=False)
+    except TypeError:  # Python < 3.13 always tracks
+        memory = shared_memory.SharedMemory(name=block)
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+
+def _parse_span(path: str, span: Span, first_row: int, block: str,
+                rows: int) -> int:
+    """Parses one byte range into its rows of the shared columns."""
+    data = _map(path)
+    memory = _attach(block)
+    try:
+        columns = columns_from_tokens(tokenize(data[span[0]:span[1]]))
+        views = _views(memory.buf, rows)
+        end = first_row + len(columns)
+        for name in COLUMNS:
+            views[name][first_row:end] = getattr(columns, name)
+        del views
+        return len(columns)
+    finally:
+        memory.close()
+        data.close()
+
+
+def parse_file_parallel(path: str, workers: Optional[int] = None,
+                        chunk_bytes: int = PARSE_CHUNK_BYTES) -> WordColumns:
+    """
+    Parses a file into word columns with a process pool, like
+    ``parse_bytes`` over the whole file.
+
+    :param workers: number of processes; 1 parses in this process, None
+        uses one per CPU
+    :param chunk_bytes: approximate size of the range each task parses
+    """
+    size = os.path.getsize(path)
+    if workers == 1 or size <= chunk_bytes:
+        if size == 0:
+            return parse_bytes(b"")
+        data = _map(path)
+        try:
+            return parse_bytes(data)
+        finally:
+            data.close()
+
+    data = _map(path)
+    try:
+        spans = split_spans(data, chunk_bytes)
+    finally:
+        data.close()
+    paths = [path] * len(spans)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(_count_lines, paths, spans))
+        rows = sum(counts)
+        first_rows = np.concatenate(([0], np.cumsum(counts)[:-1])).tolist()
+        memory = shared_memory.SharedMemory(create=True,
+                                            size=max(_block_size(rows), 1))
+        try:
+            parsed = list(pool.map(_parse_span, paths, spans, first_rows,
+                                   [memory.name] * len(spans),
+                                   [rows] * len(spans)))
+            if parsed != counts:
+                raise RuntimeError("Parallel parse lost lines")
+            views = _views(memory.buf, rows)
+            columns = WordColumns(**{name: view.copy()
+                                     for name, view in views.items()})
+            del views
+        finally:
+            memory.close()
+            memory.unlink()
+    return columns
+
+
+def read_toolpath_parallel(path: str, workers: Optional[int] = None,
+                           chunk_bytes: int = PARSE_CHUNK_BYTES) -> Toolpath:
+    """
+    Parses a file with ``parse_file_parallel`` and resolves its modal
+    state in one sequential pass.
+    """
+    return resolve_modal(parse_file_parallel(path, workers, chunk_bytes))
@@ -0,0 +1,180 @@
+"""
+Wall offsets, scanline infill and waveforms for arbitrary polygons.
+
+A region is a list of closed polygons (m x 2 arrays, not repeating the
+first vertex) with the material on the left of every edge, so outer
+boundaries run counter-clockwise and holes clockwise; this is what
+``logic.mesh.slice_mesh`` produces. All work is done on edge arrays:
+
+- Offsetting moves every edge of every polygon to its left and joins
+  neighbouring edges where their lines meet (mitred corners).
+- Infill intersects all edges with all scan lines in one pass. Sorting
+  the crossings of each scan line by x and pairing them (even-odd rule)
+  gives the inside spans, holes included.
+- Waveforms resample a path at half-wavelength steps and displace the
+  samples sideways.
+"""
+from typing import List
+
+import numpy as np
+
+# Sideways displacement and period (mm) of the sawtooth and square waves.
+WAVE_AMPLITUDE = 0.5
+WAVE_LENGTH = 2.0
+
+Region = List[np.ndarray]
+
+
+def signed_area(polygon: np.ndarray) -> float:
+    """Area of a polygon; positive when it runs counter-clockwise."""
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def offset_polygon(polygon: np.ndarray, distance: float) -> np.ndarray:
+    """
+    Moves every edge of a polygon ``distance`` to its left (into the
+    material) and joins neighbouring edges where their lines meet. Edges
+    that the offset turns around are too short to survive it; they are
+    removed and their neighbours joined directly, until none is left.
+    Returns an empty array when the polygon vanishes.
+    """
+    edge = np.roll(polygon, -1, axis=0) - polygon
+    length = np.hypot(edge[:, 0], edge[:, 1])
+    keep = length > 0
+    anchor, direction = polygon[keep], edge[keep] / length[keep, None]
+    normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+    # Edge i lies on the line normal[i] . p = level[i].
+    level = np.einsum("ij,ij->i", normal, anchor) + distance
+    while len(normal) >= 3:
+        n1, c1 = np.roll(normal, 1, axis=0), np.roll(level, 1)
+        det = n1[:, 0] * normal[:, 1] - n1[:, 1] * normal[:, 0]
+        parallel = np.abs(det) < 1e-12
+        det = np.where(parallel, 1.0, det)
+        vertex = np.column_stack(
+            ((c1 * normal[:, 1] - level * n1[:, 1]) / det,
+             (level * n1[:, 0] - c1 * normal[:, 0]) / det))
+        vertex[parallel] = (anchor[parallel]
+                            + distance * normal[parallel])
+        moved = np.roll(vertex, -1, axis=0) - vertex
+        turned = np.einsum("ij,ij->i", moved, direction) < 0
+        if not turned.any():
+            if np.sign(signed_area(vertex)) != np.sign(
+                    signed_area(polygon)):
+                break
+            return vertex
+        keep = ~turned
+        anchor, direction = anchor[keep], direction[keep]
+        normal, level = normal[keep], level[keep]
+    return np.zeros((0, 2))
+
+
+def offset_region(region: Region, distance: float) -> Region:
+    """Offsets every polygon of a region and drops the ones that vanish."""
+    polygons = (offset_polygon(polygon, distance) for polygon in region)
+    return [polygon for polygon in polygons if len(polygon) >= 3]
+
+
+def perimeters(region: Region, walls: int, spacing: float) -> List[Region]:
+    """
+    Returns the wall loops of a region, outermost first: wall ``k`` runs
+    ``(k + 0.5) * spacing`` inside the boundary, so a bead of width
+    ``spacing`` touches the boundary.
+    """
+    loops = []
+    for wall in range(walls):
+        loop = offset_region(region, (wall + 0.5) * spacing)
+        if not loop:
+            break
+        loops.append(loop)
+    return loops
+
+
+def _rotate(points: np.ndarray, angle: float) -> np.ndarray:
+    c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+    return points @ np.array([[c, s], [-s, c]])
+
+
+def scanline_infill(region: Region, spacing: float,
+                    angle: float = 0.0) -> np.ndarray:
+    """
+    Fills a region with parallel lines ``spacing`` apart at ``angle``
+    degrees, clipped to the region by the even-odd rule. Returns the
+    spans as a (k x 2 x 2) array of start and end points in serpentine
+    order: alternate scan lines run in opposite directions.
+    """
+    if not region or spacing <= 0:
+        return np.zeros((0, 2, 2))
+    rotated = [_rotate(polygon, -angle) for polygon in region]
+    a = np.concatenate(rotated)
+    b = np.concatenate([np.roll(polygon, -1, axis=0) for polygon in rotated])
+    low, high = a[:, 1].min(), a[:, 1].max()
+    lines = np.arange(low + spacing / 2, high, spacing)
+    # Edge i crosses the scan lines in [min y, max y): half-open so that a
+    # vertex on a scan line is counted once.
+    y0 = np.minimum(a[:, 1], b[:, 1])
+    y1 = np.maximum(a[:, 1], b[:, 1])
+    first = np.searchsorted(lines, y0, side="left")
+    last = np.searchsorted(lines, y1, side="left")
+    spans = last - first
+    edge = np.repeat(np.arange(len(a)), spans)
+    line = (np.repeat(first, spans) + np.arange(len(edge))
+            - np.repeat(np.cumsum(spans) - spans, spans))
+    y = lines[line]
+    t = (y - a[edge, 1]) / (b[edge, 1] - a[edge, 1])
+    x = a[edge, 0] + t * (b[edge, 0] - a[edge, 0])
+    order = np.lexsort((x, line))
+    x, y, line = x[order], y[order], line[order]
+    # Every scan line crosses a closed region an even number of times, so
+    # pairing the sorted crossings pairs each line's own entries and exits.
+    start = np.column_stack((x[0::2], y[0::2]))
+    end = np.column_stack((x[1::2], y[1::2]))
+    inside = end[:, 0] > start[:, 0]
+    start, end, line = start[inside], end[inside], line[0::2][inside]
+    # Serpentine: every other scan line runs right to left, spans included.
+    reverse = line % 2 == 1
+    start[reverse], end[reverse] = end[reverse], start[reverse]
+    order = np.lexsort((np.where(reverse, -start[:, 0], start[:, 0]), line))
+    segments = np.stack((start[order], end[order]), axis=1)
+    return _rotate(segments.reshape(-1, 2), angle).reshape(-1, 2, 2)
+
+
+def apply_waveform(path: np.ndarray, waveform: str,
+                   amplitude: float = WAVE_AMPLITUDE,
+                   wavelength: float = WAVE_LENGTH) -> np.ndarray:
+    """
+    Lays a waveform along a polyline (m x 2). The path is resampled every
+    half wavelength and the samples are pushed ``amplitude`` to the left
+    of the path on alternate steps: straight between them for
+    ``sawtooth``, with a sideways step at each sample for ``square``.
+    Other waveforms return the path unchanged.
+    """
+    if waveform not in ("sawtooth", "square") or len(path) < 2:
+        return path
+    step = np.diff(path, axis=0)
+    length = np.hypot(step[:, 0], step[:, 1])
+    travelled = np.concatenate(([0.0], np.cumsum(length)))
+    total = travelled[-1]
+    if total <= 0:
+        return path
+    count = max(int(np.ceil(total / (wavelength / 2))), 1)
+    distance = np.linspace(0.0, total, count + 1)
+    points = np.column_stack((np.interp(distance, travelled, path[:, 0]),
+                              np.interp(distance, travelled, path[:, 1])))
+    segment = np.clip(np.searchsorted(travelled, distance, side="right") - 1,
+                      0, len(step) - 1)
+    moving = length[segment] > 0
+    direction = np.zeros_like(points)
+    direction[moving] = step[segment[moving]] / length[segment[moving],
+                                                       None]
+    normal = np.column_stack((-direction[:, 1], direction[:, 0]))
+    level = amplitude * (np.arange(count + 1) % 2)
+    if waveform == "sawtooth":
+        return points + normal * level[:, None]
+    # Square: hold the previous level up to each sample, then step.
+    held = np.concatenate(([0.0], level[:-1]))
+    square = np.empty((2 * (count + 1), 2))
+    square[0::2] = points + normal * held[:, None]
+    square[1::2] = points + normal * level[:, None]
+    # The first sample has no step.
+    return square[1:]
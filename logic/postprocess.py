@@ -0,0 +1,257 @@
+"""
+Post-processing pipeline for generated and loaded G-code.
+
+A pipeline is a list of stages declared in config, e.g.::
+
+    [{"stage": "m3_m5"},
+     {"stage": "feed_scale", "factor": 0.8},
+     {"stage": "strip_comments"},
+     {"stage": "line_numbers", "checksum": true}]
+
+Every stage maps one line to a line, or to None to drop it. The pipeline
+reads its input once and runs all stages over batches of lines before
+writing them, timing each stage, so adding a stage does not add another
+read and write of the file.
+"""
+import itertools
+import json
+import re
+import time
+from dataclasses import dataclass, replace
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    TextIO)
+
+from logic.gcode import m3_m5_line
+from logic.toolpath import Toolpath
+
+# Lines run through every stage per batch.
+BATCH_LINES = 8192
+
+DEFAULT_PIPELINE: List[Dict[str, Any]] = [{"stage": "m3_m5"}]
+
+MACRO_RE = re.compile(r'^\s*([GMTgmt]\d+)\s*(;.*)?$')
+COMMENT_RE = re.compile(r'\(.*?\)|;.*')
+FEED_RE = re.compile(r'F(-?\d*\.?\d+)')
+
+
+@dataclass
+class Stage:
+    """
+    One post-processing step: ``line`` maps a line (without its newline)
+    to the output line or None; ``toolpath`` is the same step on parsed
+    arrays, None for stages that do not change the geometry or feeds.
+    """
+    name: str
+    line: Callable[[str], Optional[str]]
+    toolpath: Optional[Callable[[Toolpath], Toolpath]] = None
+
+
+def m3_m5_stage() -> Stage:
+    """Ultrasound macro call for M3 and commented-out M5."""
+    return Stage("m3_m5", m3_m5_line)
+
+
+def strip_comments_stage() -> Stage:
+    """Removes comments and drops lines left empty."""
+    def line(text: str) -> Optional[str]:
+        if ";" not in text and "(" not in text:
+            return text if text.strip() else None
+        text = COMMENT_RE.sub("", text).rstrip()
+        return text if text.strip() else None
+    return Stage("strip_comments", line)
+
+
+def line_checksum(text: str) -> int:
+    """RepRap line checksum: XOR of every character before the ``*``."""
+    value = 0
+    for byte in text.encode("ascii", "replace"):
+        value ^= byte
+    return value
+
+
+def line_numbers_stage(start: int = 1, step: int = 1,
+                       checksum: bool = True) -> Stage:
+    """
+    Prefixes every command line with ``N<n>`` and, optionally, appends the
+    ``*<checksum>`` the firmware verifies. Trailing comments are dropped
+    from numbered lines; comment-only and blank lines are left as they are.
+    """
+    number = itertools.count(start, step)
+
+    def line(text: str) -> Optional[str]:
+        if ";" in text or "(" in text:
+            command = COMMENT_RE.sub("", text).strip()
+        else:
+            command = text.strip()
+        if not command:
+            return text
+        numbered = f"N{next(number)} {command}"
+        if checksum:
+            return f"{numbered}*{line_checksum(numbered)}"
+        return numbered
+    return Stage("line_numbers", line)
+
+
+def macro_stage(macros: Dict[str, str]) -> Stage:
+    """
+    Replaces lines that consist of a single code (``M7``, ``M106``, ...)
+    and an optional comment with the configured text, like M3 -> M98.
+    """
+    table = {code.upper(): text for code, text in macros.items()}
+
+    def line(text: str) -> Optional[str]:
+        match = MACRO_RE.match(text)
+        if match is None:
+            return text
+        return table.get(match.group(1).upper(), text)
+    return Stage("macro", line)
+
+
+def feed_scale_stage(factor: float, decimals: int = 1) -> Stage:
+    """Multiplies every F word, outside comments, by ``factor``."""
+    # Feeds repeat throughout a program; format each value once.
+    scaled: Dict[str, str] = {}
+
+    def scale(match: "re.Match[str]") -> str:
+        word = match.group(0)
+        if word not in scaled:
+            scaled[word] = f"F{float(match.group(1)) * factor:.{decimals}f}"
+        return scaled[word]
+
+    def line(text: str) -> Optional[str]:
+        if "F" not in text:
+            return text
+        code, semicolon, comment = text.partition(";")
+        return FEED_RE.sub(scale, code) + semicolon + comment
+
+    def toolpath(path: Toolpath) -> Toolpath:
+        columns = replace(path.columns, f=path.columns.f * factor)
+        return replace(path, f=path.f * factor, columns=columns)
+    return Stage("feed_scale", line, toolpath)
+
+
+# Stage name -> factory taking the stage's config options.
+STAGES: Dict[str, Callable[..., Stage]] = {
+    "m3_m5": m3_m5_stage,
+    "strip_comments": strip_comments_stage,
+    "line_numbers": line_numbers_stage,
+    "macro": macro_stage,
+    "feed_scale": feed_scale_stage,
+}
+
+
+class Pipeline:
+    """
+    Ordered stages run as one pass over the lines, with the time spent in
+    each stage accumulated in ``timings`` (seconds per stage name).
+    Stages may keep state (line numbers), so use a new pipeline per file.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.timings: Dict[str, float] = {stage.name: 0.0 for stage in stages}
+        self.lines_in = 0
+        self.lines_out = 0
+
+    def process_batch(self, lines: List[str]) -> List[str]:
+        """Runs every stage over a batch of lines without newlines."""
+        self.lines_in += len(lines)
+        timings = self.timings
+        for stage in self.stages:
+            started = time.perf_counter()
+            lines = [out for out in map(stage.line, lines) if out is not None]
+            timings[stage.name] += time.perf_counter() - started
+        self.lines_out += len(lines)
+        return lines
+
+    def _batches(self, lines: Iterable[str]) -> Iterator[List[str]]:
+        stripped = (line.rstrip("\r\n") for line in lines)
+        while True:
+            batch = list(itertools.islice(stripped, BATCH_LINES))
+            if not batch:
+                return
+            yield self.process_batch(batch)
+
+    def process(self, lines: Iterable[str]) -> Iterator[str]:
+        """Streams lines (with or without newlines) through the stages."""
+        for batch in self._batches(lines):
+            yield from batch
+
+    def process_text(self, text: str) -> str:
+        """Processes G-code held in a string."""
+        return "\n".join(self.process_batch(text.splitlines()))
+
+    def process_stream(self, source: TextIO, destination: TextIO) -> int:
+        """
+        Copies a text stream through the stages batch by batch.
+
+        :return: number of lines written
+        """
+        written = 0
+        for batch in self._batches(source):
+            if batch:
+                destination.write("\n".join(batch))
+                destination.write("\n")
+                written += len(batch)
+        return written
+
+    def process_file(self, input_path: str, output_path: str,
+                     header: str = "") -> int:
+        """Post-processes a file into another; returns the lines written."""
+        with open(input_path, "r") as source, \
+                open(output_path, "w") as destination:
+            destination.write(header)
+            return self.process_stream(source, destination)
+
+    def process_toolpath(self, path: Toolpath) -> Toolpath:
+        """
+        Applies the stages that change geometry or feeds to parsed arrays;
+        text-only stages leave them as they are.
+        """
+        for stage in self.stages:
+            if stage.toolpath is not None:
+                started = time.perf_counter()
+                path = stage.toolpath(path)
+                self.timings[stage.name] += time.perf_counter() - started
+        return path
+
+
+def build_pipeline(config: Optional[List[Dict[str, Any]]] = None) -> Pipeline:
+    """
+    Builds a pipeline from its config: a list of ``{"stage": name, ...}``
+    entries whose other keys are passed to the stage. None gives
+    DEFAULT_PIPELINE.
+    """
+    stages = []
+    for entry in DEFAULT_PIPELINE if config is None else config:
+        options = dict(entry)
+        name = options.pop("stage", None)
+        if name not in STAGES:
+            raise ValueError(f"Unknown post-processing stage '{name}'")
+        try:
+            stages.append(STAGES[name](**options))
+        except TypeError as e:
+            raise ValueError(f"Invalid options for stage '{name}': {e}")
+    return Pipeline(stages)
+
+
+def read_pipeline_config(path: Optional[str]
+                         ) -> Optional[List[Dict[str, Any]]]:
+    """Reads a pipeline config from a JSON file; None for no file."""
+    if path is None:
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_pipeline(path: Optional[str]) -> Pipeline:
+    """Builds a pipeline from a JSON config file, or the default for None."""
+    return build_pipeline(read_pipeline_config(path))
+
+
+def format_timings(pipeline: Pipeline) -> str:
+    """Formats per-stage timings for the status bar or the CLI."""
+    stages = ", ".join(f"{name} {seconds * 1000:.1f} ms"
+                       for name, seconds in pipeline.timings.items())
+    return (f"{pipeline.lines_in} lines in, {pipeline.lines_out} out; "
+            f"{stages}")
@@ -0,0 +1,196 @@
+import mmap
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from logic.io_utils import (build_line_index, line_index, mapped_file,
+                            read_toolpath)
+from logic.layer_index import find_layer_starts, layer_of_rows, marker_rows
+from logic.toolpath import Toolpath, move_segments, parse_bytes, resolve_modal
+
+
+@dataclass
+class PreviewSegments:
+    """
+    XY segments of a toolpath grouped for drawing.
+
+    ``layer[i]`` indexes ``heights``, the Z of every layer in program
+    order; ``travel`` marks G0 moves.
+    """
+    x0: np.ndarray
+    y0: np.ndarray
+    x1: np.ndarray
+    y1: np.ndarray
+    travel: np.ndarray
+    layer: np.ndarray
+    heights: np.ndarray
+
+
+def preview_segments(toolpath: Toolpath,
+                     markers: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                     ) -> PreviewSegments:
+    """
+    Extracts the drawable segments of a resolved toolpath.
+
+    Layers follow ``find_layer_starts``, like the layer index and the
+    statistics report. Moves before the first layer get a layer of their
+    own at Z0 when there are any.
+
+    :param markers: layer markers of the program, as returned by
+        ``marker_rows``; layers follow Z changes alone without them
+    """
+    rows, x0, y0, x1, y1 = move_segments(toolpath)
+    if markers is None:
+        markers = (np.empty(0, dtype=np.int64), np.empty(0))
+    starts, heights, _ = find_layer_starts(toolpath, markers)
+    layer = layer_of_rows(starts, len(toolpath))[rows]
+    if len(layer) and layer.min() == 0:
+        heights = np.concatenate(([0.0], heights))
+    else:
+        layer = layer - 1
+    return PreviewSegments(x0=x0, y0=y0, x1=x1, y1=y1,
+                           travel=toolpath.motion[rows] == 0.0,
+                           layer=layer, heights=heights)
+
+
+def preview_bytes(data: Union[bytes, mmap.mmap]) -> PreviewSegments:
+    """Extracts the drawable segments of a program held in a buffer."""
+    return preview_segments(resolve_modal(parse_bytes(data)),
+                            marker_rows(data, build_line_index(data)))
+
+
+def preview_text(text: str) -> PreviewSegments:
+    """Extracts the drawable segments of G-code held in a string."""
+    return preview_bytes(text.encode("ascii", "replace"))
+
+
+def preview_file(path: str) -> PreviewSegments:
+    """Extracts the drawable segments of a G-code file."""
+    toolpath = read_toolpath(path)
+    with mapped_file(path) as data:
+        markers = marker_rows(data, line_index(path))
+    return preview_segments(toolpath, markers)
+
+
+def select_layers(segments: PreviewSegments, first: int,
+                  last: Optional[int] = None) -> np.ndarray:
+    """Returns the indices of the segments on layers ``first..last``."""
+    last = first if last is None else last
+    return np.flatnonzero((segments.layer >= first) & (segments.layer <= last))
+
+
+def decimate(segments: PreviewSegments, selection: np.ndarray,
+             width: int, height: int, margin: int = 10,
+             bounds: Optional[Tuple[float, float, float, float]] = None
+             ) -> List[Tuple[bool, np.ndarray]]:
+    """
+    Reduces segments to what can be seen at screen resolution.
+
+    Segments are snapped to pixels. Those that collapse to a single pixel
+    (the teeth of sawtooth and square waveforms at most zoom levels) are
+    binned per pixel column into one vertical span. Of the remaining
+    segments, each distinct pair of end pixels is kept once, so the teeth
+    of a waveform that retrace the same pixels, or the same outline on
+    several layers, add nothing. The kept segments are chained into
+    polylines in program order, dropping vertices between collinear pixel
+    steps. The work is a fixed number of array passes over the selection,
+    and the output grows with the distinct pixel segments on screen
+    rather than with the program.
+
+    :param segments: output of ``preview_segments``
+    :param selection: indices of the segments to draw
+    :param width: canvas width in pixels
+    :param height: canvas height in pixels
+    :param bounds: (xmin, ymin, xmax, ymax) to fit; the selection's own
+        extent when omitted
+    :return: list of (is_travel, flat x/y pixel coordinates) polylines
+    """
+    if len(selection) == 0:
+        return []
+    x0, y0 = segments.x0[selection], segments.y0[selection]
+    x1, y1 = segments.x1[selection], segments.y1[selection]
+    travel = segments.travel[selection]
+    if bounds is None:
+        bounds = (min(x0.min(), x1.min()), min(y0.min(), y1.min()),
+                  max(x0.max(), x1.max()), max(y0.max(), y1.max()))
+    xmin, ymin, xmax, ymax = bounds
+    span = max(xmax - xmin, ymax - ymin) or 1.0
+    scale = min(width - 2 * margin, height - 2 * margin) / span
+
+    def to_pixels(x, y):
+        px = np.rint((x - xmin) * scale + margin).astype(np.int64)
+        py = np.rint(height - margin - (y - ymin) * scale).astype(np.int64)
+        return px, py
+
+    px0, py0 = to_pixels(x0, y0)
+    px1, py1 = to_pixels(x1, y1)
+    polylines: List[Tuple[bool, np.ndarray]] = []
+
+    short = (px1 == px0) & (py1 == py0)
+    if short.any():
+        key = px1[short] * 2 + travel[short]
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        lo = np.minimum(py0[short], py1[short])[order]
+        hi = np.maximum(py0[short], py1[short])[order]
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        lo = np.minimum.reduceat(lo, starts)
+        hi = np.maximum.reduceat(hi, starts) + 1
+        for k, top, bottom in zip(key[starts], lo, hi):
+            column = k // 2
+            polylines.append((bool(k % 2),
+                              np.array([column, top, column, bottom])))
+
+    # Each pixel segment is drawn once, whichever way and however often
+    # the program runs along it; program order is kept for chaining.
+    keep = np.flatnonzero(~short)
+    swap = (px0[keep] > px1[keep]) | ((px0[keep] == px1[keep])
+                                      & (py0[keep] > py1[keep]))
+    edges = np.column_stack((
+        travel[keep], np.where(swap, px1[keep], px0[keep]),
+        np.where(swap, py1[keep], py0[keep]),
+        np.where(swap, px0[keep], px1[keep]),
+        np.where(swap, py0[keep], py1[keep])))
+    _, first = np.unique(edges, axis=0, return_index=True)
+    keep = keep[np.sort(first)]
+    px0, py0, px1, py1 = px0[keep], py0[keep], px1[keep], py1[keep]
+    travel = travel[keep]
+    n = len(px0)
+    if n:
+        dx, dy = px1 - px0, py1 - py0
+        new_chain = np.ones(n, dtype=bool)
+        new_chain[1:] = ((px0[1:] != px1[:-1]) | (py0[1:] != py1[:-1])
+                         | (travel[1:] != travel[:-1]))
+        collinear = np.zeros(n, dtype=bool)
+        collinear[1:] = ((dx[:-1] * dy[1:] == dy[:-1] * dx[1:])
+                         & (dx[:-1] * dx[1:] + dy[:-1] * dy[1:] > 0))
+        merged = ~new_chain & collinear
+
+        # Each chain contributes its start point and every segment end
+        # whose following vertex is not merged away.
+        keep_end = np.ones(n, dtype=bool)
+        keep_end[:-1] = ~merged[1:]
+        chain_starts = np.flatnonzero(new_chain)
+        ends = np.flatnonzero(keep_end)
+        point_x = np.concatenate((px0[chain_starts], px1[ends]))
+        point_y = np.concatenate((py0[chain_starts], py1[ends]))
+        # Order points by segment, putting each chain start before the end
+        # point of its first segment.
+        point_order = np.argsort(np.concatenate((chain_starts * 2,
+                                                 ends * 2 + 1)))
+        point_x, point_y = point_x[point_order], point_y[point_order]
+        chain_id = np.cumsum(new_chain) - 1
+        point_chain = np.concatenate((chain_id[chain_starts],
+                                      chain_id[ends]))[point_order]
+        splits = np.flatnonzero(np.diff(point_chain)) + 1
+        flat = np.column_stack((point_x, point_y)).ravel()
+        seen = set()
+        for chain, coords in zip(chain_starts,
+                                 np.split(flat, splits * 2)):
+            signature = (bool(travel[chain]), coords.tobytes())
+            if signature not in seen:
+                seen.add(signature)
+                polylines.append((signature[0], coords))
+
+    return polylines
@@ -1,7 +1,10 @@
 from math import cos, sin, pi
 
-def print_cylinder(destination, x_center, y_center, z_value, radius, segments, feedrate, waveform: str):
-    destination.write(f"; Print Cylinder Start ({waveform} waveform)\n")
+from logic.streams import write_lines
+
+def iter_print_cylinder(x_center, y_center, z_value, radius, segments, feedrate, waveform: str, verbosity: str = "full", amplitude=None):
+    if verbosity != "none":
+        yield f"; Print Cylinder Start ({waveform} waveform)\n"
 
     # Calculate the angle increment for each segment
     angle_increment = 2 * pi / segments
@@ -14,7 +17,8 @@ def print_cylinder(destination, x_center, y_center, z_value, radius, segments, f
             # For a cylinder, a sawtooth could mean the radius oscillates slightly
             # or there's a small radial "sawtooth" pattern as it draws.
             # Example: Vary radius based on angle (simple sawtooth)
-            sawtooth_amplitude = 0.2 * radius # Example: 20% of radius
+            # Example: 20% of radius unless an amplitude is given
+            sawtooth_amplitude = 0.2 * radius if amplitude is None else amplitude
             # Simple oscillation, could be more complex
             current_radius = radius + sawtooth_amplitude * ((angle % (2 * pi / 4)) / (2 * pi / 4) - 0.5) # Example oscillation
 
@@ -56,7 +60,12 @@ def print_cylinder(destination, x_center, y_center, z_value, radius, segments, f
             y = y_center + radius * sin(angle)
 
         # G1: Linear interpolation move
-        destination.write(f"G1 X{x:.3f} Y{y:.3f} Z{z_value:.3f} F{feedrate}\n")
+        yield f"G1 X{x:.3f} Y{y:.3f} Z{z_value:.3f} F{feedrate}\n"
+
+    if verbosity != "none":
+        yield "; Print Cylinder End\n"
+    
+
 
-    destination.write("; Print Cylinder End\n")
-    
\ No newline at end of file
+def print_cylinder(destination, x_center, y_center, z_value, radius, segments, feedrate, waveform: str, verbosity: str = "full", amplitude=None):
+    return write_lines(destination, iter_print_cylinder(x_center, y_center, z_value, radius, segments, feedrate, waveform, verbosity, amplitude))
@@ -1,10 +1,13 @@
 import math # You might need math functions like sin, cos
 
-def print_layer0(destination, x_start, y_start, x_end, y_end, z_value, feedrate, waveform: str):
-    destination.write(f"; Print Layer0 Start ({waveform} waveform)\n")
+from logic.streams import write_lines
+
+def iter_print_layer0(x_start, y_start, x_end, y_end, z_value, feedrate, waveform: str, verbosity: str = "full"):
+    if verbosity != "none":
+        yield f"; Print Layer0 Start ({waveform} waveform)\n"
 
     # G0: Rapid positioning move to the start point
-    destination.write(f"G0 X{x_start} Y{y_start} Z{z_value}\n")
+    yield f"G0 X{x_start} Y{y_start} Z{z_value}\n"
 
     if waveform == "sawtooth":
         # --- Sawtooth Waveform Logic for a line ---
@@ -26,9 +29,10 @@ def print_layer0(destination, x_start, y_start, x_end, y_end, z_value, feedrate,
                 else:
                     current_y = y_start + dy_amplitude
 
-                destination.write(f"G1 X{current_x:.3f} Y{current_y:.3f} Z{z_value:.3f} F{feedrate}\n")
+                yield f"G1 X{current_x:.3f} Y{current_y:.3f} Z{z_value:.3f} F{feedrate}\n"
 
-        destination.write("; End of Saw-tooth Layer0\n")
+        if verbosity == "full":
+            yield "; End of Saw-tooth Layer0\n"
 
     elif waveform == "square":
         # --- Square Waveform Logic for a line ---
@@ -37,13 +41,20 @@ def print_layer0(destination, x_start, y_start, x_end, y_end, z_value, feedrate,
         # Here, let's assume it means a "blockier" path or perhaps a simpler straight line.
 
         # This could be a very basic straight line if "square" means no oscillation
-        destination.write(f"G1 X{x_end:.3f} Y{y_end:.3f} Z{z_value:.3f} F{feedrate}\n")
-        destination.write("; End of Square Wave Layer0 (Straight line for simplicity)\n")
+        yield f"G1 X{x_end:.3f} Y{y_end:.3f} Z{z_value:.3f} F{feedrate}\n"
+        if verbosity == "full":
+            yield "; End of Square Wave Layer0 (Straight line for simplicity)\n"
 
     else:
         # Fallback for unexpected waveform values, or generate a default pattern
-        destination.write(f"; Warning: Unknown waveform '{waveform}'. Generating default straight line.\n")
-        destination.write(f"G1 X{x_end:.3f} Y{y_end:.3f} Z{z_value:.3f} F{feedrate}\n")
+        if verbosity == "full":
+            yield f"; Warning: Unknown waveform '{waveform}'. Generating default straight line.\n"
+        yield f"G1 X{x_end:.3f} Y{y_end:.3f} Z{z_value:.3f} F{feedrate}\n"
+
+    if verbosity != "none":
+        yield "; Print Layer0 End\n"
+    
+
 
-    destination.write("; Print Layer0 End\n")
-    
\ No newline at end of file
+def print_layer0(destination, x_start, y_start, x_end, y_end, z_value, feedrate, waveform: str, verbosity: str = "full"):
+    return write_lines(destination, iter_print_layer0(x_start, y_start, x_end, y_end, z_value, feedrate, waveform, verbosity))
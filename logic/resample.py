@@ -0,0 +1,238 @@
+"""
+Resampling of dense waveform paths to a controller's segment rate.
+
+A controller plans a limited number of segments per second. A move of
+length ``L`` at feed ``F`` (mm/min) takes ``60 * L / F`` seconds, so runs
+of sawtooth or square teeth a few tenths of a millimetre long can ask for
+more segments than the planner keeps up with, and the machine stutters.
+
+The resampler walks each run of consecutive G1 moves in the XY plane
+(same Z, A and feed, nothing but comments between them). From every kept
+point it skips ahead until the chord is long enough for the rate, but
+only over points that stay within ``tolerance`` of the chord, so the
+waveform amplitude changes by at most that much. Chords that are still
+too short, such as the teeth of a waveform whose amplitude is larger
+than the tolerance, get a feed slow enough for the rate instead.
+
+Feeds are rewritten with ``logic.motion.rewrite_feeds``, so F words are
+only added where the modal feed changes.
+"""
+import math
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from logic.io_utils import iter_mapped_lines, read_toolpath
+from logic.motion import MIN_FEED, rewrite_feeds
+from logic.toolpath import Toolpath, parse_bytes, resolve_modal
+
+
+@dataclass
+class ResampleReport:
+    """
+    Segments of the XY feed runs before and after resampling.
+
+    Rates are in segments per second: ``peak_rate`` is the fastest
+    single segment and ``mean_rate`` the segment count over the time the
+    runs take at their feeds. ``max_error`` is the largest distance (mm)
+    of a dropped point from its new chord; ``slowed`` moves got a lower F.
+    """
+    segments_before: int = 0
+    segments_after: int = 0
+    peak_rate_before: float = 0.0
+    peak_rate_after: float = 0.0
+    mean_rate_before: float = 0.0
+    mean_rate_after: float = 0.0
+    max_error: float = 0.0
+    slowed: int = 0
+
+
+def _distance(px: float, py: float, ax: float, ay: float,
+              bx: float, by: float) -> float:
+    """Distance from a point to the segment a-b."""
+    dx, dy = bx - ax, by - ay
+    length2 = dx * dx + dy * dy
+    t = 0.0
+    if length2 > 0.0:
+        t = min(max(((px - ax) * dx + (py - ay) * dy) / length2, 0.0), 1.0)
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+def _chord(xs: List[float], ys: List[float], start: int, end: int) -> float:
+    return math.hypot(xs[end] - xs[start], ys[end] - ys[start])
+
+
+def _deviation(xs: List[float], ys: List[float], start: int, end: int) -> float:
+    """Largest distance of the points between ``start`` and ``end`` from their chord."""
+    ax, ay, bx, by = xs[start], ys[start], xs[end], ys[end]
+    return max((_distance(xs[k], ys[k], ax, ay, bx, by)
+                for k in range(start + 1, end)), default=0.0)
+
+
+def _feed_runs(path: Toolpath
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns ``(rows, run, start_x, start_y)``: the rows of the G1 moves in
+    the XY plane, a run number for each (moves of one run can be
+    resampled together) and the XY position each move starts from.
+    """
+    columns = path.columns
+    moves = np.flatnonzero(path.is_move)
+    previous = np.concatenate(([0], moves[:-1]))
+    first = np.arange(len(moves)) == 0
+    starts = {axis: np.where(first, 0.0, getattr(path, axis)[previous])
+              for axis in ("x", "y", "z", "a")}
+    planar = ((path.motion[moves] == 1.0)
+              & (np.hypot(path.x[moves] - starts["x"],
+                          path.y[moves] - starts["y"]) > 0.0)
+              & (path.z[moves] == starts["z"]) & (path.a[moves] == starts["a"])
+              & np.isnan(columns.m[moves]) & ~columns.g92[moves])
+    rows = moves[planar]
+    # Two moves are in one run if only comments or blank lines lie between.
+    barrier = path.is_move | columns.g4 | columns.g92 | ~np.isnan(columns.m)
+    count = np.cumsum(barrier)
+    joined = np.zeros(len(rows), dtype=bool)
+    if len(rows) > 1:
+        joined[1:] = ((count[rows[1:] - 1] == count[rows[:-1]])
+                      & (path.f[rows[1:]] == path.f[rows[:-1]]))
+    return rows, np.cumsum(~joined), starts["x"][planar], starts["y"][planar]
+
+
+def plan_resample(path: Toolpath, max_rate: float, tolerance: float = 0.02,
+                  feed: Optional[float] = None, slow_down: bool = True
+                  ) -> Tuple[List[int], np.ndarray, np.ndarray,
+                             ResampleReport]:
+    """
+    Plans which points of the XY feed runs to drop and which feeds to
+    lower so no segment exceeds ``max_rate`` segments per second.
+
+    :param max_rate: segments per second the controller keeps up with
+    :param tolerance: largest distance (mm) a dropped point may have from
+        the chord that replaces it
+    :param feed: mm/min the moves run at, if not their commanded F (e.g.
+        with a feed override); lowered feeds never exceed it
+    :param slow_down: lower the feed of chords that stay too short;
+        otherwise they are kept as they are
+    :return: ``(dropped, rows, feeds, report)`` with the 0-based lines to
+        drop, and the rows of the kept moves with their F in mm/min
+    """
+    if max_rate <= 0.0:
+        raise ValueError("The segment rate must be positive")
+    if np.any(path.columns.g_distance == 91.0):
+        raise ValueError("Resampling supports G90 programs only")
+    if np.any(path.columns.g_units == 20.0):
+        raise ValueError("Resampling supports G21 (mm) programs only")
+    rows, run, start_x, start_y = _feed_runs(path)
+    report = ResampleReport(segments_before=len(rows))
+    if not len(rows):
+        return [], rows, np.empty(0), report
+
+    commanded = np.maximum(path.f[rows], MIN_FEED)
+    speed = (commanded if feed is None
+             else np.minimum(commanded, max(feed, MIN_FEED))) / 60.0
+    length = np.hypot(path.x[rows] - start_x, path.y[rows] - start_y)
+    report.peak_rate_before = float(np.max(speed / length))
+    report.mean_rate_before = float(len(rows) / np.sum(length / speed))
+
+    dropped: List[int] = []
+    kept_rows: List[int] = []
+    kept_feeds: List[float] = []
+    kept_lengths: List[float] = []
+    bounds = np.flatnonzero(np.diff(run, prepend=0, append=run[-1] + 1))
+    for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        xs = [float(start_x[lo])] + path.x[rows[lo:hi]].tolist()
+        ys = [float(start_y[lo])] + path.y[rows[lo:hi]].tolist()
+        shortest = float(speed[lo]) / max_rate
+        n = hi - lo
+        points = [0]
+        while points[-1] < n:
+            anchor = points[-1]
+            end = anchor + 1
+            while (end < n and _chord(xs, ys, anchor, end) < shortest
+                   and _deviation(xs, ys, anchor, end + 1) <= tolerance):
+                end += 1
+            points.append(end)
+        # A short last chord cannot reach further, so merge it backwards.
+        while (len(points) > 2 and _chord(xs, ys, points[-2], n) < shortest
+               and _deviation(xs, ys, points[-3], n) <= tolerance):
+            del points[-2]
+        for anchor, end in zip(points[:-1], points[1:]):
+            chord = _chord(xs, ys, anchor, end)
+            if end - anchor > 1:
+                report.max_error = max(report.max_error,
+                                       _deviation(xs, ys, anchor, end))
+                dropped.extend(rows[lo + anchor:lo + end - 1].tolist())
+            line_feed = float(commanded[lo])
+            if chord < shortest and slow_down:
+                slowest = math.floor(chord * max_rate * 60.0)
+                line_feed = min(line_feed, max(float(slowest), MIN_FEED))
+                report.slowed += 1
+            kept_rows.append(int(rows[lo + end - 1]))
+            kept_feeds.append(line_feed)
+            kept_lengths.append(chord)
+
+    after_speed = np.minimum(np.array(kept_feeds) / 60.0,
+                             speed[np.searchsorted(rows, kept_rows)])
+    after_length = np.array(kept_lengths)
+    report.segments_after = len(kept_rows)
+    report.peak_rate_after = float(np.max(after_speed / after_length))
+    report.mean_rate_after = float(len(kept_rows)
+                                   / np.sum(after_length / after_speed))
+    # The move after a run gets its own feed back if the run ended slower.
+    kept = np.array(kept_rows)
+    moves = np.flatnonzero(path.is_move)
+    after = np.searchsorted(moves, rows[bounds[1:] - 1], side="right")
+    after = moves[after[after < len(moves)]]
+    after = np.setdiff1d(after, np.concatenate((kept, dropped)))
+    targets = np.concatenate((kept, after))
+    feeds = np.concatenate((kept_feeds, path.f[after]))
+    order = np.argsort(targets, kind="stable")
+    return dropped, targets[order], feeds[order], report
+
+
+def apply_resample(lines: Iterable[str], dropped: List[int],
+                   rows: np.ndarray, feeds: np.ndarray) -> Iterator[str]:
+    """
+    Yields the lines (without newlines) without the dropped points and
+    with the feeds of ``rows`` set to ``feeds``.
+    """
+    skip = np.array(sorted(dropped), dtype=np.int64)
+    renumbered = rows - np.searchsorted(skip, rows)
+    drop = set(dropped)
+    kept = (line for number, line in enumerate(lines) if number not in drop)
+    return rewrite_feeds(kept, renumbered, feeds)
+
+
+def resample_text(text: str, max_rate: float, tolerance: float = 0.02,
+                  feed: Optional[float] = None, slow_down: bool = True
+                  ) -> Tuple[str, ResampleReport]:
+    """Resamples G-code held in a string; see ``plan_resample``."""
+    path = resolve_modal(parse_bytes(text.encode("ascii", "replace")))
+    dropped, rows, feeds, report = plan_resample(path, max_rate, tolerance,
+                                                 feed, slow_down)
+    return "\n".join(apply_resample(text.split("\n"), dropped, rows,
+                                    feeds)), report
+
+
+def resample_file(input_path: str, destination: TextIO, max_rate: float,
+                  tolerance: float = 0.02, feed: Optional[float] = None,
+                  slow_down: bool = True) -> ResampleReport:
+    """Resamples a file line by line into ``destination``."""
+    dropped, rows, feeds, report = plan_resample(
+        read_toolpath(input_path), max_rate, tolerance, feed, slow_down)
+    lines = (line.decode("ascii", "replace")
+             for line in iter_mapped_lines(input_path))
+    for line in apply_resample(lines, dropped, rows, feeds):
+        destination.write(line + "\n")
+    return report
+
+
+def format_resample_report(report: ResampleReport) -> str:
+    """Formats a ResampleReport for the results pane or the CLI."""
+    return (f"Feed segments {report.segments_before} -> "
+            f"{report.segments_after}: peak rate "
+            f"{report.peak_rate_before:.0f} -> {report.peak_rate_after:.0f}"
+            f" /s, mean rate {report.mean_rate_before:.0f} -> "
+            f"{report.mean_rate_after:.0f} /s; max error "
+            f"{report.max_error:.3f} mm, {report.slowed} feeds lowered")
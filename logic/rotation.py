@@ -0,0 +1,196 @@
+"""
+Program-wide planning of A-axis rotations.
+
+The planner tracks the A angle across all operations of a program and
+rewrites its rotations:
+
+- A consecutive run of A-only moves, with nothing but comments between
+  them, becomes a single move to the run's final angle. This merges the
+  stepped and oscillating patterns of ``rotate`` and the repeated
+  ``print_block`` rotations. Runs made while the ultrasound is on (after
+  M3, before M5) are process motion and are kept as written.
+- A rotation to the angle the tool is already at is dropped. If the
+  dropped lines change the feed, a bare ``F`` line keeps it for the
+  moves that follow.
+- On a continuous axis, every merged rotation goes the short way round,
+  modulo 360 degrees. Later A words are shifted by the same whole turns,
+  so the rest of the program is unchanged.
+
+Run the planner before post-processing, while ultrasound is still M3/M5.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+import numpy as np
+
+from logic.io_utils import iter_mapped_lines, read_toolpath
+from logic.toolpath import Toolpath, parse_bytes, resolve_modal
+
+A_WORD_RE = re.compile(r"A\s*[-+]?(?:\d+\.?\d*|\.\d+)", re.IGNORECASE)
+FEED_WORD_RE = re.compile(r"F\s*[-+]?(?:\d+\.?\d*|\.\d+)", re.IGNORECASE)
+
+# Line edit: the new A angle (None drops the line) and a feed to append
+# (or, for a dropped line, to keep as a bare F line).
+Edit = Tuple[Optional[float], Optional[float]]
+
+
+@dataclass
+class RotationReport:
+    """A moves and A travel (degrees) before and after planning."""
+    a_moves_before: int = 0
+    a_moves_after: int = 0
+    travel_before: float = 0.0
+    travel_after: float = 0.0
+    runs_merged: int = 0
+
+    @property
+    def travel_saved(self) -> float:
+        return self.travel_before - self.travel_after
+
+
+def _wrap(angle: float) -> float:
+    """Maps an angle difference to [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+def plan_rotations(path: Toolpath, continuous: bool = True
+                   ) -> Tuple[Dict[int, Edit], RotationReport]:
+    """
+    Plans the A moves of a resolved toolpath.
+
+    :param continuous: the A axis has no end stops, so angles may be
+        taken modulo 360
+    :return: ``(edits, report)``, where ``edits`` maps 0-based lines to
+        their new A angle (None to drop them) and the feed to append
+        when the dropped lines of a merged run set it, or to write in
+        place of a dropped rotation that set it
+    """
+    columns = path.columns
+    if np.any(columns.g_distance == 91.0):
+        raise ValueError("Rotation planning supports G90 programs only")
+    if np.any(columns.g92 & ~np.isnan(columns.a)):
+        raise ValueError("Rotation planning does not support G92 A")
+
+    has_xyz = ~(np.isnan(columns.x) & np.isnan(columns.y)
+                & np.isnan(columns.z))
+    a_rows = np.flatnonzero(path.is_move & ~np.isnan(columns.a))
+    a_only = ~has_xyz[a_rows]
+    # Ultrasound is on after M3 until the next M5.
+    switch = np.where(columns.m == 3.0, 1.0,
+                      np.where(columns.m == 5.0, 0.0, np.nan))
+    last_switch = np.maximum.accumulate(
+        np.where(np.isnan(switch), -1, np.arange(len(switch))))
+    ultrasound = np.zeros(len(switch), dtype=bool)
+    known = last_switch >= 0
+    ultrasound[known] = switch[last_switch[known]] == 1.0
+    ultrasound = ultrasound[a_rows]
+    # Two A moves are in one run if nothing but comments lies between.
+    barrier = path.is_move | columns.g4 | ~np.isnan(columns.m)
+    count = np.cumsum(barrier)
+    joined = np.zeros(len(a_rows), dtype=bool)
+    if len(a_rows) > 1:
+        joined[1:] = ((count[a_rows[1:] - 1] == count[a_rows[:-1]])
+                      & a_only[1:] & a_only[:-1]
+                      & (ultrasound[1:] == ultrasound[:-1]))
+    starts = np.flatnonzero(~joined)
+    ends = np.append(starts[1:], len(a_rows))
+
+    report = RotationReport(a_moves_before=len(a_rows))
+    moves = np.flatnonzero(path.is_move)
+    if len(moves):
+        angles = np.concatenate(([0.0], path.a[moves]))
+        report.travel_before = float(np.sum(np.abs(np.diff(angles))))
+
+    edits: Dict[int, Edit] = {}
+    angles = path.a[a_rows].tolist()
+    rows = a_rows.tolist()
+    current = 0.0
+    offset = 0.0
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        merge = a_only[start] and not ultrasound[start]
+        if not merge:
+            for i in range(start, end):
+                angle = angles[i] + offset
+                report.travel_after += abs(angle - current)
+                report.a_moves_after += 1
+                current = angle
+                if offset:
+                    edits[rows[i]] = (angle, None)
+            continue
+        target = angles[end - 1] + offset
+        if continuous:
+            turns = round((current + _wrap(target - current) - target) / 360.0)
+            offset += 360.0 * turns
+            target += 360.0 * turns
+        for i in range(start, end - 1):
+            edits[rows[i]] = (None, None)
+        last = rows[end - 1]
+        if target == current:
+            first = a_rows[start]
+            before = float(path.f[first - 1]) if first else 0.0
+            feed = float(path.f[last])
+            edits[last] = (None, feed if feed != before else None)
+            continue
+        if end - start > 1:
+            dropped_feeds = columns.f[a_rows[start:end - 1]]
+            feed = None
+            if np.isnan(columns.f[last]) and not np.all(np.isnan(dropped_feeds)):
+                feed = float(path.f[last])
+            edits[last] = (target, feed)
+            report.runs_merged += 1
+        elif target != angles[start]:
+            edits[last] = (target, None)
+        report.travel_after += abs(target - current)
+        report.a_moves_after += 1
+        current = target
+    return edits, report
+
+
+def apply_rotations(lines: Iterable[str],
+                    edits: Dict[int, Edit]) -> Iterator[str]:
+    """Yields the lines (without newlines) with the planned A moves."""
+    for number, line in enumerate(lines):
+        line = line.rstrip("\r\n")
+        edit = edits.get(number)
+        if edit is None:
+            yield line
+            continue
+        angle, feed = edit
+        if angle is None:
+            if feed is not None:
+                yield f"F{feed:g}"
+            continue
+        code, semicolon, comment = line.partition(";")
+        code = A_WORD_RE.sub(f"A{angle:.3f}", code, count=1)
+        if feed is not None and not FEED_WORD_RE.search(code):
+            stripped = code.rstrip()
+            code = f"{stripped} F{feed:g}" + code[len(stripped):]
+        yield code + semicolon + comment
+
+
+def plan_rotations_text(text: str, continuous: bool = True
+                        ) -> Tuple[str, RotationReport]:
+    """Plans the A moves of G-code held in a string."""
+    path = resolve_modal(parse_bytes(text.encode("ascii", "replace")))
+    edits, report = plan_rotations(path, continuous)
+    return "\n".join(apply_rotations(text.split("\n"), edits)), report
+
+
+def plan_rotations_file(input_path: str, destination: TextIO,
+                        continuous: bool = True) -> RotationReport:
+    """Plans the A moves of a file line by line into ``destination``."""
+    edits, report = plan_rotations(read_toolpath(input_path), continuous)
+    lines = (line.decode("ascii", "replace")
+             for line in iter_mapped_lines(input_path))
+    for line in apply_rotations(lines, edits):
+        destination.write(line + "\n")
+    return report
+
+
+def format_rotation_report(report: RotationReport) -> str:
+    """Formats a RotationReport for the results pane or the CLI."""
+    return (f"A moves {report.a_moves_before} -> {report.a_moves_after} "
+            f"({report.runs_merged} runs merged), A travel "
+            f"{report.travel_before:.1f} -> {report.travel_after:.1f} deg "
+            f"({report.travel_saved:.1f} deg saved)")
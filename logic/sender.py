@@ -0,0 +1,397 @@
+"""
+Streams G-code to a machine controller over TCP or a serial port.
+
+Two flow controls are supported:
+
+- ``"ok"``: send one line and wait for its ``ok`` (or ``error``) reply.
+- ``"count"``: character counting. Lines are sent as long as the bytes
+  not yet acknowledged fit the controller's receive buffer, so the
+  buffer never runs dry between the short segments of the waveforms.
+
+``FakeController`` is a local TCP stand-in used to measure throughput and
+latency without hardware.
+"""
+import asyncio
+import re
+import socket
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (Callable, Deque, Iterable, List, Optional, Set,
+                    Tuple, Union)
+
+try:
+    import serial_asyncio
+except ImportError:  # pyserial-asyncio is only needed for serial ports
+    serial_asyncio = None
+
+from logic.io_utils import iter_mapped_lines
+
+FLOW_CONTROLS = ("ok", "count")
+# Receive buffer of the usual 8-bit controllers.
+RX_BUFFER_SIZE = 128
+DEFAULT_BAUDRATE = 115200
+
+# Real-time commands: executed on receipt, never stored in the buffer.
+FEED_HOLD = b"!"
+CYCLE_START = b"~"
+SOFT_RESET = b"\x18"
+REALTIME_RE = re.compile(rb"[!~\x18]")
+
+COMMENT_RE = re.compile(rb"\(.*?\)|;.*")
+
+Line = Union[str, bytes]
+
+
+def prepare_line(line: Line) -> bytes:
+    """
+    Strips comments and whitespace from a line and terminates it with a
+    newline; returns ``b""`` for lines with nothing to send.
+    """
+    if isinstance(line, str):
+        line = line.encode("ascii", "replace")
+    line = COMMENT_RE.sub(b"", line).strip()
+    return line + b"\n" if line else b""
+
+
+@dataclass
+class SenderStats:
+    """Counters of one streaming run."""
+    lines: int = 0
+    bytes: int = 0
+    acknowledged: int = 0
+    errors: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    aborted: bool = False
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean time from sending a line to its acknowledgement."""
+        return (self.total_latency / self.acknowledged
+                if self.acknowledged else 0.0)
+
+
+def format_stats(stats: SenderStats) -> str:
+    """Formats SenderStats for the status bar or the CLI."""
+    state = "Aborted" if stats.aborted else "Sent"
+    return (f"{state} {stats.lines} lines ({stats.bytes} bytes) in "
+            f"{stats.elapsed:.2f} s, {stats.lines_per_second:.0f} lines/s, "
+            f"latency mean {stats.mean_latency * 1000:.2f} ms / max "
+            f"{stats.max_latency * 1000:.2f} ms, {len(stats.errors)} errors")
+
+
+class GcodeSender:
+    """
+    Streams lines to a controller connected through an asyncio stream pair.
+
+    ``pause``, ``resume`` and ``abort`` may be called from other tasks of
+    the same event loop while ``send`` runs; from another thread use
+    ``loop.call_soon_threadsafe``.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter, flow: str = "count",
+                 buffer_size: int = RX_BUFFER_SIZE):
+        if flow not in FLOW_CONTROLS:
+            raise ValueError(f"Unknown flow control '{flow}'")
+        self.reader = reader
+        self.writer = writer
+        self.flow = flow
+        self.buffer_size = buffer_size
+        self.stats = SenderStats()
+        # (length, send time) of every line not yet acknowledged
+        self._in_flight: Deque[Tuple[int, float]] = deque()
+        self._in_flight_bytes = 0
+        self._wake = asyncio.Event()
+        self._paused = False
+        self._held = False
+        self._aborted = False
+        self._closed = False
+        # Why the response reader stopped, if it failed.
+        self._error: Optional[Exception] = None
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def pause(self, hold: bool = False) -> None:
+        """
+        Stops sending new lines; lines already buffered by the controller
+        still run unless ``hold`` also sends a feed hold.
+        """
+        self._paused = True
+        if hold and not self._held:
+            self.writer.write(FEED_HOLD)
+            self._held = True
+
+    def resume(self) -> None:
+        """Resumes sending, releasing the feed hold if one was sent."""
+        if self._held:
+            self.writer.write(CYCLE_START)
+            self._held = False
+        self._paused = False
+        self._wake.set()
+
+    def abort(self, reset: bool = True) -> None:
+        """
+        Stops streaming for good; ``reset`` also sends a soft reset so the
+        controller discards what it has buffered.
+        """
+        self._aborted = True
+        if reset:
+            self.writer.write(SOFT_RESET)
+        self._wake.set()
+
+    def _has_room(self, length: int) -> bool:
+        if not self._in_flight:
+            return True
+        if self.flow == "ok":
+            return False
+        return self._in_flight_bytes + length <= self.buffer_size
+
+    async def _read_responses(self) -> None:
+        stats = self.stats
+        try:
+            while True:
+                raw = await self.reader.readline()
+                if not raw:
+                    break
+                response = raw.strip().decode("ascii", "replace")
+                if response != "ok" and not response.startswith("error"):
+                    continue  # status reports and banners
+                if response != "ok":
+                    stats.errors.append(response)
+                if self._in_flight:
+                    length, sent_at = self._in_flight.popleft()
+                    self._in_flight_bytes -= length
+                    latency = time.perf_counter() - sent_at
+                    stats.total_latency += latency
+                    stats.max_latency = max(stats.max_latency, latency)
+                stats.acknowledged += 1
+                self._wake.set()
+        except Exception as error:
+            self._error = error
+        finally:
+            # The sender must wake up however the reader stops.
+            self._closed = True
+            self._wake.set()
+
+    async def _wait(self) -> None:
+        if self._closed:
+            if self._error is not None:
+                raise self._error
+            raise ConnectionError("Controller closed the connection")
+        # Cleared before draining: a response that arrives while the
+        # transport drains must still wake the sender.
+        self._wake.clear()
+        await self.writer.drain()
+        await self._wake.wait()
+
+    async def send(self, lines: Iterable[Line]) -> SenderStats:
+        """
+        Streams lines until they are all acknowledged or ``abort`` is
+        called. Comments and blank lines are not sent.
+
+        Lines are written without waiting for the transport to drain; it
+        is only drained when the flow control makes the sender wait, so a
+        full buffer of short lines goes out in one write.
+        """
+        stats = self.stats
+        responses = asyncio.ensure_future(self._read_responses())
+        started = time.perf_counter()
+        try:
+            for raw in lines:
+                line = prepare_line(raw)
+                if not line:
+                    continue
+                length = len(line)
+                while not self._aborted and (
+                        self._paused or not self._has_room(length)):
+                    await self._wait()
+                if self._aborted:
+                    break
+                self.writer.write(line)
+                self._in_flight.append((length, time.perf_counter()))
+                self._in_flight_bytes += length
+                stats.lines += 1
+                stats.bytes += length
+            while self._in_flight and not self._aborted:
+                await self._wait()
+            await self.writer.drain()
+        finally:
+            responses.cancel()
+            stats.elapsed = time.perf_counter() - started
+            stats.aborted = self._aborted
+        return stats
+
+
+async def open_tcp(host: str, port: int):
+    """Connects to a controller (or serial bridge) listening on TCP."""
+    return await asyncio.open_connection(host, port)
+
+
+async def open_serial(device: str, baudrate: int = DEFAULT_BAUDRATE):
+    """Opens a serial port; requires the pyserial-asyncio package."""
+    if serial_asyncio is None:
+        raise RuntimeError("Serial ports need the pyserial-asyncio package")
+    return await serial_asyncio.open_serial_connection(url=device,
+                                                       baudrate=baudrate)
+
+
+async def open_endpoint(endpoint: str, baudrate: int = DEFAULT_BAUDRATE):
+    """
+    Opens ``host:port`` as TCP and anything else (``/dev/ttyUSB0``,
+    ``COM3``) as a serial port.
+    """
+    host, _, port = endpoint.rpartition(":")
+    if host and port.isdigit():
+        return await open_tcp(host, int(port))
+    return await open_serial(endpoint, baudrate)
+
+
+async def stream(endpoint: str, lines: Iterable[Line], flow: str = "count",
+                 buffer_size: int = RX_BUFFER_SIZE,
+                 baudrate: int = DEFAULT_BAUDRATE,
+                 on_sender: Optional[Callable[[GcodeSender], None]] = None
+                 ) -> SenderStats:
+    """
+    Connects to an endpoint and streams lines to it.
+
+    :param on_sender: called with the sender before streaming starts, so
+        callers can keep it to pause, resume or abort
+    """
+    reader, writer = await open_endpoint(endpoint, baudrate)
+    sender = GcodeSender(reader, writer, flow, buffer_size)
+    if on_sender is not None:
+        on_sender(sender)
+    try:
+        return await sender.send(lines)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def send_file(endpoint: str, path: str, **kwargs) -> SenderStats:
+    """Streams a G-code file from its memory map; see ``stream``."""
+    return asyncio.run(stream(endpoint, iter_mapped_lines(path), **kwargs))
+
+
+class FakeController:
+    """
+    Local TCP stand-in for a controller with a limited receive buffer.
+
+    Every received line is held in the buffer for ``line_time`` seconds of
+    "execution" and then acknowledged with ``ok``, or ``error:20`` if it
+    starts with one of the ``unsupported`` commands. Lines arriving while
+    the buffer is full are counted in ``overflows`` instead of being lost,
+    so tests can check the flow control. Buffer accounting assumes one
+    client at a time. With ``drop_after`` the connection is reset once
+    that many lines have been received, as when a controller crashes.
+    """
+
+    def __init__(self, buffer_size: int = RX_BUFFER_SIZE,
+                 line_time: float = 0.0, unsupported: Tuple[str, ...] = (),
+                 record: bool = True, drop_after: Optional[int] = None):
+        self.buffer_size = buffer_size
+        self.drop_after = drop_after
+        self.line_time = line_time
+        self.unsupported = tuple(c.encode("ascii") for c in unsupported)
+        self.record = record
+        self.lines: List[str] = []
+        self.realtime: List[bytes] = []
+        self.received = 0
+        self.buffered = 0
+        self.max_buffered = 0
+        self.overflows = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set["asyncio.Task[None]"] = set()
+
+    async def start(self, host: str = "127.0.0.1",
+                    port: int = 0) -> Tuple[str, int]:
+        """Starts listening; returns the bound address (``port=0`` picks one)."""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self, timeout: float = 1.0) -> None:
+        """Stops listening and waits for connected clients to hang up."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._clients:
+            _, pending = await asyncio.wait(self._clients, timeout=timeout)
+            for client in pending:
+                client.cancel()
+
+    async def _execute(self, queue: "asyncio.Queue[bytes]",
+                       writer: asyncio.StreamWriter) -> None:
+        while True:
+            line = await queue.get()
+            if self.line_time:
+                await asyncio.sleep(self.line_time)
+            self.buffered -= len(line) + 1
+            if line.startswith(self.unsupported):
+                writer.write(b"error:20\n")
+            else:
+                writer.write(b"ok\n")
+            if queue.empty():
+                await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        client = asyncio.current_task()
+        self._clients.add(client)
+        queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+        executor = asyncio.ensure_future(self._execute(queue, writer))
+        partial = b""
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                commands = REALTIME_RE.findall(chunk)
+                if commands:
+                    self.realtime.extend(commands)
+                    chunk = REALTIME_RE.sub(b"", chunk)
+                    if SOFT_RESET in commands:
+                        while not queue.empty():
+                            queue.get_nowait()
+                        self.buffered = 0
+                        partial = b""
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                for line in lines:
+                    self.received += 1
+                    self.buffered += len(line) + 1
+                    if self.buffered > self.buffer_size:
+                        self.overflows += 1
+                    self.max_buffered = max(self.max_buffered, self.buffered)
+                    if self.record:
+                        self.lines.append(line.decode("ascii", "replace"))
+                    queue.put_nowait(line)
+                if (self.drop_after is not None
+                        and self.received >= self.drop_after):
+                    # A zero linger time makes the close send a reset.
+                    writer.get_extra_info("socket").setsockopt(
+                        socket.SOL_SOCKET, socket.SO_LINGER,
+                        struct.pack("ii", 1, 0))
+                    writer.transport.abort()
+                    break
+        finally:
+            executor.cancel()
+            writer.close()
+            self._clients.discard(client)
+
+    async def serve_forever(self, host: str = "127.0.0.1",
+                            port: int = 0) -> None:
+        """Serves until cancelled, listening first unless ``start`` was called."""
+        if self.server is None:
+            await self.start(host, port)
+        async with self.server:
+            await self.server.serve_forever()
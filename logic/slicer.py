@@ -1,39 +1,137 @@
 # Assuming slicer.py might import and use other logic functions
-from logic.print_layer0 import print_layer0 # Example import
+from typing import Optional
 
-def slicer(destination, z_height, fill_density, layer_thickness, nozzle_diameter, g0_feed, g1_feed, x_min, x_max, y_min, y_max, waveform: str):
-    destination.write(f"; Slicer Start ({waveform} waveform)\n")
+import numpy as np
+
+from logic.mesh import slice_stl
+from logic.polygons import apply_waveform, offset_region, perimeters, scanline_infill
+from logic.print_layer0 import iter_print_layer0 # Example import
+from logic.streams import write_lines
+
+
+def iter_path(points, g0_feed, g1_feed):
+    """Yields a rapid to the first point of a path and feed moves along the rest."""
+    points = points + 0.0  # no "-0.000" in the output
+    yield f"G0 X{points[0][0]:.3f} Y{points[0][1]:.3f} F{g0_feed}\n"
+    yield "".join(f"G1 X{x:.3f} Y{y:.3f} F{g1_feed}\n" for x, y in points[1:].tolist())
+
+
+def iter_region(region, walls, nozzle_diameter, fill_density, g0_feed, g1_feed,
+                waveform: str, verbosity: str = "full", angle: float = 0.0):
+    """
+    Yields the walls of a region (closed polygons, holes clockwise),
+    outermost first, then its scanline infill, with the waveform laid
+    along every path.
+    """
+    for wall, loops in enumerate(perimeters(region, walls, nozzle_diameter)):
+        if verbosity == "full":
+            yield f"; Wall {wall+1} ({len(loops)} loops)\n"
+        for loop in loops:
+            closed = np.vstack((loop, loop[:1]))
+            yield from iter_path(apply_waveform(closed, waveform), g0_feed,
+                                 g1_feed)
+    if fill_density <= 0:
+        return
+    inner = offset_region(region, walls * nozzle_diameter) if walls else region
+    spans = scanline_infill(inner, nozzle_diameter / min(fill_density, 1.0), angle)
+    if verbosity == "full":
+        yield f"; Infill ({len(spans)} lines at {angle:g} deg)\n"
+    for span in spans:
+        yield from iter_path(apply_waveform(span, waveform), g0_feed, g1_feed)
+
+
+def iter_mesh_layers(stl_path, layer_thickness, nozzle_diameter, fill_density,
+                     walls, g0_feed, g1_feed, waveform: str,
+                     verbosity: str = "full"):
+    """
+    Yields a binary STL mesh layer by layer. The mesh is sliced through
+    the middle of each layer, and each layer's contours are filled with
+    walls and infill that alternates between 0 and 90 degrees. Layers are
+    numbered from the bed, whatever the mesh's Z.
+    """
+    slices = slice_stl(stl_path, layer_thickness)
+    for layer, contours in enumerate(slices.contours):
+        current_z = (layer + 1) * layer_thickness
+        if verbosity != "none":
+            yield f"; Layer {layer+1} at Z{current_z:.3f} ({waveform} waveform)\n"
+        yield f"G0 Z{current_z:.3f} F{g0_feed}\n" # Move to layer height
+        yield from iter_region(contours, walls, nozzle_diameter, fill_density,
+                               g0_feed, g1_feed, waveform, verbosity,
+                               angle=90.0 * (layer % 2))
+    if slices.open_chains and verbosity != "none":
+        yield (f"; Warning: {slices.open_chains} open contours skipped, "
+               "the mesh is not closed\n")
+
+
+def iter_slicer(z_height, fill_density, layer_thickness, nozzle_diameter,
+                g0_feed, g1_feed, x_min, x_max, y_min, y_max, waveform: str,
+                verbosity: str = "full", stl_path: Optional[str] = None,
+                walls: int = 2):
+    if verbosity != "none":
+        yield f"; Slicer Start ({waveform} waveform)\n"
+
+    # A mesh replaces the bounding box: its height and contours are used.
+    if stl_path is not None:
+        yield from iter_mesh_layers(stl_path, layer_thickness, nozzle_diameter,
+                                    fill_density, walls, g0_feed, g1_feed,
+                                    waveform, verbosity)
+        if verbosity != "none":
+            yield "; Slicer End\n"
+        return True
 
     # Assuming this function iterates through layers and calls other drawing functions
     num_layers = int(z_height / layer_thickness)
     
     for layer in range(num_layers):
         current_z = (layer + 1) * layer_thickness
-        destination.write(f"; Layer {layer+1} at Z{current_z:.3f} ({waveform} waveform)\n")
-        destination.write(f"G0 Z{current_z:.3f} F{g0_feed}\n") # Move to layer height
+        if verbosity != "none":
+            yield f"; Layer {layer+1} at Z{current_z:.3f} ({waveform} waveform)\n"
+        yield f"G0 Z{current_z:.3f} F{g0_feed}\n" # Move to layer height
 
         if waveform == "sawtooth":
-            destination.write("; Slicing with Sawtooth Pattern\n")
+            if verbosity == "full":
+                yield "; Slicing with Sawtooth Pattern\n"
             # --- YOUR SAWTOOTH SLICING G-CODE HERE ---
             # This would involve calling functions that generate sawtooth paths
             # For example, if you fill a layer with lines, make those lines wavy.
             # Example: call print_layer0 with sawtooth
-            print_layer0(destination, x_min, y_min, x_max, y_min, current_z, g1_feed, waveform="sawtooth") 
+            yield from iter_print_layer0(x_min, y_min, x_max, y_min, current_z,
+                                         g1_feed, waveform="sawtooth",
+                                         verbosity=verbosity)
             # You'd need more complex logic to fill the entire layer with sawtooth lines.
 
 
         elif waveform == "square":
-            destination.write("; Slicing with Square Wave Pattern\n")
+            if verbosity == "full":
+                yield "; Slicing with Square Wave Pattern\n"
             # --- YOUR SQUARE WAVE SLICING G-CODE HERE ---
             # Example: call print_layer0 with square
-            print_layer0(destination, x_min, y_min, x_max, y_min, current_z, g1_feed, waveform="square")
+            yield from iter_print_layer0(x_min, y_min, x_max, y_min, current_z,
+                                         g1_feed, waveform="square",
+                                         verbosity=verbosity)
             # You'd need more complex logic to fill the entire layer with square lines.
 
         else:
-            destination.write(f"; Warning: Unknown waveform '{waveform}'. Generating default slicing.\n")
+            if verbosity == "full":
+                yield (f"; Warning: Unknown waveform '{waveform}'. "
+                       "Generating default slicing.\n")
             # --- DEFAULT SLICING G-CODE HERE ---
             # Example: original rectilinear fill
-            print_layer0(destination, x_min, y_min, x_max, y_min, current_z, g1_feed, waveform="none") # Pass 'none' or handle default
+            # Pass 'none' or handle default
+            yield from iter_print_layer0(x_min, y_min, x_max, y_min, current_z,
+                                         g1_feed, waveform="none",
+                                         verbosity=verbosity)
+
+    if verbosity != "none":
+        yield "; Slicer End\n"
+    return True # Assuming this returns a boolean
+
 
-    destination.write("; Slicer End\n")
-    return True # Assuming this returns a boolean
\ No newline at end of file
+def slicer(destination, z_height, fill_density, layer_thickness,
+           nozzle_diameter, g0_feed, g1_feed, x_min, x_max, y_min, y_max,
+           waveform: str, verbosity: str = "full",
+           stl_path: Optional[str] = None, walls: int = 2):
+    return write_lines(destination, iter_slicer(
+        z_height, fill_density, layer_thickness, nozzle_diameter, g0_feed,
+        g1_feed, x_min, x_max, y_min, y_max, waveform, verbosity, stl_path,
+        walls))
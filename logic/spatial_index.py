@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from logic.io_utils import file_cache, read_toolpath
+from logic.toolpath import Toolpath, move_segments
+
+# Segments whose bounding box covers more cells than this are kept in a
+# separate list and tested on every query instead of being rasterised.
+MAX_CELLS_PER_SEGMENT = 64
+
+
+@dataclass
+class SpatialIndex:
+    """
+    Uniform XY grid over the move segments of a program.
+
+    Segment ``i`` runs from ``(x0[i], y0[i])`` to ``(x1[i], y1[i])`` and was
+    commanded on source line ``lines[i]`` (1-based). The items of cell
+    ``c`` are ``cell_items[cell_start[c]:cell_start[c + 1]]``.
+    """
+    x0: np.ndarray
+    y0: np.ndarray
+    x1: np.ndarray
+    y1: np.ndarray
+    z: np.ndarray
+    motion: np.ndarray
+    lines: np.ndarray
+    origin: Tuple[float, float]
+    cell_size: float
+    shape: Tuple[int, int]
+    cell_start: np.ndarray
+    cell_items: np.ndarray
+    oversize: np.ndarray
+
+
+def build_spatial_index(toolpath: Toolpath,
+                        cell_size: Optional[float] = None) -> SpatialIndex:
+    """
+    Builds a grid index over every move of a resolved toolpath.
+
+    :param toolpath: output of ``resolve_modal``
+    :param cell_size: grid pitch in mm; chosen from the extent and the
+        number of segments when omitted
+    """
+    rows, x0, y0, x1, y1 = move_segments(toolpath)
+
+    lo_x = np.minimum(x0, x1)
+    lo_y = np.minimum(y0, y1)
+    hi_x = np.maximum(x0, x1)
+    hi_y = np.maximum(y0, y1)
+    if len(rows):
+        origin = (float(lo_x.min()), float(lo_y.min()))
+        extent = max(float(hi_x.max()) - origin[0],
+                     float(hi_y.max()) - origin[1])
+    else:
+        origin, extent = (0.0, 0.0), 0.0
+    if cell_size is None:
+        cell_size = extent / max(np.sqrt(len(rows)), 1.0) or 1.0
+    nx = int(extent // cell_size) + 1
+    ny = nx
+
+    cx0 = ((lo_x - origin[0]) // cell_size).astype(np.int64)
+    cy0 = ((lo_y - origin[1]) // cell_size).astype(np.int64)
+    cx1 = ((hi_x - origin[0]) // cell_size).astype(np.int64)
+    cy1 = ((hi_y - origin[1]) // cell_size).astype(np.int64)
+    width = cx1 - cx0 + 1
+    counts = width * (cy1 - cy0 + 1)
+    big = counts > MAX_CELLS_PER_SEGMENT
+    counts[big] = 0
+
+    seg = np.repeat(np.arange(len(rows)), counts)
+    local = np.arange(len(seg)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cells = ((cy0[seg] + local // width[seg]) * nx
+             + cx0[seg] + local % width[seg])
+    order = np.argsort(cells, kind="stable")
+    cell_start = np.searchsorted(cells[order], np.arange(nx * ny + 1))
+
+    return SpatialIndex(
+        x0=x0, y0=y0, x1=x1, y1=y1,
+        z=toolpath.z[rows], motion=toolpath.motion[rows], lines=rows + 1,
+        origin=origin, cell_size=float(cell_size), shape=(nx, ny),
+        cell_start=cell_start, cell_items=seg[order],
+        oversize=np.flatnonzero(big),
+    )
+
+
+def spatial_index_for_file(path: str) -> SpatialIndex:
+    """Returns the spatial index of a G-code file, built once per file."""
+    cache = file_cache(path)
+    if "spatial_index" not in cache:
+        cache["spatial_index"] = build_spatial_index(read_toolpath(path))
+    return cache["spatial_index"]
+
+
+def _candidates(index: SpatialIndex, xmin: float, ymin: float,
+                xmax: float, ymax: float) -> np.ndarray:
+    nx, ny = index.shape
+    ox, oy = index.origin
+    cx0 = max(int((xmin - ox) // index.cell_size), 0)
+    cy0 = max(int((ymin - oy) // index.cell_size), 0)
+    cx1 = min(int((xmax - ox) // index.cell_size), nx - 1)
+    cy1 = min(int((ymax - oy) // index.cell_size), ny - 1)
+    parts = [index.oversize]
+    if cx0 <= cx1:
+        for cy in range(cy0, cy1 + 1):
+            lo = index.cell_start[cy * nx + cx0]
+            hi = index.cell_start[cy * nx + cx1 + 1]
+            parts.append(index.cell_items[lo:hi])
+    return np.unique(np.concatenate(parts))
+
+
+def _filter_kind(index: SpatialIndex, segs: np.ndarray,
+                 kind: Optional[str]) -> np.ndarray:
+    if kind == "travel":
+        return segs[index.motion[segs] == 0.0]
+    if kind == "deposit":
+        return segs[index.motion[segs] != 0.0]
+    if kind is not None:
+        raise ValueError(f"Unknown segment kind '{kind}'")
+    return segs
+
+
+def query_rect(index: SpatialIndex, x_value: float, y_value: float,
+               x_end: float, y_end: float,
+               kind: Optional[str] = None) -> np.ndarray:
+    """
+    Returns the line numbers of the moves that touch a rectangle.
+
+    The corners may be given in any order, so ``clean_block`` and
+    ``clean_no_tool_block`` regions can be passed straight through.
+
+    :param kind: "travel" (G0), "deposit" (G1/G2/G3) or None for both
+    """
+    xmin, xmax = sorted((x_value, x_end))
+    ymin, ymax = sorted((y_value, y_end))
+    segs = _filter_kind(index, _candidates(index, xmin, ymin, xmax, ymax),
+                        kind)
+    x0, y0 = index.x0[segs], index.y0[segs]
+    dx, dy = index.x1[segs] - x0, index.y1[segs] - y0
+
+    # Liang-Barsky clipping of every candidate against the rectangle.
+    t0 = np.zeros(len(segs))
+    t1 = np.ones(len(segs))
+    inside = np.ones(len(segs), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-dx, x0 - xmin), (dx, xmax - x0),
+                     (-dy, y0 - ymin), (dy, ymax - y0)):
+            inside &= ~((p == 0) & (q < 0))
+            r = q / p
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    hits = inside & (t0 <= t1)
+    return np.unique(index.lines[segs[hits]])
+
+
+def query_segment(index: SpatialIndex, x_start: float, y_start: float,
+                  x_end: float, y_end: float,
+                  kind: Optional[str] = None) -> np.ndarray:
+    """
+    Returns the line numbers of the moves that intersect a segment,
+    e.g. a fixture edge.
+
+    :param kind: "travel" (G0), "deposit" (G1/G2/G3) or None for both
+    """
+    segs = _candidates(index, min(x_start, x_end), min(y_start, y_end),
+                       max(x_start, x_end), max(y_start, y_end))
+    segs = _filter_kind(index, segs, kind)
+    ax, ay = index.x0[segs], index.y0[segs]
+    bx, by = index.x1[segs], index.y1[segs]
+
+    def orient(px, py, qx, qy, rx, ry):
+        return np.sign((qx - px) * (ry - py) - (qy - py) * (rx - px))
+
+    d1 = orient(x_start, y_start, x_end, y_end, ax, ay)
+    d2 = orient(x_start, y_start, x_end, y_end, bx, by)
+    d3 = orient(ax, ay, bx, by, x_start, y_start)
+    d4 = orient(ax, ay, bx, by, x_end, y_end)
+    crossing = (d1 * d2 < 0) & (d3 * d4 < 0)
+
+    # Touching and collinear cases: an endpoint lies on the other segment.
+    def on_segment(px, py, qx, qy, rx, ry):
+        return ((np.minimum(px, qx) <= rx) & (rx <= np.maximum(px, qx))
+                & (np.minimum(py, qy) <= ry) & (ry <= np.maximum(py, qy)))
+
+    touching = (
+        ((d1 == 0) & on_segment(x_start, y_start, x_end, y_end, ax, ay))
+        | ((d2 == 0) & on_segment(x_start, y_start, x_end, y_end, bx, by))
+        | ((d3 == 0) & on_segment(ax, ay, bx, by, x_start, y_start))
+        | ((d4 == 0) & on_segment(ax, ay, bx, by, x_end, y_end))
+    )
+    return np.unique(index.lines[segs[crossing | touching]])
+
+
+def layer_extents(index: SpatialIndex) -> Dict[float, Tuple[float, ...]]:
+    """
+    Returns ``{z: (xmin, ymin, xmax, ymax)}`` over the moves that end at
+    each Z height.
+    """
+    if len(index.z) == 0:
+        return {}
+    order = np.argsort(index.z, kind="stable")
+    z = index.z[order]
+    starts = np.flatnonzero(np.concatenate(([True], z[1:] != z[:-1])))
+    bounds = [np.minimum.reduceat(np.minimum(index.x0, index.x1)[order], starts),
+              np.minimum.reduceat(np.minimum(index.y0, index.y1)[order], starts),
+              np.maximum.reduceat(np.maximum(index.x0, index.x1)[order], starts),
+              np.maximum.reduceat(np.maximum(index.y0, index.y1)[order], starts)]
+    return {float(z[s]): tuple(float(b[i]) for b in bounds)
+            for i, s in enumerate(starts)}
@@ -0,0 +1,226 @@
+"""
+Per-layer statistics of a program for costing and scheduling.
+
+Programs are read chunk by chunk, from a file or straight from a
+generator, and every chunk is resolved with the modal state the previous
+one ended with. Each chunk adds its moves to per-layer sums with
+``np.bincount``, so memory depends on the chunk size and the number of
+layers, never on the program length.
+
+Layers are found with ``logic.layer_index.find_layer_starts``, the rule
+the layer index uses. Lines after a Z change that no print move has
+followed yet are held back and parsed again with the next chunk, up to
+``PARSE_CHUNK_BYTES`` of them. Deposit moves are feed moves (G1/G2/G3)
+with an XY displacement, as in ``logic.ultrasound``; everything else is
+travel. The duration assumes every move runs at its commanded feed (G0
+at the rapid feed) and adds the G4 dwells; acceleration is not modelled.
+"""
+import csv
+import json
+from dataclasses import asdict, dataclass, field, fields
+from typing import Iterable, List, Optional, TextIO, Union
+
+import numpy as np
+
+from logic.io_utils import build_line_index, mapped_file
+from logic.layer_index import (LayerState, find_layer_starts, layer_of_rows,
+                               marker_rows)
+from logic.motion import MIN_FEED, MotionLimits
+from logic.streams import iter_chunks
+from logic.toolpath import (AXES, PARSE_CHUNK_BYTES, ModalState,
+                            WordColumns, columns_from_tokens,
+                            iter_line_chunks, resolve_modal, tokenize)
+from logic.ultrasound import ON_LINE_RE
+
+# Sums kept per layer, in report column order.
+SUMS = ("lines", "moves", "deposit_length", "travel_length", "a_travel",
+        "ultrasound_calls", "dwell_time", "duration")
+
+
+@dataclass
+class LayerStats:
+    """
+    Totals of one layer; layer 0 holds what comes before the first layer
+    and is only reported when it moves, dwells or calls the ultrasound.
+    Lengths are in mm, A travel in degrees and times in seconds;
+    ``ultrasound_calls`` counts the lines that switch the ultrasound on,
+    ``M98 P"us.g"`` macro calls and bare ``M3``, as ``logic.ultrasound``
+    does.
+    """
+    number: int = 0
+    z: float = 0.0
+    lines: int = 0
+    moves: int = 0
+    deposit_length: float = 0.0
+    travel_length: float = 0.0
+    a_travel: float = 0.0
+    ultrasound_calls: int = 0
+    dwell_time: float = 0.0
+    duration: float = 0.0
+
+
+@dataclass
+class ProgramStats:
+    """Per-layer statistics and their total."""
+    layers: List[LayerStats] = field(default_factory=list)
+    total: LayerStats = field(default_factory=LayerStats)
+
+
+class _Accumulator:
+    """
+    Carries the modal state, the layer state and the lines whose layer
+    is not known yet across chunks.
+    """
+
+    def __init__(self, limits: MotionLimits):
+        self.limits = limits
+        self.state: Optional[ModalState] = None
+        self.layers = LayerState()
+        self.layer = 0
+        self.carry = b""
+        # Layer 0 collects the lines before the first layer.
+        self.stats = ProgramStats(layers=[LayerStats(number=0)])
+
+    def add(self, chunk: Union[bytes, memoryview], final: bool = False) -> None:
+        data = self.carry + bytes(chunk)
+        self.carry = b""
+        columns = columns_from_tokens(tokenize(data))
+        start = self.state.position if self.state else dict.fromkeys(AXES, 0.0)
+        path = resolve_modal(columns, self.state)
+        lines = build_line_index(data)
+        rows, heights, cut = find_layer_starts(
+            path, marker_rows(data, lines), self.layers, start, final)
+        if cut < len(path) and len(data) - lines[cut] <= PARSE_CHUNK_BYTES:
+            self.carry = data[lines[cut]:]
+            path = resolve_modal(WordColumns(**{
+                name: getattr(columns, name)[:cut]
+                for name in columns.__dataclass_fields__}), self.state)
+        self.state = path.state
+        n = len(path)
+        if not n:
+            return
+        deltas = {axis: np.diff(getattr(path, axis),
+                                prepend=start[axis]) for axis in AXES}
+        moves = path.is_move
+        xy = np.hypot(deltas["x"], deltas["y"])
+        xyz = np.hypot(xy, deltas["z"])
+        deposit = moves & (path.motion != 0.0) & (xy > 0.0)
+        travel = moves & ~deposit
+        a_travel = np.where(moves, np.abs(deltas["a"]), 0.0)
+        # Move time at the commanded feed; A degrees count as millimetres.
+        feed = np.where(path.motion == 0.0, self.limits.rapid_feed,
+                        np.maximum(path.f, MIN_FEED)) / 60.0
+        move_time = np.where(moves, np.hypot(xyz, deltas["a"]) / feed, 0.0)
+        columns = path.columns
+        dwell = np.where(columns.g4, np.nan_to_num(columns.p) / 1000.0, 0.0)
+        calls = np.zeros(n, dtype=bool)
+        on = np.searchsorted(lines, np.array(
+            [match.start() for match in ON_LINE_RE.finditer(data)],
+            dtype=np.int64), side="right") - 1
+        calls[on[on < n]] = True
+
+        layer = self.layer + layer_of_rows(rows, n)
+        for z in heights.tolist():
+            self.stats.layers.append(LayerStats(number=len(self.stats.layers),
+                                                z=z))
+        self.layer += len(rows)
+
+        lo = int(layer.min())
+        size = int(layer.max()) - lo + 1
+        index = layer - lo
+        sums = {
+            "lines": np.bincount(index, minlength=size),
+            "moves": np.bincount(index, moves, size),
+            "deposit_length": np.bincount(index, np.where(deposit, xy, 0.0),
+                                          size),
+            "travel_length": np.bincount(index, np.where(travel, xyz, 0.0),
+                                         size),
+            "a_travel": np.bincount(index, a_travel, size),
+            "ultrasound_calls": np.bincount(index, calls, size),
+            "dwell_time": np.bincount(index, dwell, size),
+            "duration": np.bincount(index, move_time + dwell, size),
+        }
+        for i in range(size):
+            target = self.stats.layers[lo + i]
+            for name in SUMS:
+                value = sums[name][i]
+                kind = type(getattr(target, name))
+                setattr(target, name, getattr(target, name) + kind(value))
+
+    def finish(self) -> ProgramStats:
+        if self.carry:
+            self.add(b"", final=True)
+        total = self.stats.total
+        for layer in self.stats.layers:
+            for name in SUMS:
+                setattr(total, name, getattr(total, name)
+                        + getattr(layer, name))
+        total.z = max(layer.z for layer in self.stats.layers)
+        preamble = self.stats.layers[0]
+        if not (preamble.moves or preamble.dwell_time
+                or preamble.ultrasound_calls):
+            del self.stats.layers[0]
+        return self.stats
+
+
+def stats_chunks(chunks: Iterable[Union[bytes, memoryview]],
+                 limits: Optional[MotionLimits] = None) -> ProgramStats:
+    """Computes the statistics of a program given as chunks of whole lines."""
+    accumulator = _Accumulator(limits if limits is not None else MotionLimits())
+    for chunk in chunks:
+        accumulator.add(chunk)
+    return accumulator.finish()
+
+
+def stats_bytes(data: Union[bytes, memoryview],
+                limits: Optional[MotionLimits] = None,
+                chunk_bytes: int = PARSE_CHUNK_BYTES) -> ProgramStats:
+    """Computes the statistics of a program held in a buffer or an mmap."""
+    return stats_chunks(iter_line_chunks(data, chunk_bytes), limits)
+
+
+def stats_file(path: str, limits: Optional[MotionLimits] = None
+               ) -> ProgramStats:
+    """Computes the statistics of a G-code file through a memory map."""
+    with mapped_file(path) as data:
+        return stats_bytes(data, limits)
+
+
+def stats_lines(lines: Iterable[str], limits: Optional[MotionLimits] = None,
+                chunk_bytes: int = PARSE_CHUNK_BYTES) -> ProgramStats:
+    """
+    Computes the statistics of text pieces made of whole lines, e.g. an
+    ``iter_operation`` generator, without keeping the program.
+    """
+    return stats_chunks(iter_chunks(lines, chunk_bytes), limits)
+
+
+def write_stats_json(stats: ProgramStats, destination: TextIO) -> None:
+    """Writes the layers and the total as JSON."""
+    json.dump({"layers": [asdict(layer) for layer in stats.layers],
+               "total": asdict(stats.total)}, destination, indent=2)
+
+
+def write_stats_csv(stats: ProgramStats, destination: TextIO) -> None:
+    """Writes one CSV row per layer and a final ``total`` row."""
+    names = [f.name for f in fields(LayerStats)]
+    writer = csv.writer(destination)
+    writer.writerow(names)
+    for layer in stats.layers:
+        writer.writerow([getattr(layer, name) for name in names])
+    writer.writerow(["total"] + [getattr(stats.total, name)
+                                 for name in names[1:]])
+
+
+def format_program_stats(stats: ProgramStats) -> str:
+    """Formats ProgramStats as a table for the results pane or the CLI."""
+    out = [f"{'layer':>5} {'Z':>8} {'deposit mm':>11} {'travel mm':>10} "
+           f"{'A deg':>8} {'US calls':>8} {'dwell s':>8} {'time s':>8}"]
+    rows = [(str(layer.number), layer) for layer in stats.layers]
+    rows.append(("total", stats.total))
+    for label, layer in rows:
+        out.append(f"{label:>5} {layer.z:8.3f} {layer.deposit_length:11.1f} "
+                   f"{layer.travel_length:10.1f} {layer.a_travel:8.1f} "
+                   f"{layer.ultrasound_calls:8d} {layer.dwell_time:8.2f} "
+                   f"{layer.duration:8.1f}")
+    return "\n".join(out)
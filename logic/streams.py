@@ -0,0 +1,56 @@
+"""
+Helpers for generators that produce G-code as an iterator of text.
+
+Every operation has an ``iter_<name>`` form that yields its output as
+text pieces of whole lines, so callers can hand the pieces to a file,
+a socket or a compressor without collecting the program first. The
+``<name>(destination, ...)`` form writes those pieces to a text stream.
+"""
+from typing import Any, Generator, Iterable, Iterator, TextIO
+
+# Size of the byte chunks built by ``iter_chunks``.
+CHUNK_BYTES = 64 * 1024
+
+
+class GeneratedLines:
+    """
+    Iterates the text pieces of a generator once and keeps the value it
+    returns (e.g. the number of blocks written) in ``result``.
+    """
+
+    def __init__(self, generator: Generator[str, None, Any]):
+        self.generator = generator
+        self.result: Any = None
+
+    def __iter__(self) -> Iterator[str]:
+        self.result = yield from self.generator
+
+
+def write_lines(destination: TextIO,
+                generator: Generator[str, None, Any]) -> Any:
+    """
+    Writes every piece of a generator to ``destination`` and returns the
+    generator's return value.
+    """
+    lines = GeneratedLines(generator)
+    destination.writelines(lines)
+    return lines.result
+
+
+def iter_chunks(lines: Iterable[str],
+                chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Joins text pieces into ASCII byte chunks of about ``chunk_bytes``, for
+    ``writelines`` on binary files, sockets and compressors.
+    """
+    parts = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield "".join(parts).encode("ascii", "replace")
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts).encode("ascii", "replace")
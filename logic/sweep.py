@@ -0,0 +1,232 @@
+"""
+Parameter sweeps: every combination of a parameter grid written as its
+own program, for process tuning.
+
+Feeds and dwell times only appear verbatim in a generator's output, so
+variants that differ only in them share one rendering: the operation is
+generated once per geometry with a marker in place of each such
+parameter, and every variant is the marked text with its own values
+joined in, then post-processed like a job. Batches of variants are
+written in a process pool, and an index file lists every program with
+its parameters.
+"""
+import io
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from logic.job import post_process
+from logic.operations import (VERBOSITY_LEVELS, operation_parameters,
+                              run_operation)
+from logic.postprocess import build_pipeline
+
+# Parameters each generator only writes with plain ``f"{value}"``
+# formatting, so they can be substituted into a rendered program.
+TEXT_PARAMETERS: Dict[str, Tuple[str, ...]] = {
+    "print_block": ("g0_xy_feed", "g1_xy_feed", "z_feed", "a_feed",
+                    "delay_time"),
+    "print_cylinder": ("feedrate",),
+    "print_zigzag": ("feedrate",),
+}
+
+INDEX_NAME = "index.json"
+# Variants written per pool task.
+BATCH_VARIANTS = 64
+MARKER = "\x00"
+
+
+@dataclass
+class Sweep:
+    """
+    One operation run over every combination of ``grid`` values, with
+    ``parameters`` fixed for all variants; anything in neither takes the
+    defaults. The last grid parameter varies fastest.
+    """
+    operation: str
+    grid: Dict[str, List[Any]] = field(default_factory=dict)
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    waveform: str = "sawtooth"
+    verbosity: str = "full"
+    name: str = ""
+
+
+@dataclass
+class SweepVariant:
+    """One program of a sweep, as listed in the index file."""
+    index: int
+    file: str
+    parameters: Dict[str, Any]
+    lines: int
+    bytes: int
+
+
+def sweep_from_dict(data: Dict[str, Any]) -> Sweep:
+    """Builds a sweep from its JSON form, validating the grid."""
+    sweep = Sweep(operation=data["operation"],
+                  grid={name: list(values)
+                        for name, values in data.get("grid", {}).items()},
+                  parameters=dict(data.get("parameters", {})),
+                  waveform=data.get("waveform", "sawtooth"),
+                  verbosity=data.get("verbosity", "full"),
+                  name=data.get("name", ""))
+    validate_sweep(sweep)
+    return sweep
+
+
+def validate_sweep(sweep: Sweep) -> None:
+    """Raises ValueError for unknown parameters, empty axes or verbosity."""
+    operation_parameters(sweep.operation, **sweep.parameters)
+    operation_parameters(sweep.operation, **dict.fromkeys(sweep.grid))
+    empty = [name for name, values in sweep.grid.items() if not values]
+    if empty:
+        raise ValueError(f"No values to sweep for: {', '.join(empty)}")
+    if sweep.verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"Unknown verbosity '{sweep.verbosity}'")
+
+
+def load_sweep(path: str) -> Sweep:
+    """Reads a sweep from a JSON file."""
+    with open(path, "r") as f:
+        return sweep_from_dict(json.load(f))
+
+
+def save_sweep(sweep: Sweep, path: str) -> None:
+    """Writes a sweep to a JSON file."""
+    with open(path, "w") as f:
+        json.dump(asdict(sweep), f, indent=2)
+
+
+def sweep_size(sweep: Sweep) -> int:
+    """Number of variants in the sweep."""
+    size = 1
+    for values in sweep.grid.values():
+        size *= len(values)
+    return size
+
+
+def iter_variants(sweep: Sweep) -> Iterator[Dict[str, Any]]:
+    """Yields the swept values of every variant, in index order."""
+    names = list(sweep.grid)
+    for values in itertools.product(*sweep.grid.values()):
+        yield dict(zip(names, values))
+
+
+def render_template(operation: str, parameters: Dict[str, Any],
+                    waveform: str, verbosity: str,
+                    names: Tuple[str, ...] = ()) -> List[str]:
+    """
+    Generates an operation with markers in place of the ``names``
+    parameters and splits it at the markers: even items are text, odd
+    items are parameter names.
+    """
+    marked = dict(parameters)
+    marked.update({name: f"{MARKER}{name}{MARKER}" for name in names})
+    buffer = io.StringIO()
+    run_operation(buffer, operation, marked, waveform, verbosity)
+    return buffer.getvalue().split(MARKER)
+
+
+def fill_template(pieces: List[str], parameters: Dict[str, Any]) -> str:
+    """Joins a template with the parameter values formatted as ``f"{v}"``."""
+    out = pieces[:]
+    for i in range(1, len(out), 2):
+        out[i] = f"{parameters[out[i]]}"
+    return "".join(out)
+
+
+def _write_batch(sweep: Sweep, directory: str,
+                 batch: List[Tuple[int, str, Dict[str, Any]]],
+                 pipeline_config: Optional[List[Dict[str, Any]]] = None
+                 ) -> List[SweepVariant]:
+    """
+    Writes a batch of variants, rendering each distinct geometry once and
+    post-processing every variant with a pipeline of its own.
+    """
+    names = tuple(name for name in TEXT_PARAMETERS.get(sweep.operation, ())
+                  if name in sweep.grid)
+    templates: Dict[str, List[str]] = {}
+    written = []
+    for index, file, values in batch:
+        parameters = operation_parameters(sweep.operation,
+                                          **{**sweep.parameters, **values})
+        geometry = repr({name: value for name, value in parameters.items()
+                         if name not in names})
+        pieces = templates.get(geometry)
+        if pieces is None:
+            pieces = render_template(sweep.operation, parameters,
+                                     sweep.waveform, sweep.verbosity, names)
+            templates[geometry] = pieces
+        text = "".join(post_process([fill_template(pieces, parameters)],
+                                    build_pipeline(pipeline_config)))
+        with open(os.path.join(directory, file), "w") as f:
+            f.write(text)
+        written.append(SweepVariant(index, file, values, text.count("\n"),
+                                    len(text.encode())))
+    return written
+
+
+def run_sweep(sweep: Sweep, directory: str, workers: Optional[int] = None,
+              pipeline_config: Optional[List[Dict[str, Any]]] = None
+              ) -> List[SweepVariant]:
+    """
+    Writes every variant of a sweep to ``directory`` as
+    ``<operation>_<index>.gcode`` and lists them in ``index.json``.
+
+    Variants are sorted by geometry before batching, so each batch
+    renders as few distinct programs as possible.
+
+    :param workers: number of processes; 1 writes in this process, None
+        uses one per CPU
+    :param pipeline_config: stages of the post-processing pipeline (see
+        ``build_pipeline``); pipelines keep state and do not pickle, so
+        the config is passed to the workers and each variant builds one
+    :return: the variants in index order
+    """
+    validate_sweep(sweep)
+    os.makedirs(directory, exist_ok=True)
+    width = max(4, len(str(sweep_size(sweep) - 1)))
+    text_names = TEXT_PARAMETERS.get(sweep.operation, ())
+    jobs = [(index, f"{sweep.operation}_{index:0{width}d}.gcode", values)
+            for index, values in enumerate(iter_variants(sweep))]
+    jobs.sort(key=lambda job: repr([value for name, value in job[2].items()
+                                    if name not in text_names]))
+    batches = [jobs[i:i + BATCH_VARIANTS]
+               for i in range(0, len(jobs), BATCH_VARIANTS)]
+
+    if workers == 1 or len(batches) <= 1:
+        results = [_write_batch(sweep, directory, batch, pipeline_config)
+                   for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_write_batch, [sweep] * len(batches),
+                                    [directory] * len(batches), batches,
+                                    [pipeline_config] * len(batches)))
+    variants = sorted((variant for batch in results for variant in batch),
+                      key=lambda variant: variant.index)
+    index = asdict(sweep)
+    index["variants"] = [asdict(variant) for variant in variants]
+    with open(os.path.join(directory, INDEX_NAME), "w") as f:
+        json.dump(index, f, indent=2)
+    return variants
+
+
+def run_sweep_file(sweep_path: str, directory: str,
+                   workers: Optional[int] = None,
+                   pipeline_config: Optional[List[Dict[str, Any]]] = None
+                   ) -> List[SweepVariant]:
+    """Runs a sweep file into a directory; used by the UI and the CLI."""
+    return run_sweep(load_sweep(sweep_path), directory, workers,
+                     pipeline_config)
+
+
+def format_sweep(sweep: Sweep, variants: List[SweepVariant],
+                 elapsed: float) -> str:
+    """Summarises a finished sweep for the results pane or the CLI."""
+    total = sum(variant.bytes for variant in variants)
+    axes = ", ".join(f"{name} x{len(values)}"
+                     for name, values in sweep.grid.items()) or "no grid"
+    return (f"{len(variants)} variants of {sweep.operation} ({axes}), "
+            f"{total / 1e6:.1f} MB in {elapsed:.2f} s")
@@ -0,0 +1,418 @@
+import re
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+AXES = ("x", "y", "z", "a")
+MM_PER_INCH = 25.4
+
+WORD_RE = re.compile(r"([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))")
+COMMENT_RE = re.compile(r"\([^)]*\)|;.*")
+
+MOTION_CODES = (0.0, 1.0, 2.0, 3.0)
+DISTANCE_CODES = (90.0, 91.0)
+UNIT_CODES = (20.0, 21.0)
+
+# Bytes tokenized at a time by ``parse_bytes``; bounds the temporaries.
+PARSE_CHUNK_BYTES = 8 * 1024 * 1024
+# Longer numbers are converted with float() to stay correctly rounded.
+MAX_FAST_DIGITS = 15
+_POW10 = 10.0 ** np.arange(MAX_FAST_DIGITS + 1)
+# Characters matched by ``\s`` within a line.
+_SPACE = np.zeros(256, dtype=bool)
+_SPACE[[9, 11, 12, 13, 32]] = True
+
+
+@dataclass
+class WordColumns:
+    """
+    Word values of a G-code program, one row per source line.
+
+    Axis, feed and parameter columns hold NaN where the word is absent.
+    Modal G-code groups are split into their own columns so that a line
+    such as ``G91 G1 X5`` keeps both its distance mode and its motion.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    a: np.ndarray
+    f: np.ndarray
+    p: np.ndarray
+    m: np.ndarray
+    g_motion: np.ndarray
+    g_distance: np.ndarray
+    g_units: np.ndarray
+    g92: np.ndarray
+    g4: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+
+@dataclass
+class ModalState:
+    """
+    Modal machine state carried from one line (or chunk) to the next.
+
+    Positions are absolute machine millimetres; ``offset`` holds the G92
+    offset between program and machine coordinates for each axis.
+    """
+    position: Dict[str, float] = field(
+        default_factory=lambda: dict.fromkeys(AXES, 0.0))
+    offset: Dict[str, float] = field(
+        default_factory=lambda: dict.fromkeys(AXES, 0.0))
+    feed: float = 0.0
+    motion: float = 0.0
+    relative: bool = False
+    inches: bool = False
+
+
+@dataclass
+class Toolpath:
+    """
+    Absolute X/Y/Z/A/F timeline, one row per source line.
+
+    ``x``/``y``/``z``/``a`` are the machine position after each line, ``f``
+    the modal feed in mm/min and ``motion`` the modal motion code (0-3).
+    ``is_move`` marks lines that command an axis move. ``state`` is the
+    modal state after the last line and can seed the next chunk.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    a: np.ndarray
+    f: np.ndarray
+    motion: np.ndarray
+    is_move: np.ndarray
+    columns: WordColumns
+    state: ModalState
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+
+def parse_line(line: str) -> List[tuple]:
+    """
+    Returns the (letter, value) words of a single G-code line,
+    ignoring ``;`` and parenthesised comments.
+    """
+    code = COMMENT_RE.sub("", line).upper()
+    return [(letter, float(value)) for letter, value in WORD_RE.findall(code)]
+
+
+def parse_lines(lines: Iterable[str]) -> WordColumns:
+    """
+    Parses G-code lines into word columns.
+
+    Only the words needed for motion analysis are kept: X, Y, Z, A, F,
+    P, the first M code, and the motion/distance/unit/G92/G4 G-codes.
+    The lines are joined and tokenized like ``parse_bytes``.
+    """
+    text = "".join(line.rstrip("\r\n") + "\n" for line in lines)
+    return parse_bytes(text.encode("ascii", "replace"))
+
+
+@dataclass
+class Tokens:
+    """
+    Words of a G-code buffer in source order: the 0-based ``line``, the
+    upper-case ``letter`` (ASCII code) and the ``value`` of every word.
+    """
+    line: np.ndarray
+    letter: np.ndarray
+    value: np.ndarray
+    line_count: int
+
+
+def iter_line_chunks(data: Union[bytes, memoryview],
+                     chunk_bytes: int = PARSE_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Splits a buffer (bytes or an mmap) into pieces of about
+    ``chunk_bytes`` that end at line boundaries.
+    """
+    size = len(data)
+    lo = 0
+    while lo < size:
+        hi = lo + chunk_bytes
+        if hi < size:
+            newline = data.find(b"\n", hi)
+            hi = size if newline < 0 else newline + 1
+        else:
+            hi = size
+        yield data[lo:hi]
+        lo = hi
+
+
+def _strip_comments(buf: np.ndarray, newlines: np.ndarray) -> np.ndarray:
+    """
+    Drops the comment bytes of a buffer the way COMMENT_RE does: from a
+    "(" to the next ")" on the same line (an unclosed "(" is kept), and
+    from the first ";" outside those to the end of the line.
+    """
+    opens = np.flatnonzero(buf == 40)
+    semicolons = np.flatnonzero(buf == 59)
+    if not len(opens) and not len(semicolons):
+        return buf
+    closes = np.flatnonzero(buf == 41)
+    close = np.append(closes, len(buf))[np.searchsorted(closes, opens)]
+    closed = close < newlines[np.searchsorted(newlines, opens)]
+    opens, close = opens[closed], close[closed]
+    # Every "(" up to a ")" belongs to the comment the first one opens.
+    first = np.concatenate(([True], close[1:] != close[:-1]))[:len(opens)]
+    span_start, span_end = opens[first], close[first]
+
+    if len(span_start):
+        span = np.searchsorted(span_start, semicolons, side="right") - 1
+        inside = (span >= 0) & (semicolons <= span_end[np.maximum(span, 0)])
+        semicolons = semicolons[~inside]
+    semicolon_line = np.searchsorted(newlines, semicolons)
+    first = np.concatenate(([True], semicolon_line[1:] != semicolon_line[:-1]))
+    first = first[:len(semicolons)]
+
+    delta = np.zeros(len(buf) + 1, dtype=np.int32)
+    delta[span_start] += 1
+    delta[span_end + 1] -= 1
+    delta[semicolons[first]] += 1
+    delta[newlines[semicolon_line[first]]] -= 1
+    return buf[np.cumsum(delta[:-1]) == 0]
+
+
+def tokenize(data: Union[bytes, memoryview]) -> Tokens:
+    """
+    Finds the words of a G-code buffer with array operations on its bytes.
+
+    Gives the same words as ``parse_line`` applied to every line: comments
+    are removed first, letters are case-insensitive and whitespace may
+    separate a letter from its number. Lines end at ``\n``.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    size = len(raw)
+    # A trailing newline stops every scan below at the end of the buffer.
+    buf = np.empty(size + 1, dtype=np.uint8)
+    buf[:size] = raw
+    buf[size] = 10
+    newlines = np.flatnonzero(buf == 10)
+    line_count = len(newlines) - 1 + int(size > 0 and raw[-1] != 10)
+
+    stripped = _strip_comments(buf, newlines)
+    if len(stripped) != len(buf):
+        buf = stripped
+        newlines = np.flatnonzero(buf == 10)
+    size = len(buf) - 1
+
+    upper = buf & 0xDF
+    letters = np.flatnonzero((upper >= 65) & (upper <= 90))
+    letter_line = np.searchsorted(newlines, letters)
+
+    # The number after each letter: [-+]?(\d+\.?\d*|\.\d+)
+    is_digit = (buf - 48) < 10
+    # End of the digit run starting at each byte (the byte itself if it
+    # is not a digit).
+    index_type = np.int32 if len(buf) < 2 ** 31 else np.int64
+    run_end = np.arange(len(buf), dtype=index_type)
+    run_end[is_digit] = size
+    run_end = np.minimum.accumulate(run_end[::-1])[::-1]
+
+    start = letters + 1
+    space = _SPACE[buf[start]]
+    while space.any():
+        start[space] += 1
+        space = _SPACE[buf[start]]
+    sign = buf[start]
+    p = start + ((sign == 45) | (sign == 43))
+    end_int = run_end[p]
+    has_dot = buf[end_int] == 46
+    frac_start = np.minimum(end_int + 1, size)
+    end = np.where(has_dot, run_end[frac_start], end_int)
+    valid = (end_int > p) | (has_dot & (end > frac_start))
+
+    p, end_int, end = p[valid], end_int[valid], end[valid]
+    negative = buf[start[valid]] == 45
+    n_frac = np.where(has_dot[valid], end - end_int - 1, 0)
+    length = end - p
+
+    # Mantissa as an exact integer by Horner's rule over the characters,
+    # then one correctly rounded division by a power of ten.
+    fast = length - has_dot[valid] <= MAX_FAST_DIGITS
+    mantissa = np.zeros(len(p), dtype=np.int64)
+    for k in range(int(length[fast].max()) if fast.any() else 0):
+        char = buf[np.minimum(p + k, size)].astype(np.int64)
+        use = (k < length) & (char != 46) & fast
+        mantissa = np.where(use, mantissa * 10 + (char - 48), mantissa)
+    value = mantissa / _POW10[np.minimum(n_frac, MAX_FAST_DIGITS)]
+    for i in np.flatnonzero(~fast):
+        value[i] = float(bytes(buf[p[i]:end[i]]))
+    value[negative] = -value[negative]
+
+    return Tokens(line=letter_line[valid], letter=upper[letters[valid]],
+                  value=value, line_count=line_count)
+
+
+def _pick(lines: np.ndarray, values: np.ndarray, n: int,
+          last: bool = True) -> np.ndarray:
+    """One value per line (the last or first word), NaN elsewhere."""
+    column = np.full(n, np.nan)
+    if len(lines):
+        change = lines[1:] != lines[:-1]
+        if last:
+            keep = np.concatenate((change, [True]))
+        else:
+            keep = np.concatenate(([True], change))
+        column[lines[keep]] = values[keep]
+    return column
+
+
+def columns_from_tokens(tokens: Tokens) -> WordColumns:
+    """Builds the word columns of ``parse_lines`` from tokens."""
+    n = tokens.line_count
+    line, letter, value = tokens.line, tokens.letter, tokens.value
+    axes = {}
+    for name in ("x", "y", "z", "a", "f", "p"):
+        sel = letter == ord(name.upper())
+        axes[name] = _pick(line[sel], value[sel], n)
+    sel = letter == ord("M")
+    axes["m"] = _pick(line[sel], value[sel], n, last=False)
+
+    sel = letter == ord("G")
+    g_line, g_value = line[sel], value[sel]
+    for name, codes in (("g_motion", MOTION_CODES),
+                        ("g_distance", DISTANCE_CODES),
+                        ("g_units", UNIT_CODES)):
+        sel = np.isin(g_value, codes)
+        axes[name] = _pick(g_line[sel], g_value[sel], n)
+    g92 = np.zeros(n, dtype=bool)
+    g92[g_line[g_value == 92.0]] = True
+    g4 = np.zeros(n, dtype=bool)
+    g4[g_line[g_value == 4.0]] = True
+    return WordColumns(g92=g92, g4=g4, **axes)
+
+
+def concat_columns(parts: List[WordColumns]) -> WordColumns:
+    """Joins the word columns of consecutive chunks."""
+    if len(parts) == 1:
+        return parts[0]
+    names = [f.name for f in fields(WordColumns)]
+    if not parts:
+        return WordColumns(**{name: np.empty(0, dtype=bool
+                                             if name in ("g92", "g4")
+                                             else np.float64)
+                              for name in names})
+    return WordColumns(**{name: np.concatenate(
+        [getattr(part, name) for part in parts]) for name in names})
+
+
+def parse_bytes(data: Union[bytes, memoryview]) -> WordColumns:
+    """
+    Parses a G-code buffer (bytes or an mmap) into word columns, like
+    ``parse_lines`` over its lines but with vectorized tokenizing, in
+    chunks of PARSE_CHUNK_BYTES.
+    """
+    return concat_columns([columns_from_tokens(tokenize(chunk))
+                           for chunk in iter_line_chunks(data)])
+
+
+def _forward_fill(values: np.ndarray, initial: float) -> np.ndarray:
+    """Replaces each NaN with the last non-NaN value before it."""
+    if len(values) == 0:
+        return values.copy()
+    idx = np.where(np.isnan(values), -1, np.arange(len(values)))
+    np.maximum.accumulate(idx, out=idx)
+    filled = values[np.maximum(idx, 0)]
+    filled[idx < 0] = initial
+    return filled
+
+
+def resolve_modal(columns: WordColumns,
+                  state: Optional[ModalState] = None) -> Toolpath:
+    """
+    Resolves parsed word columns into an absolute position timeline.
+
+    Missing axis words keep their modal value, G91 moves are accumulated,
+    G20 values are converted to millimetres and G92 shifts the program
+    origin without moving the machine. Everything is computed with array
+    operations over runs of lines that share the same distance mode, so
+    the Python-level work grows with the number of mode changes and G92
+    lines rather than with the number of lines.
+
+    :param columns: output of ``parse_lines``
+    :param state: modal state before the first line (defaults to power-on)
+    :return: Toolpath with one row per line
+    """
+    start = state if state is not None else ModalState()
+    n = len(columns)
+
+    units = _forward_fill(columns.g_units, 20.0 if start.inches else 21.0)
+    scale = np.where(units == 20.0, MM_PER_INCH, 1.0)
+    distance = _forward_fill(columns.g_distance,
+                             91.0 if start.relative else 90.0)
+    relative = distance == 91.0
+    feed = _forward_fill(columns.f * scale, start.feed)
+    motion = _forward_fill(columns.g_motion, start.motion)
+
+    raw = {axis: getattr(columns, axis) for axis in AXES}
+    scaled = {axis: raw[axis] * scale if axis != "a" else raw[axis]
+              for axis in AXES}
+    out = {axis: np.empty(n, dtype=np.float64) for axis in AXES}
+
+    g92_lines = np.flatnonzero(columns.g92)
+    bounds = np.union1d(np.flatnonzero(np.diff(relative)) + 1,
+                        np.concatenate((g92_lines, g92_lines + 1)))
+    bounds = np.concatenate(([0], bounds[(bounds > 0) & (bounds < n)], [n]))
+
+    position = dict(start.position)
+    offset = dict(start.offset)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if lo >= hi:
+            continue
+        if columns.g92[lo]:
+            for axis in AXES:
+                value = scaled[axis][lo]
+                if value == value:
+                    offset[axis] = position[axis] - value
+                out[axis][lo] = position[axis]
+            continue
+        for axis in AXES:
+            values = scaled[axis][lo:hi]
+            if relative[lo]:
+                run = np.cumsum(np.nan_to_num(values)) + position[axis]
+            else:
+                run = _forward_fill(values + offset[axis], position[axis])
+            out[axis][lo:hi] = run
+            position[axis] = float(run[-1])
+
+    has_axis = np.zeros(n, dtype=bool)
+    for axis in AXES:
+        has_axis |= ~np.isnan(raw[axis])
+    is_move = has_axis & ~columns.g92 & ~columns.g4
+
+    end = ModalState(
+        position=position,
+        offset=offset,
+        feed=float(feed[-1]) if n else start.feed,
+        motion=float(motion[-1]) if n else start.motion,
+        relative=bool(relative[-1]) if n else start.relative,
+        inches=bool(units[-1] == 20.0) if n else start.inches,
+    )
+    return Toolpath(x=out["x"], y=out["y"], z=out["z"], a=out["a"],
+                    f=feed, motion=motion, is_move=is_move,
+                    columns=columns, state=end)
+
+
+def move_segments(toolpath: Toolpath,
+                  start: Optional[ModalState] = None) -> Tuple[np.ndarray, ...]:
+    """
+    Returns ``(rows, x0, y0, x1, y1)`` for every move of a toolpath, where
+    ``rows`` are the 0-based source lines and each segment starts at the
+    position reached by the line before it.
+
+    :param start: modal state the toolpath was resolved from; the first
+        line starts at its position (power-on when omitted)
+    """
+    position = (start if start is not None else ModalState()).position
+    rows = np.flatnonzero(toolpath.is_move)
+    prev = np.maximum(rows - 1, 0)
+    first = rows == 0
+    x0 = np.where(first, position["x"], toolpath.x[prev])
+    y0 = np.where(first, position["y"], toolpath.y[prev])
+    return rows, x0, y0, toolpath.x[rows], toolpath.y[rows]
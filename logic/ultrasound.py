@@ -0,0 +1,202 @@
+"""
+Program-wide scheduling of the ultrasound transducer.
+
+The transducer should run while material is deposited and be off while
+the tool travels. The scheduler classifies every move of a resolved
+toolpath:
+
+- deposit: a feed move (G1/G2/G3) with an XY displacement
+- travel: any other move
+
+It then switches the transducer on (M3) at each travel -> deposit
+transition and off (M5) at each deposit -> travel transition. Deposit
+regions separated only by non-motion lines, or by no more travel than
+``merge_gap`` and no A rotation, are coalesced into one region. Ultrasound lines already
+in the program (M3, M5, ``M98 P"us.g"``, ``;M5``) are replaced by the
+schedule. Dwells with no deposit move on either side are dropped,
+because the tool waits there with the transducer off.
+
+M3/M5 are written so the post-processing pipeline can turn them into
+macro calls as usual.
+"""
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+
+import numpy as np
+
+from logic.io_utils import iter_mapped_lines, read_toolpath
+from logic.motion import move_deltas
+from logic.toolpath import Toolpath, parse_bytes, resolve_modal
+
+ULTRASOUND_ON = "M3"
+ULTRASOUND_OFF = "M5"
+
+CONTROL_RE = re.compile(r'^\s*(?:M0*3|M0*5|M98\s*P"us\.g"|;M5)\s*(?:;.*)?$',
+                        re.IGNORECASE)
+# A bare M3 or the ultrasound macro call the pipeline writes for it.
+ON_CODE = r'(?:M0*3|M98[ \t]*P"us\.g")'
+ON_RE = re.compile(r'^\s*' + ON_CODE + r'\s*(?:;.*)?$', re.IGNORECASE)
+# ON_RE over a whole buffer, one match per line.
+ON_LINE_RE = re.compile(rb'(?m)^[ \t]*' + ON_CODE.encode()
+                        + rb'[ \t]*(?:;[^\n]*)?\r?$', re.IGNORECASE)
+DWELL_RE = re.compile(r"^\s*G0*4\s*P\s*[\d.]+\s*(?:;.*)?$", re.IGNORECASE)
+
+
+@dataclass
+class UltrasoundPlan:
+    """
+    Where the transducer is switched: ``on_rows`` get M3 before them,
+    ``off_rows`` get M5 after them, and the dwell lines in ``drop_rows``
+    are removed (all 0-based line numbers).
+    """
+    on_rows: np.ndarray
+    off_rows: np.ndarray
+    drop_rows: np.ndarray
+    deposit_moves: int
+    dwells: int
+    dwell_seconds: float
+    dropped_seconds: float
+
+
+@dataclass
+class UltrasoundReport:
+    """Ultrasound switching and dwells before and after scheduling."""
+    regions: int = 0
+    deposit_moves: int = 0
+    macro_calls_before: int = 0
+    macro_calls_after: int = 0
+    dwells_before: int = 0
+    dwells_after: int = 0
+    dwell_seconds_before: float = 0.0
+    dwell_seconds_after: float = 0.0
+
+    @property
+    def macro_calls_saved(self) -> int:
+        return self.macro_calls_before - self.macro_calls_after
+
+    @property
+    def dwell_seconds_saved(self) -> float:
+        return self.dwell_seconds_before - self.dwell_seconds_after
+
+
+def plan_ultrasound(path: Toolpath, merge_gap: float = 0.0) -> UltrasoundPlan:
+    """
+    Computes the ultrasound schedule of a resolved toolpath.
+
+    :param merge_gap: travel length (mm) up to which two deposit regions
+        are merged and the transducer is left on in between; regions with
+        an A rotation between them are never merged
+    """
+    rows, deltas = move_deltas(path)
+    deposit = (path.motion[rows] != 0.0) & (np.hypot(deltas[:, 0],
+                                                     deltas[:, 1]) > 0.0)
+    travel_length = np.where(deposit, 0.0,
+                             np.sqrt(np.sum(deltas[:, :3] ** 2, axis=1)))
+    rotation = ~deposit & (deltas[:, 3] != 0.0)
+
+    deposit_moves = np.flatnonzero(deposit)
+    if len(deposit_moves):
+        # Travel between consecutive deposit moves decides whether they
+        # belong to the same region.
+        travelled = np.concatenate(([0.0], np.cumsum(travel_length)))
+        gap = (travelled[deposit_moves[1:]]
+               - travelled[deposit_moves[:-1] + 1])
+        rotations = np.concatenate(([0], np.cumsum(rotation)))
+        rotated = (rotations[deposit_moves[1:]]
+                   > rotations[deposit_moves[:-1] + 1])
+        separate = (np.diff(deposit_moves) > 1) & ((gap > merge_gap)
+                                                   | rotated)
+        starts = np.concatenate(([0], np.flatnonzero(separate) + 1))
+        ends = np.concatenate((starts[1:] - 1, [len(deposit_moves) - 1]))
+        on_rows = rows[deposit_moves[starts]]
+        off_rows = rows[deposit_moves[ends]]
+    else:
+        on_rows = off_rows = np.zeros(0, dtype=np.int64)
+
+    columns = path.columns
+    dwell_rows = np.flatnonzero(columns.g4)
+    seconds = np.nan_to_num(columns.p[dwell_rows]) / 1000.0
+    # The deposit state of the last move before and the first move after
+    # each dwell; dwells before the first or after the last move count
+    # as next to travel.
+    after = np.searchsorted(rows, dwell_rows)
+    deposit_before = np.zeros(len(dwell_rows), dtype=bool)
+    deposit_after = np.zeros(len(dwell_rows), dtype=bool)
+    has_before = after > 0
+    has_after = after < len(rows)
+    deposit_before[has_before] = deposit[after[has_before] - 1]
+    deposit_after[has_after] = deposit[after[has_after]]
+    drop = ~deposit_before & ~deposit_after
+    return UltrasoundPlan(on_rows=on_rows, off_rows=off_rows,
+                          drop_rows=dwell_rows[drop],
+                          deposit_moves=len(deposit_moves),
+                          dwells=len(dwell_rows),
+                          dwell_seconds=float(seconds.sum()),
+                          dropped_seconds=float(seconds[drop].sum()))
+
+
+def apply_ultrasound(lines: Iterable[str], plan: UltrasoundPlan,
+                     report: Optional[UltrasoundReport] = None
+                     ) -> Iterator[str]:
+    """
+    Yields the lines (without newlines) with the schedule applied. If a
+    report is given, the ultrasound calls found in the input are counted
+    into it as the lines are read.
+    """
+    on_rows = set(plan.on_rows.tolist())
+    off_rows = set(plan.off_rows.tolist())
+    drop_rows = set(plan.drop_rows.tolist())
+    for number, line in enumerate(lines):
+        line = line.rstrip("\r\n")
+        if number in drop_rows and DWELL_RE.match(line):
+            continue
+        if CONTROL_RE.match(line):
+            if report is not None and ON_RE.match(line):
+                report.macro_calls_before += 1
+            continue
+        if number in on_rows:
+            yield ULTRASOUND_ON
+        yield line
+        if number in off_rows:
+            yield ULTRASOUND_OFF
+
+
+def _report(plan: UltrasoundPlan) -> UltrasoundReport:
+    return UltrasoundReport(
+        regions=len(plan.on_rows), deposit_moves=plan.deposit_moves,
+        macro_calls_after=len(plan.on_rows), dwells_before=plan.dwells,
+        dwells_after=plan.dwells - len(plan.drop_rows),
+        dwell_seconds_before=plan.dwell_seconds,
+        dwell_seconds_after=plan.dwell_seconds - plan.dropped_seconds)
+
+
+def schedule_ultrasound_text(text: str, merge_gap: float = 0.0
+                             ) -> Tuple[str, UltrasoundReport]:
+    """Schedules the ultrasound of G-code held in a string."""
+    plan = plan_ultrasound(resolve_modal(parse_bytes(
+        text.encode("ascii", "replace"))), merge_gap)
+    report = _report(plan)
+    lines = apply_ultrasound(text.split("\n"), plan, report)
+    return "\n".join(lines), report
+
+
+def schedule_ultrasound_file(input_path: str, destination: TextIO,
+                             merge_gap: float = 0.0) -> UltrasoundReport:
+    """Schedules the ultrasound of a file line by line into ``destination``."""
+    plan = plan_ultrasound(read_toolpath(input_path), merge_gap)
+    report = _report(plan)
+    lines = (line.decode("ascii", "replace")
+             for line in iter_mapped_lines(input_path))
+    for line in apply_ultrasound(lines, plan, report):
+        destination.write(line + "\n")
+    return report
+
+
+def format_ultrasound_report(report: UltrasoundReport) -> str:
+    """Formats an UltrasoundReport for the results pane or the CLI."""
+    return (f"{report.regions} deposit regions ({report.deposit_moves} "
+            f"moves): ultrasound calls {report.macro_calls_before} -> "
+            f"{report.macro_calls_after}, dwells {report.dwells_before} -> "
+            f"{report.dwells_after} ({report.dwell_seconds_saved:.2f} s "
+            f"saved)")
@@ -0,0 +1,195 @@
+"""
+Checks a program against a machine profile before it is sent.
+
+Programs are tokenized and resolved chunk by chunk, carrying the modal
+state across chunks, and every rule is one array comparison per chunk,
+so files of millions of lines are checked in seconds with bounded memory.
+"""
+import json
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from logic.io_utils import mapped_file
+from logic.toolpath import (AXES, PARSE_CHUNK_BYTES, ModalState, Tokens,
+                            Toolpath, columns_from_tokens, iter_line_chunks,
+                            resolve_modal, tokenize)
+
+# Offending line numbers kept per rule; the count covers all of them.
+MAX_REPORTED_LINES = 20
+
+
+@dataclass
+class MachineProfile:
+    """
+    What a machine accepts. ``limits`` are machine coordinates in mm
+    (degrees for A) per axis; axes without limits are not checked. Feeds
+    are in mm/min, and in deg/min for moves of the A axis alone.
+    """
+    name: str = "default"
+    limits: Dict[str, List[float]] = field(default_factory=lambda: {
+        "x": [0.0, 300.0], "y": [0.0, 300.0], "z": [0.0, 200.0],
+        "a": [-360.0, 360.0]})
+    min_feed: float = 1.0
+    max_feed: float = 10000.0
+    max_a_feed: float = 5000.0
+    g_codes: List[float] = field(default_factory=lambda: [
+        0, 1, 2, 3, 4, 17, 20, 21, 28, 90, 91, 92])
+    m_codes: List[float] = field(default_factory=lambda: [
+        0, 1, 2, 3, 4, 5, 30, 98, 99])
+    tools: int = 10
+
+
+@dataclass
+class Violation:
+    """
+    One broken rule: how many lines break it, the first
+    MAX_REPORTED_LINES of them (1-based) and a description of the first.
+    """
+    rule: str
+    detail: str
+    count: int = 0
+    lines: List[int] = field(default_factory=list)
+
+
+@dataclass
+class ValidationReport:
+    """Violations by rule, in the order they were first found."""
+    lines: int = 0
+    violations: Dict[str, Violation] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.violations
+
+
+def profile_from_dict(data: Dict[str, Any]) -> MachineProfile:
+    """Builds a profile from its JSON form; missing keys take defaults."""
+    known = {f.name for f in fields(MachineProfile)}
+    unknown = set(data) - known
+    if unknown:
+        raise ValueError(
+            f"Unknown profile keys: {', '.join(sorted(unknown))}")
+    profile = MachineProfile(**data)
+    for axis, bounds in profile.limits.items():
+        if axis not in AXES or len(bounds) != 2:
+            raise ValueError(f"Invalid limits for axis '{axis}'")
+    return profile
+
+
+def load_profile(path: Optional[str]) -> MachineProfile:
+    """Reads a profile from a JSON file, or returns the default for None."""
+    if path is None:
+        return MachineProfile()
+    with open(path, "r") as f:
+        return profile_from_dict(json.load(f))
+
+
+def _record(report: ValidationReport, rule: str, rows: np.ndarray,
+            first_line: int, describe: Callable[[int], str]) -> None:
+    """Adds the offending chunk rows of a rule to the report."""
+    if not len(rows):
+        return
+    violation = report.violations.get(rule)
+    if violation is None:
+        violation = Violation(rule, describe(int(rows[0])))
+        report.violations[rule] = violation
+    violation.count += len(rows)
+    room = MAX_REPORTED_LINES - len(violation.lines)
+    if room > 0:
+        violation.lines.extend(int(row) + first_line + 1
+                               for row in rows[:room])
+
+
+def _check_chunk(report: ValidationReport, profile: MachineProfile,
+                 tokens: Tokens, path: Toolpath, first_line: int) -> None:
+    columns = path.columns
+    moves = path.is_move
+    for axis, (low, high) in profile.limits.items():
+        position = getattr(path, axis)
+        rows = np.flatnonzero(moves & ~np.isnan(getattr(columns, axis))
+                              & ((position < low) | (position > high)))
+        rule = "a travel" if axis == "a" else f"{axis} limit"
+        _record(report, rule, rows, first_line,
+                lambda row: f"{axis.upper()}={getattr(path, axis)[row]:.3f} "
+                            f"outside [{low:g}, {high:g}]")
+
+    # Feeds of cutting moves; rapids run at the machine's own speed.
+    a_only = (~np.isnan(columns.a) & np.isnan(columns.x)
+              & np.isnan(columns.y) & np.isnan(columns.z))
+    cutting = moves & (path.motion != 0.0)
+    feed = path.f
+    rows = np.flatnonzero(cutting & ~a_only & ((feed < profile.min_feed)
+                                               | (feed > profile.max_feed)))
+    _record(report, "feed", rows, first_line,
+            lambda row: f"F{feed[row]:g} outside "
+                        f"[{profile.min_feed:g}, {profile.max_feed:g}]")
+    rows = np.flatnonzero(cutting & a_only & ((feed <= 0)
+                                              | (feed > profile.max_a_feed)))
+    _record(report, "a feed", rows, first_line,
+            lambda row: f"F{feed[row]:g} outside (0, {profile.max_a_feed:g}]")
+
+    for letter, rule, allowed in (("G", "g code", profile.g_codes),
+                                  ("M", "m code", profile.m_codes)):
+        words = tokens.letter == ord(letter)
+        bad = words.copy()
+        bad[words] = ~np.isin(tokens.value[words], allowed)
+        _record(report, rule, np.unique(tokens.line[bad]), first_line,
+                lambda row, letter=letter, bad=bad: (
+                    f"{letter}{tokens.value[bad][0]:g} is not allowed"))
+    tool = tokens.letter == ord("T")
+    value = tokens.value
+    bad = tool & ((value != np.floor(value)) | (value < 0)
+                  | (value >= profile.tools))
+    _record(report, "tool", np.unique(tokens.line[bad]), first_line,
+            lambda row: f"T{value[bad][0]:g} is not one of "
+                        f"T0-T{profile.tools - 1}")
+
+
+def validate_bytes(data: Union[bytes, memoryview],
+                   profile: Optional[MachineProfile] = None,
+                   chunk_bytes: int = PARSE_CHUNK_BYTES) -> ValidationReport:
+    """
+    Validates a program held in a buffer (bytes or an mmap), one chunk of
+    about ``chunk_bytes`` at a time.
+    """
+    profile = profile if profile is not None else MachineProfile()
+    report = ValidationReport()
+    state: Optional[ModalState] = None
+    for chunk in iter_line_chunks(data, chunk_bytes):
+        tokens = tokenize(chunk)
+        path = resolve_modal(columns_from_tokens(tokens), state)
+        state = path.state
+        _check_chunk(report, profile, tokens, path, report.lines)
+        report.lines += tokens.line_count
+    return report
+
+
+def validate_file(path: str, profile: Optional[MachineProfile] = None
+                  ) -> ValidationReport:
+    """Validates a G-code file through a memory map."""
+    with mapped_file(path) as data:
+        return validate_bytes(data, profile)
+
+
+def validate_text(text: str, profile: Optional[MachineProfile] = None
+                  ) -> ValidationReport:
+    """Validates G-code held in a string, e.g. the editor contents."""
+    return validate_bytes(text.encode("ascii", "replace"), profile)
+
+
+def format_validation(report: ValidationReport) -> str:
+    """Formats a ValidationReport for the results pane or the CLI."""
+    if report.ok:
+        return f"{report.lines} lines checked: no problems found."
+    out = [f"{report.lines} lines checked: "
+           f"{sum(v.count for v in report.violations.values())} problems."]
+    for violation in report.violations.values():
+        lines = ", ".join(str(n) for n in violation.lines)
+        more = violation.count - len(violation.lines)
+        if more > 0:
+            lines += f" (+{more} more)"
+        out.append(f"{violation.rule}: {violation.detail}; "
+                   f"{violation.count} lines: {lines}")
+    return "\n".join(out)
@@ -0,0 +1,42 @@
+import io
+
+import numpy as np
+import pytest
+
+from logic.block_array import (block_array_origins, block_outline,
+                               print_block_array)
+from logic.print_block import print_block
+from logic.toolpath import parse_lines, resolve_modal
+
+
+@pytest.mark.parametrize("waveform, amplitude", [
+    ("sawtooth", 0.5), ("sawtooth", 0.2), ("square", 0.5)])
+def test_outline_matches_print_block(waveform, amplitude):
+    buffer = io.StringIO()
+    print_block(buffer, 0.3, "1500", "1200", True, 5.0, 7.0, 0.5, 100, False,
+                False, 800, 90.0, 800, waveform, amplitude=amplitude)
+    path = resolve_modal(parse_lines(buffer.getvalue().splitlines()))
+    g1 = path.is_move & (path.motion == 1.0) & ~np.isnan(path.columns.x)
+    expected = np.column_stack((path.x[g1], path.y[g1]))
+    outline = block_outline(10.0, 10.0, waveform, amplitude) + [5.0, 7.0]
+    assert np.allclose(outline, expected, atol=5e-4)
+
+
+def test_origins_are_serpentine():
+    origins = block_array_origins(0, 0, 3, 2, 20, 15)
+    assert origins.tolist() == [[0, 0], [20, 0], [40, 0],
+                                [40, 15], [20, 15], [0, 15]]
+
+
+def test_array_rotates_once_and_draws_every_block():
+    buffer = io.StringIO()
+    count = print_block_array(buffer, 0, 0, 4, 3, 15, 15, 0.3, "1500",
+                              "1200", 0.5, 100, 800, 90.0, 800, "sawtooth")
+    text = buffer.getvalue()
+    assert count == 12
+    assert text.count("G1 A") == 1
+    assert text.count("G0 X") == 12 and text.count("G04 P100") == 12
+    path = resolve_modal(parse_lines(text.splitlines()))
+    deposit = (path.motion == 1.0) & (path.z == 0.3)
+    assert path.x[deposit].max() == pytest.approx(45 + 10.5)
+    assert path.y[deposit].max() == pytest.approx(30 + 10)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from logic.cli import main
+from logic.cycle_time import (estimate_bytes, estimate_file, estimate_text,
+                              format_cycle_time, operation_rows)
+from logic.io_utils import build_line_index
+from logic.job import Job, JobStep, run_job
+from logic.motion import MotionLimits, plan_motion
+from logic.toolpath import parse_bytes, resolve_modal
+
+PROGRAM = """G0 X10 Y0 Z0.3
+; Rotate Start (sawtooth waveform)
+G1 A90 F1200
+; Rotate End
+G4 P250
+; Print ZigZag Start (square waveform)
+G1 X20 F600
+G1 X20 Y5 Z0.6
+; Print ZigZag End
+G0 X0 Y0
+"""
+
+
+def test_totals_add_motion_plan_and_dwells():
+    report = estimate_text(PROGRAM)
+    plan = plan_motion(resolve_modal(parse_bytes(PROGRAM.encode())))
+    assert report.total.total == pytest.approx(plan.time.sum() + 0.25)
+    assert report.total.moves == len(plan) == 5
+    assert report.total.dwell_time == 0.25
+    assert report.total.rotation_time == pytest.approx(plan.time[1])
+    assert report.total.travel_time == pytest.approx(plan.time[[0, 4]].sum())
+
+
+def test_breakdowns_by_operation_and_layer():
+    report = estimate_text(PROGRAM)
+    shares = {share.label: share for share in report.operations}
+    assert set(shares) == {"other", "rotate", "print_zigzag"}
+    assert shares["rotate"].moves == 1 and shares["rotate"].rotation_time > 0
+    # The dwell after the end marker is outside every operation.
+    assert shares["other"].dwell_time == 0.25 and shares["other"].moves == 2
+    assert shares["print_zigzag"].moves == 2
+    assert [share.label for share in report.layers] == ["1 (Z0.300)",
+                                                        "2 (Z0.600)"]
+    assert sum(share.total for share in report.layers) == pytest.approx(
+        report.total.total)
+    assert report.layers[1].moves == 2
+
+
+def test_acceleration_limits_slow_the_estimate():
+    slow = MotionLimits(acceleration={"x": 50.0, "y": 50.0, "z": 10.0,
+                                      "a": 50.0})
+    assert (estimate_text(PROGRAM, slow).total.total
+            > estimate_text(PROGRAM).total.total)
+
+
+def test_job_operations_are_attributed(tmp_path):
+    job = Job(steps=[JobStep("print_block"), JobStep("clean_block"),
+                     JobStep("rotate"), JobStep("print_zigzag", {"passes": 2})])
+    path = tmp_path / "job.gcode"
+    with open(path, "w") as destination:
+        run_job(job, destination, workers=1)
+    report = estimate_file(str(path))
+    labels = {share.label for share in report.operations}
+    assert {"print_block", "clean_block", "rotate", "print_zigzag"} <= labels
+    assert sum(share.total for share in report.operations) == pytest.approx(
+        report.total.total)
+    assert main(["estimate", str(path), "--workers", "1"]) == 0
+
+
+def test_unmarked_program_is_other():
+    data = b"G1 X1 F100\nG1 X2\n"
+    codes, names = operation_rows(data, build_line_index(data), 2)
+    assert np.all(codes == 0) and names[0] == "other"
+    report = estimate_bytes(data)
+    assert report.operations == [] and not report.operation_markers
+    assert "Per operation: unavailable" in format_cycle_time(report)
+    assert estimate_text(PROGRAM).operation_markers
+
+
+def test_z_hop_stays_in_its_layer():
+    report = estimate_text("G1 X1 Z0.2 F600\nG0 Z1.0\nG0 Z0.2\nG1 X2\n"
+                           "G0 Z0.4\nG1 X3\n")
+    assert [share.label for share in report.layers] == ["1 (Z0.200)",
+                                                        "2 (Z0.400)"]
+    assert report.layers[0].moves == 4
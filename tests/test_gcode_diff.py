@@ -0,0 +1,60 @@
+import io
+
+from logic.cli import main
+from logic.gcode_diff import diff_programs
+from logic.slicer import slicer
+
+
+def slicer_lines(x_max=20):
+    buffer = io.StringIO()
+    slicer(buffer, 0.9, 0.8, 0.3, 0.4, 5000, 1000, 0, x_max, 0, 20, "sawtooth")
+    return buffer.getvalue().splitlines()
+
+
+def test_formatting_and_modal_noise_is_ignored():
+    a = ["G1 X10.000 Y5 F1200", "G1 X20 Y5 F1200", "; note"]
+    b = ["G1 X10 Y5.0000 F1200.0", "X20", "G91", "G1 X0"]
+    assert list(diff_programs(a, b)) == []
+
+
+def test_reports_only_changed_layers():
+    a = slicer_lines()
+    b = slicer_lines()
+    b = [line.replace("X18.000", "X18.500") if "Z0.900" in line else line
+         for line in b]
+    differences = list(diff_programs(a, b))
+    assert [d.number for d in differences] == [3]
+    assert differences[0].max_deviation == 0.5
+    assert differences[0].lines_a == differences[0].lines_b
+    assert all(a[n - 1] != b[n - 1] for n in differences[0].lines_a)
+
+
+def test_tolerance_and_extra_moves():
+    assert list(diff_programs(["G1 X1"], ["G1 X1.0004"], tolerance=0.001)) == []
+    difference, = diff_programs(["G1 X1"], ["G1 X1", "G1 X2"])
+    assert (difference.moves_a, difference.moves_b) == (1, 2)
+    assert difference.lines_b == [2]
+
+
+def test_cli_exit_status(tmp_path, capsys):
+    first, second = tmp_path / "a.gcode", tmp_path / "b.gcode"
+    first.write_text("\n".join(slicer_lines()))
+    second.write_text("\n".join(slicer_lines(x_max=30)))
+    assert main(["diff", str(first), str(first)]) == 0
+    assert main(["diff", str(first), str(second)]) == 1
+    assert "Layer 1:" in capsys.readouterr().out
+
+
+def test_z_hop_does_not_start_a_layer():
+    a = ["G0 Z0.3", "G1 X10 F600", "G0 Z1", "G0 X0", "G0 Z0.3", "G1 X5",
+         "G0 Z0.6", "G1 X10"]
+    b = a[:2] + a[5:]
+    difference, = diff_programs(a, b)
+    assert difference.number == 1
+    assert (difference.moves_a, difference.moves_b) == (6, 3)
+
+
+def test_g92_offset_is_applied():
+    a = ["G1 X5 F600", "G1 X6", "G1 X7"]
+    b = ["G1 X5 F600", "G92 X0", "G1 X1", "G1 X2"]
+    assert list(diff_programs(a, b)) == []
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from logic import io_utils
+from logic.io_utils import (count_file_lines, file_cache, mapped_file,
+                            read_head_tail)
+
+LINES = [f"G1 X{i}" for i in range(1, 101)]
+
+
+@pytest.mark.parametrize("ending", ["\n", ""])
+def test_head_tail_of_long_file(tmp_path, ending):
+    path = tmp_path / "long.gcode"
+    path.write_text("\n".join(LINES) + ending)
+    head, tail, total = read_head_tail(str(path), 3, 2)
+    assert head == "G1 X1\nG1 X2\nG1 X3\n"
+    assert tail == "G1 X99\nG1 X100" + ending
+    assert total == 100
+    assert count_file_lines(str(path)) == 100
+
+
+@pytest.mark.parametrize("text, total", [
+    ("", 0),
+    ("G28\n", 1),
+    ("\n".join(LINES) + "\n", 100),
+])
+def test_short_file_is_returned_whole(tmp_path, text, total):
+    path = tmp_path / "short.gcode"
+    path.write_text(text)
+    assert read_head_tail(str(path), 60, 40) == (text, None, total)
+
+
+def test_mapping_is_closed_on_exit(tmp_path):
+    path = tmp_path / "program.gcode"
+    path.write_text("G28\n")
+    with mapped_file(str(path)) as data:
+        assert data[:3] == b"G28"
+    assert data.closed
+
+
+def test_file_cache_is_bounded_and_stamped(tmp_path):
+    paths = [tmp_path / f"{i}.gcode" for i in range(io_utils.FILE_CACHE_SIZE + 1)]
+    for path in paths:
+        path.write_text("G28\n")
+        file_cache(str(path))["artifact"] = path.name
+    assert len(io_utils._file_cache) <= io_utils.FILE_CACHE_SIZE
+    assert os.path.realpath(paths[0]) not in io_utils._file_cache
+    assert file_cache(str(paths[-1])) == {"artifact": paths[-1].name}
+    paths[-1].write_text("G28\nG1 X1\n")
+    assert file_cache(str(paths[-1])) == {}
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+from logic.cli import main
+from logic.job import (Job, JobStep, load_job, post_process, render_step,
+                       run_job, save_job)
+from logic.postprocess import build_pipeline
+
+
+def make_job():
+    return Job(name="plate", steps=[
+        JobStep("print_layer0", {"z_value": 0.2}, "square"),
+        JobStep("print_block", {"x_value": 30.0}),
+        JobStep("clean_block"),
+        JobStep("rotate", {"angle": 45.0}, "square"),
+        JobStep("print_zigzag", {"passes": 2}),
+    ])
+
+
+def test_job_round_trips_through_json(tmp_path):
+    path = str(tmp_path / "job.json")
+    save_job(make_job(), path)
+    assert load_job(path) == make_job()
+
+
+def test_invalid_step_is_rejected(tmp_path):
+    path = tmp_path / "job.json"
+    path.write_text('{"steps": [{"operation": "print_block", '
+                    '"parameters": {"radius": 1}}]}')
+    with pytest.raises(ValueError):
+        load_job(str(path))
+
+
+def test_parallel_run_matches_sequential_order():
+    sequential, parallel = io.StringIO(), io.StringIO()
+    run_job(make_job(), sequential, workers=1)
+    run_job(make_job(), parallel, workers=2)
+    assert parallel.getvalue() == sequential.getvalue()
+    expected = "".join(post_process(render_step(step, i)
+                                    for i, step in enumerate(make_job().steps)))
+    assert sequential.getvalue() == expected
+    assert "; Step 5: print_zigzag (sawtooth)" in expected
+
+
+def test_job_runs_through_the_given_pipeline():
+    job = Job(steps=[JobStep("print_block"), JobStep("print_zigzag")])
+    default, scaled = io.StringIO(), io.StringIO()
+    run_job(job, default, workers=1)
+    run_job(job, scaled, workers=2, pipeline=build_pipeline(
+        [{"stage": "feed_scale", "factor": 0.5}, {"stage": "line_numbers"}]))
+    assert "G1 Z0.8 F1500\n" in default.getvalue()
+    numbered = [line for line in scaled.getvalue().splitlines()
+                if line.startswith("N")]
+    # One pipeline numbers the whole program and scales each feed once.
+    assert numbered[0].startswith("N1 G1 Z0.8 F750.0*")
+    assert numbered[-1].startswith(f"N{len(numbered)} ")
+
+
+def test_cli_creates_and_runs_job(tmp_path):
+    job, output = str(tmp_path / "job.json"), str(tmp_path / "out.gcode")
+    assert main(["job", "new", "print_layer0", "rotate", "-o", job]) == 0
+    assert main(["job", "run", job, "-o", output, "--workers", "1"]) == 0
+    text = open(output).read()
+    assert "; Step 1: print_layer0" in text and "; Rotate End" in text
@@ -0,0 +1,70 @@
+import io
+
+import numpy as np
+
+from logic.layer_index import (LayerState, build_layer_index, extract_layer,
+                               find_layer_starts, layer_index_for_file,
+                               marker_rows, regenerate_layer, replace_layer)
+from logic.slicer import slicer
+from logic.toolpath import parse_bytes, resolve_modal
+
+
+def write_slicer_job(path):
+    buffer = io.StringIO()
+    slicer(buffer, 0.9, 0.8, 0.3, 0.4, 5000, 1000, 0, 20, 0, 20, "square")
+    path.write_text(buffer.getvalue())
+    return buffer.getvalue()
+
+
+def test_markers_give_layers_with_byte_ranges(tmp_path):
+    path = tmp_path / "job.gcode"
+    text = write_slicer_job(path)
+    layers = layer_index_for_file(str(path))
+    assert [layer.number for layer in layers] == [1, 2, 3]
+    assert [layer.z for layer in layers] == [0.3, 0.6, 0.9]
+    lines = text.splitlines()
+    for layer in layers:
+        body = text.encode()[layer.start:layer.end].decode().splitlines()
+        assert body == lines[layer.first_line - 1:
+                             layer.first_line - 1 + layer.line_count]
+        assert body[0].startswith(f"; Layer {layer.number} at Z")
+
+
+def test_z_changes_without_markers():
+    data = b"G0 Z0.2\nG1 X1\nG1 Z0.7\nG1 Z0.2\nG1 X2\nG0 Z0.4\nG1 X3\n"
+    layers = build_layer_index(data)
+    assert [(layer.z, layer.first_line, layer.line_count)
+            for layer in layers] == [(0.2, 1, 5), (0.4, 6, 2)]
+
+
+def test_prints_without_z_changes_form_one_layer():
+    layers = build_layer_index(b"G1 X1 F100\nG1 X2\n")
+    assert [(layer.z, layer.first_line, layer.line_count)
+            for layer in layers] == [(0.0, 1, 2)]
+
+
+def test_replace_and_regenerate_layer(tmp_path):
+    path = tmp_path / "job.gcode"
+    write_slicer_job(path)
+    before = extract_layer(str(path), 1)
+    after = extract_layer(str(path), 3)
+
+    replace_layer(str(path), 2, "; Layer 2 at Z0.600\nG1 X1 Y1\n")
+    assert extract_layer(str(path), 2) == b"; Layer 2 at Z0.600\nG1 X1 Y1\n"
+    assert extract_layer(str(path), 1) == before
+    assert extract_layer(str(path), 3) == after
+
+    layer = regenerate_layer(str(path), 2, lambda dest, layer: dest.write(
+        f"G1 X5 Z{layer.z:.3f}\n" * 50))
+    assert layer.line_count == 51
+    assert extract_layer(str(path), 3) == after
+    assert len(layer_index_for_file(str(path))) == 3
+
+
+def test_layer_waits_for_a_print_across_chunks():
+    head = resolve_modal(parse_bytes(b"G0 Z0.2\nG1 X1 F100\nG0 Z0.4\n"))
+    state = LayerState()
+    rows, heights, cut = find_layer_starts(head, marker_rows(b"", np.zeros(1)),
+                                           state, final=False)
+    assert rows.tolist() == [0] and heights.tolist() == [0.2] and cut == 2
+    assert state.z == 0.2
@@ -0,0 +1,93 @@
+import io
+
+import numpy as np
+import pytest
+
+from logic.layer_index import build_layer_index
+from logic.mesh import STL_RECORD, parse_stl, slice_mesh
+from logic.operations import operation_parameters, run_operation
+from logic.output_cache import OutputCache
+
+# Corner indices are 4 * x + 2 * y + z of a box; faces wind outwards.
+BOX_FACES = [(0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5), (0, 4, 5), (0, 5, 1),
+             (2, 3, 7), (2, 7, 6), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)]
+
+
+def box(x0, y0, z0, x1, y1, z1, inward=False):
+    corners = np.array([[x, y, z] for x in (x0, x1) for y in (y0, y1)
+                        for z in (z0, z1)], dtype=float)
+    triangles = corners[np.array(BOX_FACES)]
+    normals = np.cross(triangles[:, 1] - triangles[:, 0],
+                       triangles[:, 2] - triangles[:, 0])
+    outward = triangles.mean(axis=1) - corners.mean(axis=0)
+    flip = (np.einsum("ij,ij->i", normals, outward) < 0) != inward
+    triangles[flip] = triangles[flip][:, [0, 2, 1]]
+    return triangles
+
+
+def stl_bytes(triangles):
+    records = np.zeros(len(triangles), dtype=STL_RECORD)
+    records["vertices"] = triangles
+    return (b"\0" * 80 + np.uint32(len(triangles)).tobytes()
+            + records.tobytes())
+
+
+def signed_area(polygon):
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+def test_parse_stl_round_trips_vertices():
+    triangles = box(0, 0, 0, 10, 20, 3)
+    assert np.array_equal(parse_stl(stl_bytes(triangles)), triangles)
+
+
+@pytest.mark.parametrize("data", [b"solid part\nfacet normal 0 0 1\n",
+                                  b"\0" * 80 + np.uint32(5).tobytes()])
+def test_parse_stl_rejects_ascii_and_truncated_files(data):
+    with pytest.raises(ValueError):
+        parse_stl(data)
+
+
+def test_box_slices_into_one_rectangle_per_layer():
+    slices = slice_mesh(box(0, 0, 0, 10, 20, 3), 1.0)
+    assert slices.heights.tolist() == [0.5, 1.5, 2.5]
+    assert slices.open_chains == 0
+    for contours in slices.contours:
+        assert len(contours) == 1
+        assert sorted(map(tuple, contours[0].tolist())) == [
+            (0, 0), (0, 20), (10, 0), (10, 20)]
+        assert signed_area(contours[0]) == pytest.approx(200.0)
+
+
+def test_hole_runs_clockwise():
+    # A box with an inward-facing box inside it: a frame with a hole.
+    triangles = np.concatenate((box(0, 0, 0, 30, 30, 2),
+                                box(10, 10, 0, 20, 20, 2, inward=True)))
+    contours = slice_mesh(triangles, 1.0).contours[0]
+    areas = sorted(signed_area(contour) for contour in contours)
+    assert areas == pytest.approx([-100.0, 900.0])
+
+
+def test_slicer_walls_follow_mesh_contours(tmp_path):
+    path = tmp_path / "part.stl"
+    path.write_bytes(stl_bytes(box(0, 0, 5, 10, 20, 5.9)))
+    buffer = io.StringIO()
+    parameters = operation_parameters("slicer", stl_path=str(path), walls=1,
+                                      fill_density=0)
+    run_operation(buffer, "slicer", parameters, "none", "none")
+    text = buffer.getvalue()
+    layers = build_layer_index(text.encode())
+    assert [round(layer.z, 3) for layer in layers] == [0.3, 0.6, 0.9]
+    assert text.count("G0 X0.200 Y0.200") == 3
+    assert text.count("G1 X9.800 Y19.800") == 3
+
+
+def test_cache_key_follows_input_file(tmp_path):
+    path = tmp_path / "part.stl"
+    path.write_bytes(stl_bytes(box(0, 0, 0, 10, 10, 1)))
+    cache = OutputCache(str(tmp_path / "cache"))
+    parameters = operation_parameters("slicer", stl_path=str(path))
+    before = cache.key("slicer", parameters, "square")
+    path.write_bytes(stl_bytes(box(0, 0, 0, 10, 10, 2)))
+    assert cache.key("slicer", parameters, "square") != before
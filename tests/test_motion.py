@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from logic.cli import main
+from logic.motion import (MotionLimits, plan_feeds, plan_feeds_text,
+                          plan_motion, rewrite_feeds)
+from logic.toolpath import parse_lines, resolve_modal
+
+
+def resolve(text):
+    return resolve_modal(parse_lines(text.splitlines()))
+
+
+def test_long_move_is_a_trapezoid():
+    # 100 mm at 100 mm/s and 500 mm/s^2: 10 mm ramps and 80 mm cruise.
+    plan = plan_motion(resolve("G1 X100 F6000\n"))
+    assert plan.peak.tolist() == [100.0]
+    assert plan.time.tolist() == pytest.approx([1.2])
+
+
+def test_short_move_is_a_triangle():
+    plan = plan_motion(resolve("G1 X1 F6000\n"))
+    peak = np.sqrt(500.0 * 1.0)
+    assert plan.peak[0] == pytest.approx(peak)
+    assert plan.time[0] == pytest.approx(2 * peak / 500.0)
+
+
+@pytest.mark.parametrize("text, stopped", [
+    ("G1 X10 F6000\nG1 X20\n", False),
+    ("G1 X10 F6000\nG1 X0\n", True),
+    ("G1 X10 F6000\nG4 P100\nG1 X20\n", True),
+    ("G1 X10 F6000\nM3\nG1 X20\n", True),
+])
+def test_junction_speeds(text, stopped):
+    plan = plan_motion(resolve(text))
+    assert plan.entry[0] == plan.exit[-1] == 0.0
+    if stopped:
+        assert plan.exit[0] == 0.0
+    else:
+        assert plan.exit[0] == pytest.approx(100.0)
+
+
+def test_passes_respect_acceleration():
+    text = "G1 X0 Y0 F3000\n" + "".join(
+        f"G1 X{i * 0.5:.1f} Y{(i % 2) * 0.3:.1f}\n" for i in range(1, 200))
+    plan = plan_motion(resolve(text), MotionLimits(junction_deviation=0.2))
+    limit = 2 * plan.acceleration * plan.length + 1e-9
+    assert np.all(np.abs(plan.exit ** 2 - plan.entry ** 2) <= limit)
+    assert np.all(plan.peak <= plan.nominal + 1e-12)
+
+
+def test_a_axis_acceleration_limits_rotations():
+    fast = plan_motion(resolve("G1 A90 F6000\n"))
+    slow = plan_motion(resolve("G1 A90 F6000\n"),
+                       MotionLimits(acceleration={"a": 100.0}))
+    assert slow.time[0] > fast.time[0]
+
+
+def test_feeds_are_lowered_only_where_unreachable():
+    text = "G1 X100 F6000\n" + "".join(
+        f"G1 X{100 + i * 0.2:.1f} Y{(i % 2) * 0.2:.1f}\n" for i in range(1, 50))
+    rows, feeds, report = plan_feeds(resolve(text))
+    assert feeds[0] == 6000.0
+    assert np.all(feeds[1:] < 6000.0) and np.all(feeds % 10 == 0)
+    assert report.changed == 49
+    assert report.achievable_feed < report.commanded_feed == pytest.approx(6000)
+
+
+def test_rewrite_feeds_adds_words_only_on_change():
+    lines = ["G1 X1 F1000 ; F5", "G1 X2", "G1 X3", "G0 X0 F5000", "G1 X4"]
+    rows = np.array([0, 1, 2, 4])
+    out = list(rewrite_feeds(lines, rows, np.array([900., 900., 800., 800.])))
+    assert out == ["G1 X1 F900 ; F5", "G1 X2", "G1 X3 F800", "G0 X0 F5000",
+                   "G1 X4 F800"]
+
+
+def test_plan_feeds_rejects_inches():
+    with pytest.raises(ValueError):
+        plan_feeds_text("G20\nG1 X1 F10\n")
+
+
+def test_cli_plan_feeds(tmp_path, capsys):
+    source = tmp_path / "in.gcode"
+    source.write_text("G1 X0.5 F6000\nG1 X0\nG1 X0.5\n")
+    output = tmp_path / "out.gcode"
+    assert main(["plan-feeds", str(source), "-o", str(output)]) == 0
+    planned = output.read_text().splitlines()
+    assert planned[0].startswith("G1 X0.5 F") and planned[0] != "G1 X0.5 F6000"
+    assert "3 cutting moves" in capsys.readouterr().out
@@ -0,0 +1,55 @@
+import io
+
+from logic.job import Job, JobStep
+from logic.multi_tool import build_multi_tool_program, order_tools, plan_steps
+
+ANGLES = {"T0": 0.0, "T1": 36.0, "T2": 72.0, "T3": 108.0}
+
+
+def block(tool, x, z=0.3, **parameters):
+    return JobStep("print_block", {"x_value": x, "z_value": z, **parameters},
+                   "square", tool)
+
+
+def test_order_tools_sweeps_nearer_end_first():
+    assert order_tools(["T0", "T2", "T3"], 40.0, ANGLES) == ["T0", "T2", "T3"]
+    assert order_tools(["T0", "T2", "T3"], 80.0, ANGLES) == ["T3", "T2", "T0"]
+    assert order_tools(["T1", "T2"], 36.0, ANGLES) == ["T1", "T2"]
+
+
+def test_steps_are_grouped_per_tool_within_a_layer():
+    steps = [block("T2", 0), block("T0", 10), block("T2", 20),
+             block("T0", 30, z=0.6), block("T2", 40, z=0.6)]
+    planned = plan_steps(steps, None, 0.0, ANGLES)
+    assert [(s.tool, s.parameters["x_value"]) for s in planned] == [
+        ("T0", 10), ("T2", 0), ("T2", 20), ("T2", 40), ("T0", 30)]
+
+
+def test_program_skips_redundant_changes_and_a_moves():
+    job = Job(steps=[block(tool, x, next_tool_angle=ANGLES[tool])
+                     for tool, x in (("T1", 0), ("T2", 10), ("T1", 20),
+                                     ("T2", 30))])
+    destination = io.StringIO()
+    report = build_multi_tool_program(job, destination, ANGLES, a_feed=600,
+                                      tool_change_seconds=2.0,
+                                      a_move_seconds=0.5)
+    lines = destination.getvalue().splitlines()
+    assert [line for line in lines if line in ("T1", "T2")] == ["T1", "T2"]
+    assert [line for line in lines if line.startswith("G1 A")] == [
+        "G1 A36.000 F600", "G1 A72.000 F600"]
+    assert (report.naive_tool_changes, report.tool_changes) == (4, 2)
+    assert (report.naive_a_moves, report.a_moves) == (4, 2)
+    assert report.naive_a_travel == 36 * 4 and report.a_travel == 72
+    assert report.seconds_saved == 72 / 600 * 60 + 2 * 2.0 + 2 * 0.5
+
+
+def test_job_order_is_measured_by_its_own_a_moves():
+    # The first block is already at its angle and writes no A move; the
+    # second turns to 90 degrees, which is not its tool's angle.
+    job = Job(steps=[block("T0", 0, next_tool_angle=0.0,
+                           current_tool_angle=0.0),
+                     block("T0", 10, next_tool_angle=90.0),
+                     JobStep("rotate", {"angle": 45.0}, "square")])
+    report = build_multi_tool_program(job, io.StringIO(), ANGLES)
+    assert (report.naive_a_moves, report.naive_a_travel) == (2, 90 + 45)
+    assert (report.a_moves, report.a_travel) == (1, 45)
@@ -0,0 +1,59 @@
+import io
+import os
+
+import pytest
+
+from logic.operations import (DEFAULT_PARAMETERS, operation_parameters,
+                              run_operation)
+from logic.output_cache import OutputCache
+
+
+@pytest.mark.parametrize("operation", sorted(DEFAULT_PARAMETERS))
+def test_default_parameters_match_generators(operation):
+    buffer = io.StringIO()
+    run_operation(buffer, operation, operation_parameters(operation), "square")
+    assert buffer.getvalue()
+
+
+def test_unknown_parameter_is_rejected():
+    with pytest.raises(ValueError):
+        operation_parameters("rotate", radius=2)
+
+
+def test_hit_returns_stored_output_and_result(tmp_path):
+    cache = OutputCache(str(tmp_path))
+    parameters = operation_parameters("print_block")
+    calls = []
+
+    def write(destination):
+        calls.append(1)
+        return run_operation(destination, "print_block", parameters, "sawtooth")
+
+    first = cache.get_or_generate("print_block", parameters, "sawtooth", write)
+    second = cache.get_or_generate("print_block", parameters, "sawtooth", write)
+    assert (first[2], second[2]) == (False, True)
+    assert first[:2] == second[:2] and len(calls) == 1
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    other = cache.get_or_generate("print_block", parameters, "square", write)
+    assert other[0] != first[0]
+    quiet = cache.get_or_generate("print_block", parameters, "sawtooth", write,
+                                  verbosity="none")
+    assert quiet[0] != first[0] and not quiet[2]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = OutputCache(str(tmp_path), max_bytes=2500)
+
+    def write(destination):
+        destination.write("G1 X1\n" * 150)
+
+    keys = [cache.key("rotate", {"angle": angle}, "square") for angle in range(3)]
+    cache.store(keys[0], write)
+    cache.store(keys[1], write)
+    os.utime(os.path.join(str(tmp_path), keys[1] + ".gcode"), (1, 1))
+    os.utime(os.path.join(str(tmp_path), keys[1] + ".json"), (1, 1))
+    cache.store(keys[2], write)
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) is not None
+    assert cache.stats.evictions == 1
+    assert cache.size() <= 2500
@@ -0,0 +1,53 @@
+from dataclasses import fields
+
+import numpy as np
+import pytest
+
+from logic.parallel_parse import (parse_file_parallel, read_toolpath_parallel,
+                                  split_spans)
+from logic.toolpath import WordColumns, parse_bytes, resolve_modal
+
+
+def program(lines=2000):
+    out = ["G21", "G90"]
+    for i in range(lines):
+        if i % 300 == 0:
+            out.append("G91 ; relative run")
+        elif i % 300 == 150:
+            out.append("G90")
+        elif i % 500 == 7:
+            out.append("G92 X0 Y0")
+        out.append(f"G1 X{i % 17}.5 Y{i % 5} F{1000 + i % 3} (c)")
+        if i % 400 == 0:
+            out.append("G4 P100\nM3")
+    return "\n".join(out)
+
+
+@pytest.mark.parametrize("ending", ["\n", ""])
+def test_parallel_parse_matches_sequential(tmp_path, ending):
+    text = program() + ending
+    path = tmp_path / "big.gcode"
+    path.write_text(text)
+    expected = parse_bytes(text.encode())
+    columns = parse_file_parallel(str(path), workers=2, chunk_bytes=4096)
+    for field in fields(WordColumns):
+        assert np.array_equal(getattr(columns, field.name),
+                              getattr(expected, field.name), equal_nan=True)
+
+
+def test_modal_state_is_carried_across_chunks(tmp_path):
+    text = program()
+    path = tmp_path / "big.gcode"
+    path.write_text(text)
+    expected = resolve_modal(parse_bytes(text.encode()))
+    toolpath = read_toolpath_parallel(str(path), workers=2, chunk_bytes=1000)
+    for axis in ("x", "y", "z", "a", "f", "motion"):
+        assert np.array_equal(getattr(toolpath, axis), getattr(expected, axis))
+    assert toolpath.state == expected.state
+
+
+def test_spans_end_at_newlines():
+    data = b"G1 X1\nG1 X22\nG1 X333\nG1"
+    spans = split_spans(data, 4)
+    assert [data[lo:hi] for lo, hi in spans] == [b"G1 X1\n", b"G1 X22\n",
+                                                 b"G1 X333\n", b"G1"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from logic.polygons import (apply_waveform, offset_polygon, offset_region,
+                            perimeters, scanline_infill, signed_area)
+
+SQUARE = np.array([[0, 0], [30, 0], [30, 30], [0, 30]], dtype=float)
+HOLE = np.array([[10, 10], [10, 20], [20, 20], [20, 10]], dtype=float)
+L_SHAPE = np.array([[0, 0], [20, 0], [20, 5], [5, 5], [5, 20], [0, 20]],
+                   dtype=float)
+
+
+def test_offset_shrinks_outline_and_grows_hole():
+    outline, hole = offset_region([SQUARE, HOLE], 1.0)
+    assert outline.tolist() == [[1, 1], [29, 1], [29, 29], [1, 29]]
+    assert signed_area(hole) == pytest.approx(-144.0)
+
+
+@pytest.mark.parametrize("polygon, distance, area", [
+    (L_SHAPE, 1.0, 18 * 3 + 3 * 15),
+    (L_SHAPE, 2.6, None),
+    (SQUARE, 16.0, None),
+])
+def test_offset_removes_collapsed_polygons(polygon, distance, area):
+    result = offset_polygon(polygon, distance)
+    if area is None:
+        assert len(result) == 0
+    else:
+        assert signed_area(result) == pytest.approx(area)
+
+
+def test_perimeters_stop_when_region_is_full():
+    loops = perimeters([SQUARE], 100, 4.0)
+    assert len(loops) == 4
+    assert loops[0][0][0].tolist() == [2, 2]
+
+
+def test_infill_skips_holes_and_snakes():
+    spans = scanline_infill([SQUARE, HOLE], 5.0)
+    assert spans[:, 0, 1].tolist() == [2.5, 7.5, 12.5, 12.5, 17.5, 17.5,
+                                       22.5, 27.5]
+    lengths = np.abs(spans[:, 1, 0] - spans[:, 0, 0])
+    assert lengths.tolist() == [30, 30, 10, 10, 10, 10, 30, 30]
+    # Odd scan lines run right to left, nearest span first.
+    assert spans[1, 0, 0] == 30 and spans[4].tolist() == [[30, 17.5],
+                                                           [20, 17.5]]
+
+
+def test_rotated_infill_stays_inside():
+    spans = scanline_infill([SQUARE], 2.0, angle=45.0)
+    assert len(spans)
+    assert np.all((spans > -1e-9) & (spans < 30 + 1e-9))
+    direction = spans[:, 1] - spans[:, 0]
+    assert np.allclose(np.abs(direction[:, 0]), np.abs(direction[:, 1]))
+
+
+@pytest.mark.parametrize("waveform, points", [
+    ("sawtooth", [[0, 0], [1, 0.5], [2, 0], [3, 0.5], [4, 0]]),
+    ("square", [[0, 0], [1, 0], [1, 0.5], [2, 0.5], [2, 0], [3, 0], [3, 0.5],
+                [4, 0.5], [4, 0]]),
+    ("none", [[0, 0], [4, 0]]),
+])
+def test_waveforms_along_a_line(waveform, points):
+    path = np.array([[0, 0], [4, 0]], dtype=float)
+    assert apply_waveform(path, waveform).tolist() == points
@@ -0,0 +1,92 @@
+import io
+
+import numpy as np
+import pytest
+
+from logic.cli import main
+from logic.gcode import replace_m3_m5
+from logic.postprocess import build_pipeline, line_checksum
+from logic.toolpath import parse_lines, resolve_modal
+
+PROGRAM = """; start
+M3
+G1 X1 Y2 F1200 ; deposit
+G0 Z5 (lift)
+M7
+M5 ; off
+"""
+
+
+def test_default_pipeline_matches_replace_m3_m5():
+    pipeline = build_pipeline()
+    assert pipeline.process_text(PROGRAM) == replace_m3_m5(PROGRAM)
+    assert pipeline.process_text(pipeline.process_text(PROGRAM)) == \
+        replace_m3_m5(PROGRAM)
+
+
+def test_stages_run_in_config_order():
+    pipeline = build_pipeline([
+        {"stage": "m3_m5"},
+        {"stage": "macro", "macros": {"m7": 'M98 P"air.g"'}},
+        {"stage": "feed_scale", "factor": 0.5},
+        {"stage": "strip_comments"},
+        {"stage": "line_numbers", "checksum": False},
+    ])
+    assert pipeline.process_text(PROGRAM).splitlines() == [
+        'N1 M98 P"us.g"',
+        "N2 G1 X1 Y2 F600.0",
+        "N3 G0 Z5",
+        'N4 M98 P"air.g"',
+    ]
+    assert set(pipeline.timings) == {"m3_m5", "macro", "feed_scale",
+                                     "strip_comments", "line_numbers"}
+    assert pipeline.lines_in == 6 and pipeline.lines_out == 4
+
+
+def test_line_numbers_checksum():
+    pipeline = build_pipeline([{"stage": "line_numbers", "start": 10}])
+    line = pipeline.process_text("G28 ; home")
+    command, _, value = line.partition("*")
+    assert command == "N10 G28"
+    assert int(value) == line_checksum(command)
+    assert line_checksum("N10 G28") == ord("N") ^ ord("1") ^ ord("0") ^ \
+        ord(" ") ^ ord("G") ^ ord("2") ^ ord("8")
+
+
+@pytest.mark.parametrize("config", [
+    [{"stage": "unknown"}],
+    [{"stage": "feed_scale"}],
+    [{"stage": "m3_m5", "factor": 2}],
+])
+def test_invalid_config_is_rejected(config):
+    with pytest.raises(ValueError):
+        build_pipeline(config)
+
+
+def test_stream_matches_text_across_batches(monkeypatch):
+    monkeypatch.setattr("logic.postprocess.BATCH_LINES", 7)
+    program = PROGRAM * 20
+    config = [{"stage": "m3_m5"}, {"stage": "line_numbers"}]
+    out = io.StringIO()
+    written = build_pipeline(config).process_stream(io.StringIO(program), out)
+    assert out.getvalue() == build_pipeline(config).process_text(program) + "\n"
+    assert written == 120
+
+
+def test_feed_scale_on_toolpath_matches_text():
+    text = "G1 X1 F1000\nG1 X2\nG1 X3 F500\n"
+    pipeline = build_pipeline([{"stage": "feed_scale", "factor": 1.5}])
+    arrays = pipeline.process_toolpath(resolve_modal(parse_lines(
+        text.splitlines())))
+    scaled = resolve_modal(parse_lines(pipeline.process_text(text).splitlines()))
+    assert np.array_equal(arrays.f, scaled.f)
+
+
+def test_cli_postprocess(tmp_path, capsys):
+    source = tmp_path / "in.gcode"
+    source.write_text(PROGRAM)
+    output = tmp_path / "out.gcode"
+    assert main(["postprocess", str(source), "-o", str(output),
+                 "--stage", "m3_m5", "--stage", "strip_comments"]) == 0
+    assert output.read_text() == 'M98 P"us.g"\nG1 X1 Y2 F1200\nG0 Z5\nM7\n'
+    assert "strip_comments" in capsys.readouterr().out
@@ -0,0 +1,49 @@
+from logic.preview import decimate, preview_text, select_layers
+
+
+def segments_of(text):
+    return preview_text(text)
+
+
+def test_collinear_runs_merge_into_one_polyline():
+    lines = ["G0 X0 Y0 Z0.3"] + [f"G1 X{i} Y0" for i in range(1, 101)]
+    lines += ["G1 X100 Y100", "G1 X0 Y100", "G1 X0 Y0"]
+    segments = segments_of("\n".join(lines))
+    polylines = decimate(segments, select_layers(segments, 0), 120, 120)
+    deposits = [coords.tolist() for travel, coords in polylines if not travel]
+    assert deposits == [[10, 110, 110, 110, 110, 10, 10, 10, 10, 110]]
+
+
+def test_dense_waveform_is_binned_per_pixel_column():
+    lines = ["G0 X0 Y0 Z0.3", "G1 X1000 Y0"]
+    lines += [f"G1 X{i * 0.01:.2f} Y{(i % 2) * 0.05:.2f}" for i in range(10000)]
+    segments = segments_of("\n".join(lines))
+    polylines = decimate(segments, select_layers(segments, 0), 200, 200)
+    assert len(polylines) <= 200
+
+
+def test_layers_and_travel_are_separated():
+    # The Z-only travel to the second layer collapses to a single dot.
+    segments = segments_of("G0 X0 Y0 Z0.3\nG1 X50 Y0\nG0 Z0.6\nG0 X0 Y50\n"
+                           "G1 X50 Y50\n")
+    assert segments.heights.tolist() == [0.3, 0.6]
+    top = decimate(segments, select_layers(segments, 1), 100, 100)
+    assert sorted(travel for travel, _ in top) == [False, True, True]
+
+
+def test_retraced_pixels_are_drawn_once():
+    # 20000 teeth a few pixels tall all land on the same columns.
+    lines = ["G0 X0 Y0 Z0.3"]
+    lines += [f"G1 X{i * 0.005:.3f} Y{(i % 2) * 3}" for i in range(20000)]
+    segments = segments_of("\n".join(lines))
+    polylines = decimate(segments, select_layers(segments, 0), 200, 200)
+    assert sum(len(coords) for _, coords in polylines) < 4 * 200 * 4
+
+
+def test_z_hops_and_markers_follow_the_layer_rule():
+    # The hop to Z2 does not start a layer; the marker does.
+    segments = segments_of("G0 X0 Y0 Z0.3\nG1 X50 Y0\nG0 Z2\nG0 X0 Y10\n"
+                           "G0 Z0.3\nG1 X50 Y10\n; Layer 2 at Z0.6\n"
+                           "G0 Z0.6\nG1 X0 Y0\n")
+    assert segments.heights.tolist() == [0.3, 0.6]
+    assert segments.layer.tolist() == [0] * 6 + [1, 1]
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from logic.cli import main
+from logic.operations import iter_operation, operation_parameters
+from logic.resample import _feed_runs, resample_text
+from logic.toolpath import parse_bytes, resolve_modal
+
+
+def toolpath(text):
+    return resolve_modal(parse_bytes(text.encode()))
+
+
+def segment_rates(text):
+    """Segments per second of every XY feed move of a program."""
+    path = toolpath(text)
+    rows, _, start_x, start_y = _feed_runs(path)
+    length = np.hypot(path.x[rows] - start_x, path.y[rows] - start_y)
+    return path.f[rows] / 60.0 / length
+
+
+def zigzag(amplitude, waveform="square"):
+    parameters = operation_parameters("print_zigzag", passes=3,
+                                      amplitude=amplitude)
+    return "".join(iter_operation("print_zigzag", parameters, waveform))
+
+
+def test_small_waveform_is_merged_within_tolerance():
+    text = zigzag(0.01)
+    resampled, report = resample_text(text, max_rate=20, tolerance=0.02)
+    assert report.segments_after < report.segments_before
+    assert report.max_error == pytest.approx(0.01)
+    assert report.slowed == 0
+    assert report.peak_rate_after <= 20 < report.peak_rate_before
+    assert np.all(segment_rates(resampled) <= 20 + 1e-9)
+    before, after = toolpath(text), toolpath(resampled)
+    assert after.x[-1] == before.x[-1] and after.y[-1] == before.y[-1]
+
+
+def test_large_waveform_is_slowed_not_flattened():
+    text = zigzag(0.2)
+    resampled, report = resample_text(text, max_rate=50, tolerance=0.02)
+    assert report.segments_after == report.segments_before
+    assert report.slowed and report.max_error == 0.0
+    assert np.all(segment_rates(resampled) <= 50 + 1e-9)
+    # Only F words change.
+    strip = [line.split(" F")[0] for line in text.splitlines()]
+    assert [line.split(" F")[0] for line in resampled.splitlines()] == strip
+
+
+def test_feed_is_restored_after_a_slowed_run():
+    text = "G1 X10 Y0 F1200\nG1 X10 Y0.1\nG4 P10\nG1 X20 Y0\n"
+    resampled, report = resample_text(text, max_rate=10)
+    assert report.slowed == 1
+    assert resampled.splitlines() == ["G1 X10 Y0 F1200", "G1 X10 Y0.1 F60",
+                                      "G4 P10", "G1 X20 Y0 F1200"]
+
+
+def test_keep_feeds_and_relative_programs(tmp_path):
+    _, report = resample_text(zigzag(0.2), max_rate=50, slow_down=False)
+    assert report.slowed == 0 and report.peak_rate_after > 50
+    with pytest.raises(ValueError):
+        resample_text("G91\nG1 X1 F100\n", max_rate=10)
+    source, output = tmp_path / "in.gcode", tmp_path / "out.gcode"
+    source.write_text(zigzag(0.01))
+    assert main(["resample", str(source), "-o", str(output),
+                 "--max-rate", "20"]) == 0
+    assert np.all(segment_rates(output.read_text()) <= 20 + 1e-9)
@@ -0,0 +1,72 @@
+import io
+
+import pytest
+
+from logic.cli import main
+from logic.rotate import rotate
+from logic.rotation import plan_rotations_text
+
+
+def test_rotate_patterns_merge_into_one_move():
+    buffer = io.StringIO()
+    rotate(buffer, 90, 800, "sawtooth")
+    rotate(buffer, 90, 800, "square")
+    planned, report = plan_rotations_text(buffer.getvalue())
+    moves = [line for line in planned.splitlines() if line.startswith("G1")]
+    assert moves == ["G1 A90.000 F800"]
+    assert report.a_moves_before == 31 and report.a_moves_after == 1
+    assert report.travel_after == 90.0
+    assert report.travel_saved > 0
+
+
+@pytest.mark.parametrize("continuous, expected", [
+    (True, ["G1 X1 A0 F800", "G1 A-10.000", "G1 X2 A-10.000"]),
+    (False, ["G1 X1 A0 F800", "G1 A350", "G1 X2 A350"]),
+])
+def test_shortest_direction_shifts_later_angles(continuous, expected):
+    planned, report = plan_rotations_text(
+        "G1 X1 A0 F800\nG1 A350\nG1 X2 A350\n", continuous)
+    assert planned.splitlines() == expected
+    assert report.travel_after == (10.0 if continuous else 350.0)
+
+
+def test_rotation_to_current_angle_is_dropped():
+    text = "G1 A90 F800\nG1 X10\nG1 A90 F800\nG1 X20\n"
+    planned, report = plan_rotations_text(text)
+    assert planned.splitlines() == ["G1 A90 F800", "G1 X10", "G1 X20"]
+    assert report.a_moves_after == 1
+
+
+def test_feed_of_a_dropped_rotation_is_kept():
+    planned, report = plan_rotations_text("G1 X1 F1000\nG1 A0 F300\nG1 X20\n")
+    assert planned.splitlines() == ["G1 X1 F1000", "F300", "G1 X20"]
+    assert report.a_moves_after == 0
+    merged, _ = plan_rotations_text("G1 X1 F1000\nG1 A90 F300\nG1 A0\nG1 X20\n")
+    assert merged.splitlines() == ["G1 X1 F1000", "F300", "G1 X20"]
+
+
+def test_patterns_under_ultrasound_are_kept():
+    text = "M3\nG1 A5 F800\nG1 A0\nG1 A5\nM5\nG1 A10\nG1 A0\n"
+    planned, report = plan_rotations_text(text)
+    assert planned.splitlines() == ["M3", "G1 A5 F800", "G1 A0", "G1 A5",
+                                    "M5", "G1 A0.000"]
+    assert report.runs_merged == 1
+
+
+def test_merged_run_keeps_its_feed():
+    planned, _ = plan_rotations_text("G1 A10 F500\nG1 A20 F900\nG1 A30\n")
+    assert planned.splitlines() == ["G1 A30.000 F900"]
+
+
+def test_relative_programs_are_rejected():
+    with pytest.raises(ValueError):
+        plan_rotations_text("G91\nG1 A10\n")
+
+
+def test_cli_rotations(tmp_path, capsys):
+    source = tmp_path / "in.gcode"
+    source.write_text("G1 A10 F800\nG1 A20\nG1 A15\n")
+    output = tmp_path / "out.gcode"
+    assert main(["rotations", str(source), "-o", str(output)]) == 0
+    assert output.read_text() == "G1 A15.000 F800\n"
+    assert "A moves 3 -> 1" in capsys.readouterr().out
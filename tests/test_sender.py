@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from logic.sender import (FakeController, GcodeSender, open_tcp,
+                          prepare_line, send_file)
+
+
+def sawtooth_lines(count):
+    return [f"G1 X{i * 0.1:.3f} Y{(i % 2) * 0.5:.3f}" for i in range(count)]
+
+
+async def run_sender(lines, controller=None, control=None, **kwargs):
+    controller = controller or FakeController()
+    host, port = await controller.start()
+    reader, writer = await open_tcp(host, port)
+    sender = GcodeSender(reader, writer, **kwargs)
+    if control is not None:
+        asyncio.ensure_future(control(sender, controller))
+    stats = await sender.send(lines)
+    writer.close()
+    await writer.wait_closed()
+    await controller.close()
+    return stats, controller
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("G1 X1 Y2 ; move", b"G1 X1 Y2\n"),
+    ("(setup) G21", b"G21\n"),
+    ("; only a comment", b""),
+    (b"  G0 Z5\r\n", b"G0 Z5\n"),
+])
+def test_prepare_line(line, expected):
+    assert prepare_line(line) == expected
+
+
+@pytest.mark.parametrize("flow", ["ok", "count"])
+def test_streams_every_line_without_overflow(flow):
+    lines = ["; header", ""] + sawtooth_lines(2000)
+    stats, controller = asyncio.run(run_sender(lines, flow=flow))
+    assert controller.lines == sawtooth_lines(2000)
+    assert stats.lines == stats.acknowledged == 2000
+    assert controller.overflows == 0
+    assert controller.max_buffered <= 128
+    if flow == "ok":
+        assert controller.max_buffered == max(len(line) + 1
+                                              for line in sawtooth_lines(2000))
+
+
+def test_character_counting_keeps_buffer_full():
+    # With slow execution the buffer should stay nearly full.
+    controller = FakeController(line_time=0.001)
+    stats, controller = asyncio.run(
+        run_sender(sawtooth_lines(200), controller, flow="count"))
+    assert controller.overflows == 0
+    assert controller.max_buffered > 100
+    assert stats.mean_latency > 0.001
+
+
+def test_errors_are_reported_and_acknowledged():
+    lines = ["G21", "M999", "G1 X1"]
+    controller = FakeController(unsupported=("M999",))
+    stats, controller = asyncio.run(run_sender(lines, controller))
+    assert stats.errors == ["error:20"]
+    assert stats.acknowledged == 3
+
+
+def test_pause_and_resume_send_hold_and_cycle_start():
+    async def control(sender, controller):
+        while controller.received < 50:
+            await asyncio.sleep(0)
+        sender.pause(hold=True)
+        await asyncio.sleep(0.05)
+        paused_at = controller.received
+        await asyncio.sleep(0.05)
+        assert controller.received == paused_at
+        sender.resume()
+
+    stats, controller = asyncio.run(
+        run_sender(sawtooth_lines(500), control=control, flow="count"))
+    assert stats.lines == 500 and not stats.aborted
+    assert controller.realtime == [b"!", b"~"]
+
+
+def test_abort_stops_streaming_and_resets():
+    async def control(sender, controller):
+        while controller.received < 100:
+            await asyncio.sleep(0)
+        sender.abort()
+
+    controller = FakeController(line_time=0.0005)
+    stats, controller = asyncio.run(
+        run_sender(sawtooth_lines(10000), controller, control=control))
+    assert stats.aborted
+    assert stats.lines < 10000
+    assert controller.realtime == [b"\x18"]
+
+
+def test_dropped_connection_ends_send():
+    controller = FakeController(line_time=0.01, drop_after=20)
+
+    async def run():
+        return await asyncio.wait_for(
+            run_sender(sawtooth_lines(1000), controller), 3.0)
+
+    # The reader's own error comes out of send().
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(run())
+    assert controller.received >= 20
+
+
+def test_send_file_streams_from_disk(tmp_path):
+    path = tmp_path / "part.gcode"
+    path.write_text("\n".join(sawtooth_lines(300)) + "\n")
+
+    async def serve():
+        controller = FakeController()
+        host, port = await controller.start()
+        stats = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: send_file(f"{host}:{port}", str(path)))
+        await controller.close()
+        return stats, controller
+
+    stats, controller = asyncio.run(serve())
+    assert stats.lines == 300
+    assert controller.lines == sawtooth_lines(300)
@@ -0,0 +1,42 @@
+from logic.io_utils import build_line_index
+from logic.spatial_index import (build_spatial_index, layer_extents,
+                                 query_rect, query_segment)
+from logic.toolpath import parse_lines, resolve_modal
+
+PROGRAM = """G0 X0 Y0 Z0.3
+G1 X10 Y0 F1200
+G1 X10 Y10
+G0 X50 Y50
+G1 Z0.6
+G1 X60 Y50
+"""
+
+
+def build(cell_size=None):
+    toolpath = resolve_modal(parse_lines(PROGRAM.splitlines()))
+    return build_spatial_index(toolpath, cell_size)
+
+
+def test_query_rect_returns_line_numbers():
+    index = build(5.0)
+    assert query_rect(index, 8, -1, 12, 1).tolist() == [2, 3]
+    assert query_rect(index, 30, 30, 20, 20).tolist() == [4]
+    assert query_rect(index, 30, 30, 20, 20, kind="deposit").tolist() == []
+
+
+def test_query_segment_finds_crossings_and_touches():
+    index = build()
+    assert query_segment(index, 5, -5, 5, 5).tolist() == [2]
+    assert query_segment(index, 0, 5, 10, 5, kind="deposit").tolist() == [3]
+    assert query_segment(index, 60, 40, 60, 60).tolist() == [6]
+
+
+def test_layer_extents():
+    extents = layer_extents(build())
+    assert extents[0.6] == (50.0, 50.0, 60.0, 50.0)
+
+
+def test_line_index():
+    data = b"G1 X1\nG1 X2\nG1 X3"
+    assert build_line_index(data).tolist() == [0, 6, 12, 17]
+    assert build_line_index(b"G1\n").tolist() == [0, 3]
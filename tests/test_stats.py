@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+
+import pytest
+
+from logic.motion import MotionLimits
+from logic.operations import iter_operation, operation_parameters
+from logic.stats import (format_program_stats, stats_bytes, stats_file,
+                         stats_lines, write_stats_csv, write_stats_json)
+
+PROGRAM = """; preamble
+M98 P"us.g"
+G0 X0 Y0 Z0.3 F6000
+G1 X10 F600
+G4 P500
+G0 X20 A90
+G0 Z0.6
+G1 Y10 F1200
+G0 Z1.0
+G0 Z0.6
+G1 X0
+"""
+
+
+def test_layers_and_totals():
+    stats = stats_bytes(PROGRAM.encode())
+    assert [(layer.number, layer.z) for layer in stats.layers] == [
+        (0, 0.0), (1, 0.3), (2, 0.6)]
+    preamble, first, second = stats.layers
+    assert preamble.ultrasound_calls == 1 and preamble.moves == 0
+    assert first.deposit_length == pytest.approx(10.0)
+    assert first.travel_length == pytest.approx(0.3 + 10.0)
+    assert first.a_travel == 90.0
+    assert first.dwell_time == 0.5
+    # 10 mm at 600 mm/min, plus the dwell and two rapids.
+    rapid = MotionLimits().rapid_feed / 60.0
+    assert first.duration == pytest.approx(
+        1.0 + 0.5 + (0.3 + (10 ** 2 + 90 ** 2) ** 0.5) / rapid)
+    # The Z hop stays in layer 2.
+    assert second.deposit_length == pytest.approx(30.0)
+    assert stats.total.lines == 11
+    assert stats.total.deposit_length == pytest.approx(40.0)
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 16, 64])
+def test_chunked_pass_matches_single_pass(chunk_bytes):
+    whole = stats_bytes(PROGRAM.encode())
+    chunked = stats_bytes(PROGRAM.encode(), chunk_bytes=chunk_bytes)
+    assert len(chunked.layers) == len(whole.layers)
+    for a, b in zip(chunked.layers + [chunked.total],
+                    whole.layers + [whole.total]):
+        assert a.lines == b.lines and a.moves == b.moves
+        assert a.duration == pytest.approx(b.duration)
+        assert a.travel_length == pytest.approx(b.travel_length)
+
+
+def test_generator_output_matches_file(tmp_path):
+    parameters = operation_parameters("slicer")
+    path = tmp_path / "slicer.gcode"
+    path.write_text("".join(iter_operation("slicer", parameters, "square")))
+    from_file = stats_file(str(path))
+    streamed = stats_lines(iter_operation("slicer", parameters, "square"),
+                           chunk_bytes=256)
+    assert len(streamed.layers) == len(from_file.layers) == 5
+    assert streamed.total.deposit_length == pytest.approx(
+        from_file.total.deposit_length)
+
+
+def test_json_and_csv_reports():
+    stats = stats_bytes(PROGRAM.encode())
+    buffer = io.StringIO()
+    write_stats_json(stats, buffer)
+    data = json.loads(buffer.getvalue())
+    assert [layer["number"] for layer in data["layers"]] == [0, 1, 2]
+    assert data["total"]["dwell_time"] == 0.5
+    buffer = io.StringIO()
+    write_stats_csv(stats, buffer)
+    rows = list(csv.reader(io.StringIO(buffer.getvalue())))
+    assert rows[0][:3] == ["number", "z", "lines"]
+    assert [row[0] for row in rows[1:]] == ["0", "1", "2", "total"]
+    assert format_program_stats(stats).splitlines()[-1].startswith("total")
+
+
+def test_only_ultrasound_switches_are_counted():
+    stats = stats_bytes(b'M98 P"us.g"\nM98 P"purge.g"\nM3 ; on\nM5\n'
+                        b';M98 P"us.g"\n')
+    assert stats.total.ultrasound_calls == 2
@@ -0,0 +1,48 @@
+import gzip
+import io
+
+import pytest
+
+from logic.operations import (DEFAULT_PARAMETERS, OPERATIONS, iter_operation,
+                              operation_chunks, run_operation)
+from logic.streams import iter_chunks, write_lines
+
+
+@pytest.mark.parametrize("operation", sorted(OPERATIONS))
+@pytest.mark.parametrize("waveform", ["sawtooth", "square"])
+def test_iterator_matches_writer(operation, waveform):
+    parameters = DEFAULT_PARAMETERS[operation]
+    buffer = io.StringIO()
+    result = run_operation(buffer, operation, dict(parameters), waveform)
+    lines = iter_operation(operation, dict(parameters), waveform)
+    assert "".join(lines) == buffer.getvalue()
+    assert lines.result == result
+    chunks = operation_chunks(operation, dict(parameters), waveform,
+                              chunk_bytes=256)
+    assert b"".join(chunks) == buffer.getvalue().encode()
+
+
+def test_chunks_stream_into_a_compressor():
+    compressed = io.BytesIO()
+    with gzip.GzipFile(fileobj=compressed, mode="wb") as f:
+        f.writelines(operation_chunks("print_block_array",
+                                      dict(DEFAULT_PARAMETERS[
+                                          "print_block_array"]), "sawtooth"))
+    text = gzip.decompress(compressed.getvalue()).decode()
+    assert text.count("G04 P100") == 20
+
+
+def test_iter_chunks_sizes():
+    chunks = list(iter_chunks(["G1 X1\n"] * 100, chunk_bytes=60))
+    assert all(len(chunk) == 60 for chunk in chunks)
+    assert b"".join(chunks) == b"G1 X1\n" * 100
+
+
+def test_write_lines_returns_generator_result():
+    def lines():
+        yield "G28\n"
+        return 7
+
+    buffer = io.StringIO()
+    assert write_lines(buffer, lines()) == 7
+    assert buffer.getvalue() == "G28\n"
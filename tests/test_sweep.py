@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+from logic.cli import main
+from logic.job import post_process
+from logic.operations import operation_parameters, run_operation
+from logic.postprocess import build_pipeline
+from logic.sweep import (BATCH_VARIANTS, Sweep, load_sweep, run_sweep,
+                         save_sweep, sweep_size)
+
+
+def direct(sweep, values, pipeline_config=None):
+    buffer = io.StringIO()
+    parameters = operation_parameters(sweep.operation,
+                                      **{**sweep.parameters, **values})
+    run_operation(buffer, sweep.operation, parameters, sweep.waveform,
+                  sweep.verbosity)
+    return "".join(post_process([buffer.getvalue()],
+                                build_pipeline(pipeline_config)))
+
+
+@pytest.mark.parametrize("sweep", [
+    Sweep("print_block", {"amplitude": [0.3, 0.5], "g1_xy_feed": ["900", 1100],
+                          "delay_time": [0, 250.5], "vertical_lift": [1.0]}),
+    Sweep("print_zigzag", {"feedrate": [800, 1000], "passes": [1, 3]},
+          {"amplitude": 0.1}, "square"),
+    Sweep("print_cylinder", {"amplitude": [None, 0.4], "feedrate": [600]},
+          verbosity="none"),
+])
+def test_variants_match_direct_generation(tmp_path, sweep):
+    variants = run_sweep(sweep, str(tmp_path), workers=1)
+    assert len(variants) == sweep_size(sweep)
+    for variant in variants:
+        text = (tmp_path / variant.file).read_text()
+        assert text == direct(sweep, variant.parameters)
+        assert variant.lines == text.count("\n")
+
+
+def test_parallel_sweep_writes_index(tmp_path):
+    feeds = list(range(500, 500 + 10 * BATCH_VARIANTS, 5))
+    sweep = Sweep("print_zigzag", {"amplitude": [0.1, 0.3], "feedrate": feeds})
+    variants = run_sweep(sweep, str(tmp_path), workers=2)
+    index = json.loads((tmp_path / "index.json").read_text())
+    assert [entry["index"] for entry in index["variants"]] == list(
+        range(len(variants)))
+    last = index["variants"][-1]
+    assert last["parameters"] == {"amplitude": 0.3, "feedrate": feeds[-1]}
+    assert (tmp_path / last["file"]).read_text() == direct(
+        sweep, last["parameters"])
+
+
+def test_variants_run_through_the_pipeline(tmp_path):
+    config = [{"stage": "feed_scale", "factor": 0.5},
+              {"stage": "line_numbers", "checksum": False}]
+    sweep = Sweep("print_block", {"g1_xy_feed": [1000, 1400]},
+                  {"deposition": True})
+    variants = run_sweep(sweep, str(tmp_path), workers=1,
+                         pipeline_config=config)
+    for variant in variants:
+        text = (tmp_path / variant.file).read_text()
+        assert text == direct(sweep, variant.parameters, config)
+        # Every variant is numbered by a pipeline of its own.
+        assert "\nN1 G1 " in text
+        assert f"F{variant.parameters['g1_xy_feed'] / 2:.1f}" in text
+
+
+def test_invalid_sweeps_are_rejected(tmp_path):
+    path = str(tmp_path / "sweep.json")
+    save_sweep(Sweep("print_zigzag", {"passes": [1, 2]}), path)
+    assert load_sweep(path).grid == {"passes": [1, 2]}
+    for sweep in (Sweep("print_zigzag", {"radius": [1]}),
+                  Sweep("print_zigzag", {"passes": []})):
+        with pytest.raises(ValueError):
+            run_sweep(sweep, str(tmp_path))
+
+
+def test_cli_sweep(tmp_path):
+    output = tmp_path / "out"
+    assert main(["sweep", "-o", str(output), "--operation", "print_cylinder",
+                 "--vary", "feedrate=600,900", "--set", "segments=8",
+                 "--workers", "1"]) == 0
+    index = json.loads((output / "index.json").read_text())
+    assert index["parameters"] == {"segments": 8}
+    assert "F900" in (output / "print_cylinder_0001.gcode").read_text()
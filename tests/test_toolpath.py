@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from logic.toolpath import (DISTANCE_CODES, MOTION_CODES, UNIT_CODES,
+                            ModalState, iter_line_chunks, move_segments,
+                            parse_bytes, parse_line, parse_lines,
+                            resolve_modal)
+
+
+def resolve(text, state=None):
+    return resolve_modal(parse_lines(text.splitlines()), state)
+
+
+def test_axes_are_modal():
+    path = resolve("G1 X10 Y20 Z0.3 F1200\nG1 X15\nG1 Y5 ; comment X99\n")
+    assert path.x.tolist() == [10.0, 15.0, 15.0]
+    assert path.y.tolist() == [20.0, 20.0, 5.0]
+    assert path.z.tolist() == [0.3, 0.3, 0.3]
+    assert path.f.tolist() == [1200.0] * 3
+
+
+def test_relative_mode_and_units():
+    path = resolve("G1 X10\nG91\nG1 X1\nG1 X1 Y2\nG90 G20\nG1 X1\n")
+    assert path.x.tolist() == pytest.approx([10, 10, 11, 12, 12, 25.4])
+    assert path.y.tolist() == pytest.approx([0, 0, 0, 2, 2, 2])
+
+
+def test_g92_shifts_origin_without_moving():
+    path = resolve("G1 X10 A90\nG92 X0 A0\nG1 X5\nG1 A10\n")
+    assert path.x.tolist() == [10.0, 10.0, 15.0, 15.0]
+    assert path.a.tolist() == [90.0, 90.0, 90.0, 100.0]
+    assert path.is_move.tolist() == [True, False, True, True]
+
+
+def test_state_carries_across_chunks():
+    lines = "G91\nG1 X1 F100\nG1 X1\nG92 X0\nG1 X2\nG90\nG1 Y4\n".splitlines()
+    whole = resolve_modal(parse_lines(lines))
+    first = resolve_modal(parse_lines(lines[:3]))
+    second = resolve_modal(parse_lines(lines[3:]), first.state)
+    assert np.concatenate((first.x, second.x)).tolist() == whole.x.tolist()
+    assert np.concatenate((first.f, second.f)).tolist() == whole.f.tolist()
+
+
+def test_initial_state_is_used():
+    path = resolve("G1 Y1\n", ModalState(feed=500.0))
+    assert path.x.tolist() == [0.0]
+    assert path.f.tolist() == [500.0]
+
+
+def test_segments_start_at_the_seed_position():
+    state = ModalState(position={"x": 5.0, "y": 6.0, "z": 0.0, "a": 0.0})
+    rows, x0, y0, x1, y1 = move_segments(resolve("G1 X1\nG1 Y2\n", state),
+                                         state)
+    assert rows.tolist() == [0, 1]
+    assert x0.tolist() == [5.0, 1.0] and y0.tolist() == [6.0, 6.0]
+
+
+@pytest.mark.parametrize("text", [
+    "G1 X10 Y-2.5 F1200\nG0 Z.3\nM3\n",
+    "g1 x1 y2\nG1X+3Y4.\n",
+    "G1 X1 (skip X9) Y2 ; X7\nM5(c)679\n",
+    "G1 X1 (unclosed Y3\n;only\n\nG92 X0\nG4 P100",
+    "G1 X1.0000000000000001 Y123456789012345678\r\nT1 M6\n",
+])
+def test_parse_bytes_matches_parse_line(text):
+    parsed = parse_bytes(text.encode())
+    assert len(parsed) == len(text.splitlines())
+    for row, line in enumerate(text.splitlines()):
+        words = parse_line(line)
+        for name in ("x", "y", "z", "a", "f", "p"):
+            values = [value for letter, value in words
+                      if letter == name.upper()] or [np.nan]
+            assert np.array_equal(getattr(parsed, name)[row], values[-1],
+                                  equal_nan=True), (line, name)
+        m = [value for letter, value in words if letter == "M"] or [np.nan]
+        assert np.array_equal(parsed.m[row], m[0], equal_nan=True), line
+        codes = [value for letter, value in words if letter == "G"]
+        for name, group in (("g_motion", MOTION_CODES),
+                            ("g_distance", DISTANCE_CODES),
+                            ("g_units", UNIT_CODES)):
+            values = [code for code in codes if code in group] or [np.nan]
+            assert np.array_equal(getattr(parsed, name)[row], values[-1],
+                                  equal_nan=True), (line, name)
+        assert parsed.g92[row] == (92.0 in codes)
+        assert parsed.g4[row] == (4.0 in codes)
+    assert len(parse_lines(text.splitlines())) == len(parsed)
+
+
+def test_line_chunks_end_on_newlines():
+    data = b"".join(f"G1 X{i}\n".encode() for i in range(1000))
+    chunks = list(iter_line_chunks(data, 100))
+    assert len(chunks) > 1
+    assert all(bytes(chunk).endswith(b"\n") for chunk in chunks)
+    assert b"".join(bytes(chunk) for chunk in chunks) == data
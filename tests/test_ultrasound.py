@@ -0,0 +1,77 @@
+import pytest
+
+from logic.cli import main
+from logic.ultrasound import schedule_ultrasound_text
+
+PROGRAM = """G0 X0 Y0 Z0.3
+M3
+G1 X10 F1200
+M5
+M3
+G1 Y10
+G04 P100
+G1 Z1
+G0 X20
+G1 Z0.3
+M98 P"us.g"
+G1 X30
+;M5
+G0 X40
+G04 P250
+G0 X50
+"""
+
+
+def test_switches_only_at_transitions():
+    scheduled, report = schedule_ultrasound_text(PROGRAM)
+    assert scheduled.splitlines() == [
+        "G0 X0 Y0 Z0.3",
+        "M3",
+        "G1 X10 F1200",
+        "G1 Y10",
+        "M5",
+        "G04 P100",
+        "G1 Z1",
+        "G0 X20",
+        "G1 Z0.3",
+        "M3",
+        "G1 X30",
+        "M5",
+        "G0 X40",
+        "G0 X50",
+    ]
+    assert report.macro_calls_before == 3
+    assert report.macro_calls_after == 2
+    assert report.dwells_before == 2 and report.dwells_after == 1
+    assert report.dwell_seconds_saved == pytest.approx(0.25)
+
+
+@pytest.mark.parametrize("merge_gap, regions", [(0.0, 2), (12.0, 1)])
+def test_merge_gap_coalesces_regions(merge_gap, regions):
+    scheduled, report = schedule_ultrasound_text(PROGRAM, merge_gap)
+    assert report.regions == regions
+    assert scheduled.count("M3") == scheduled.count("M5") == regions
+
+
+def test_rotation_separates_regions():
+    scheduled, report = schedule_ultrasound_text(
+        "G1 X10 Y0 Z0.3 F600\nG0 A90\nG1 X20\n", merge_gap=100.0)
+    assert report.regions == 2
+    assert scheduled.splitlines() == ["M3", "G1 X10 Y0 Z0.3 F600", "M5",
+                                      "G0 A90", "M3", "G1 X20", "M5"]
+
+
+def test_rescheduling_is_stable():
+    once, _ = schedule_ultrasound_text(PROGRAM)
+    twice, report = schedule_ultrasound_text(once)
+    assert twice == once
+    assert report.macro_calls_saved == 0
+
+
+def test_cli_ultrasound(tmp_path, capsys):
+    source = tmp_path / "in.gcode"
+    source.write_text(PROGRAM)
+    output = tmp_path / "out.gcode"
+    assert main(["ultrasound", str(source), "-o", str(output)]) == 0
+    assert output.read_text() == schedule_ultrasound_text(PROGRAM)[0]
+    assert "ultrasound calls 3 -> 2" in capsys.readouterr().out
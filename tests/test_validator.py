@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from logic.cli import main
+from logic.validator import (MachineProfile, format_validation,
+                             profile_from_dict, validate_bytes, validate_text)
+
+PROGRAM = """G21
+G90
+G1 X10 Y10 Z0.3 F1200
+G1 X400 ; beyond X
+G1 Y20
+M7
+T12
+G0 A500
+G1 A10 F9000
+G1 X5 F0
+"""
+
+
+def test_reports_each_rule_with_line_numbers():
+    report = validate_text(PROGRAM)
+    assert not report.ok
+    assert report.lines == 10
+    assert {rule: v.lines for rule, v in report.violations.items()} == {
+        "x limit": [4],
+        "m code": [6],
+        "tool": [7],
+        "a travel": [8],
+        "a feed": [9],
+        "feed": [10],
+    }
+    assert "X=400.000" in report.violations["x limit"].detail
+
+
+def test_modal_state_carries_across_chunks():
+    data = b"G91\nG1 F1000\n" + b"G1 X10\n" * 40
+    report = validate_bytes(data, chunk_bytes=64)
+    assert report.violations["x limit"].count == 10
+    assert report.violations["x limit"].lines[0] == 33
+
+
+def test_reported_lines_are_capped():
+    report = validate_bytes(b"G1 X-1 F100\n" * 1000)
+    violation = report.violations["x limit"]
+    assert violation.count == 1000
+    assert len(violation.lines) == 20
+    assert "(+980 more)" in format_validation(report)
+
+
+@pytest.mark.parametrize("data", [
+    {"speed": 1},
+    {"limits": {"q": [0, 1]}},
+    {"limits": {"x": [0]}},
+])
+def test_invalid_profiles_are_rejected(data):
+    with pytest.raises(ValueError):
+        profile_from_dict(data)
+
+
+def test_profile_changes_the_rules():
+    profile = MachineProfile(limits={"x": [-500, 500]}, m_codes=[7],
+                             tools=20, max_a_feed=10000)
+    report = validate_text(PROGRAM, profile)
+    assert set(report.violations) == {"feed"}
+
+
+def test_cli_validate_is_a_gate(tmp_path, capsys):
+    good = tmp_path / "good.gcode"
+    good.write_text("G1 X1 Y1 F1000\n")
+    bad = tmp_path / "bad.gcode"
+    bad.write_text(PROGRAM)
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps({"limits": {"x": [0, 5]}}))
+    assert main(["validate", str(good)]) == 0
+    assert "no problems" in capsys.readouterr().out
+    assert main(["validate", str(bad)]) == 1
+    assert main(["validate", str(good), "--profile", str(profile)]) == 0
+    assert main(["validate", str(bad), "--profile", str(profile)]) == 1
+    assert "x limit" in capsys.readouterr().out
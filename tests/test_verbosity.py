@@ -0,0 +1,47 @@
+import io
+
+import pytest
+
+from logic.layer_index import build_layer_index
+from logic.operations import (DEFAULT_PARAMETERS, operation_parameters,
+                              run_operation)
+
+
+def generate(operation, verbosity, waveform="sawtooth", **overrides):
+    buffer = io.StringIO()
+    run_operation(buffer, operation,
+                  operation_parameters(operation, **overrides), waveform,
+                  verbosity)
+    return buffer.getvalue().splitlines()
+
+
+def comments(lines):
+    return [line for line in lines if line.startswith(";")]
+
+
+@pytest.mark.parametrize("waveform", ["sawtooth", "square", "unknown"])
+@pytest.mark.parametrize("operation", sorted(DEFAULT_PARAMETERS))
+def test_levels_only_change_comments(operation, waveform):
+    full = generate(operation, "full", waveform)
+    structure = generate(operation, "structure", waveform)
+    none = generate(operation, "none", waveform)
+    assert comments(none) == []
+    assert set(comments(structure)) <= set(comments(full))
+    assert [line for line in full if not line.startswith(";")] == none
+    assert [line for line in structure if not line.startswith(";")] == none
+
+
+def test_structure_keeps_start_end_and_layer_markers():
+    lines = generate("slicer", "structure")
+    assert lines[0].startswith("; Slicer Start")
+    assert lines[-1] == "; Slicer End"
+    assert not any(line.startswith("; Slicing with") for line in lines)
+    text = "\n".join(lines).encode()
+    markers = sum(line.startswith("; Layer ") for line in lines)
+    assert markers == 5
+    assert len(build_layer_index(text)) == markers
+
+
+def test_unknown_verbosity_is_rejected():
+    with pytest.raises(ValueError):
+        generate("rotate", "quiet")
@@ -1,26 +1,49 @@
 import sys
 import os
 import tkinter as tk
-from tkinter import filedialog, messagebox, Text, Scrollbar, ttk
+from tkinter import filedialog, messagebox, simpledialog, Text, Scrollbar, ttk
 from typing import Optional, Union, Tuple
-import re
-import io
+import json
+import asyncio
+import shutil
+import threading
+import time
 
 # Set up the project root for imports
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
 # Import real logic functions from the 'logic' directory
-from logic.print_block import print_block
+from logic.cycle_time import estimate_file, estimate_text, format_cycle_time
 from logic.geometry import get_x, get_y, get_z
-from logic.clean_block import clean_block
-from logic.clean_no_tool_block import clean_no_tool_block
-from logic.print_cylinder import print_cylinder
-from logic.print_layer0 import print_layer0
-from logic.rotate import rotate
-from logic.slicer import slicer
-from logic.print_zigzag import print_zigzag
-
+from logic.io_utils import count_file_lines, iter_mapped_lines, read_head_tail
+from logic.job import Job, JobStep, load_job, run_job, save_job
+from logic.motion import format_feed_report, plan_feeds_text
+from logic.multi_tool import build_multi_tool_program, format_report
+from logic.operations import OPERATIONS, VERBOSITY_LEVELS, iter_operation, operation_parameters
+from logic.output_cache import OutputCache
+from logic.layer_index import build_layer_index
+from logic.postprocess import Pipeline, format_timings, load_pipeline, read_pipeline_config
+from logic.preview import decimate, preview_file, preview_text, select_layers
+from logic.resample import format_resample_report, resample_text
+from logic.rotation import format_rotation_report, plan_rotations_text
+from logic.sender import format_stats, stream
+from logic.stats import format_program_stats, stats_bytes, stats_file, write_stats_csv, write_stats_json
+from logic.sweep import format_sweep, load_sweep, run_sweep
+from logic.ultrasound import format_ultrasound_report, schedule_ultrasound_text
+from logic.validator import MachineProfile, format_validation, load_profile, validate_file, validate_text
+
+PREVIEW_DEPOSIT_COLOR = "#2978b5"
+PREVIEW_TRAVEL_COLOR = "#e0a030"
+DEFAULT_CONTROLLER = os.environ.get("SIMPLIFIED3D_CONTROLLER", "127.0.0.1:2323")
+# JSON list of post-processing stages applied when saving and converting.
+POSTPROCESS_CONFIG = os.environ.get("SIMPLIFIED3D_POSTPROCESS")
+# JSON machine profile used by "Validate G-code" and before sending.
+MACHINE_PROFILE = os.environ.get("SIMPLIFIED3D_PROFILE")
+OUTPUT_CACHE_MAX_BYTES = int(os.environ.get("SIMPLIFIED3D_CACHE_MAX_MB", "1024")) * 1024 * 1024
+# Files longer than head + tail lines are shown as a preview of both ends.
+PREVIEW_HEAD_LINES = int(os.environ.get("SIMPLIFIED3D_PREVIEW_HEAD_LINES", "2000"))
+PREVIEW_TAIL_LINES = int(os.environ.get("SIMPLIFIED3D_PREVIEW_TAIL_LINES", "500"))
 
 # Global variables to hold the Text widgets and StringVar for tool selection
 gcode_text_widget: Optional[Text] = None
@@ -28,21 +51,12 @@ result_text_widget: Optional[Text] = None
 tool_selection_var: Optional[tk.StringVar] = None
 status_var: Optional[tk.StringVar] = None
 waveform_option: Optional[tk.StringVar] = None
-
-def replace_m3_m5(gcode: str) -> str:
-    """
-    Replaces M3 with M98 P"us.g" and comments out M5 lines in the G-code string.
-    """
-    lines = []
-    for line in gcode.splitlines():
-        if re.match(r'^\s*M3(\s*;.*)?$', line):
-            lines.append('M98 P"us.g"')
-        elif re.match(r'^\s*M5(\s*;.*)?$', line):
-            lines.append(';M5')
-        else:
-            lines.append(line)
-    return "\n".join(lines)
-
+verbosity_option: Optional[tk.StringVar] = None
+output_cache: Optional[OutputCache] = None
+# File shown as a head/tail preview in the editor, or None when the editor holds the whole program.
+editor_file: Optional[str] = None
+# Whether the editor holds post-processed output (generated, converted), which is saved as it is.
+editor_processed = False
 
 def show_tooltip(widget, text):
     """Add a simple tooltip to a widget."""
@@ -64,6 +78,54 @@ def show_tooltip(widget, text):
     widget.bind("<Enter>", enter)
     widget.bind("<Leave>", leave)
 
+def show_file_in_editor(path: str, processed: bool = False) -> int:
+    """
+    Shows a file in the G-code editor and returns its line count. Long files
+    are shown as their first and last lines only, read without loading the
+    rest, and the editor is read-only until "Open Full File" is used.
+    ``processed`` marks output that already went through the pipeline.
+    """
+    global editor_file, editor_processed
+    editor_processed = processed
+    head, tail, total = read_head_tail(path, PREVIEW_HEAD_LINES, PREVIEW_TAIL_LINES)
+    gcode_text_widget.config(state='normal')
+    gcode_text_widget.delete('1.0', 'end')
+    if tail is None:
+        editor_file = None
+        gcode_text_widget.insert('1.0', head)
+        return total
+    editor_file = path
+    hidden = total - PREVIEW_HEAD_LINES - PREVIEW_TAIL_LINES
+    gcode_text_widget.insert('1.0', f"{head}; ... {hidden} lines not shown, use Open Full File ...\n{tail}")
+    gcode_text_widget.config(state='disabled')
+    return total
+
+
+def open_full_file():
+    """Replaces the editor's head/tail preview with the whole file."""
+    global editor_file
+    if gcode_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "G-code editor not initialized.")
+        return
+    if editor_file is None:
+        status_var.set("The editor already shows the whole program.")
+        return
+    with open(editor_file, "r") as f:
+        content = f.read()
+    gcode_text_widget.config(state='normal')
+    gcode_text_widget.delete('1.0', 'end')
+    gcode_text_widget.insert('1.0', content)
+    status_var.set(f"Opened full file: {os.path.basename(editor_file)}")
+    editor_file = None
+
+
+def editor_text() -> str:
+    """Returns the editor's G-code, opening the full file first if a preview is shown."""
+    if editor_file is not None:
+        open_full_file()
+    return gcode_text_widget.get('1.0', 'end-1c')
+
+
 def create_gcode():
     """
     Generates a placeholder G-code block based on the selected tool
@@ -76,9 +138,13 @@ def create_gcode():
     tool = tool_selection_var.get()
     waveform = waveform_option.get()
     sample = f"; -- Created block for {tool} with {waveform} waveform --\nG1 X10 Y10 Z0.3\nM3\nG1 X20 Y20 Z0.3\nM5\nG1 X30 Y30 Z0.3\n"
-    processed_sample = replace_m3_m5(sample)
-    gcode_text_widget.insert('end', '\n' + processed_sample)
-    status_var.set(f"Sample G-code for {tool} ({waveform}) created and processed.")
+    if editor_processed:
+        # Match the processed program; raw editor content is processed on save.
+        sample = get_pipeline().process_text(sample)
+    if editor_file is not None:
+        open_full_file()
+    gcode_text_widget.insert('end', '\n' + sample)
+    status_var.set(f"Sample G-code for {tool} ({waveform}) created.")
 
 
 def save_gcode_file():
@@ -87,7 +153,7 @@ def save_gcode_file():
         messagebox.showerror("Error", "G-code text area not initialized.")
         return
 
-    content = gcode_text_widget.get('1.0', 'end').strip()
+    content = gcode_text_widget.get('1.0', 'end').strip() if editor_file is None else editor_file
     if not content:
         messagebox.showwarning("Warning", "No content to save.")
         status_var.set("Save cancelled: No content.")
@@ -102,11 +168,26 @@ def save_gcode_file():
         return
 
     try:
-        processed_content = replace_m3_m5(content)
-        with open(file_path, 'w') as f:
-            f.write(processed_content)
+        if editor_processed:
+            # Generated and converted output went through the pipeline already.
+            if editor_file is not None:
+                shutil.copyfile(editor_file, file_path)
+            else:
+                with open(file_path, 'w') as f:
+                    f.write(content)
+            messagebox.showinfo("Success", f"File saved to:\n{file_path}")
+            status_var.set(f"Saved: {os.path.basename(file_path)}")
+            return
+        pipeline = get_pipeline()
+        if editor_file is not None:
+            # Post-process the previewed file straight from disk.
+            pipeline.process_file(editor_file, file_path)
+        else:
+            processed_content = pipeline.process_text(content)
+            with open(file_path, 'w') as f:
+                f.write(processed_content)
         messagebox.showinfo("Success", f"File saved to:\n{file_path}")
-        status_var.set(f"Saved: {os.path.basename(file_path)}")
+        status_var.set(f"Saved: {os.path.basename(file_path)} ({format_timings(pipeline)})")
     except Exception as e:
         messagebox.showerror("Error", f"Could not save file:\n{e}")
         status_var.set("Error saving file.")
@@ -117,7 +198,6 @@ def load_gcode_file():
         messagebox.showerror("Error", "G-code text area not initialized.")
         return
 
-    gcode_text_widget.delete('1.0', 'end')
     filepath = filedialog.askopenfilename(
         filetypes=[("G-code or text files", "*.gcode *.txt"), ("All files", "*.*")]
     )
@@ -126,11 +206,8 @@ def load_gcode_file():
         return
 
     try:
-        with open(filepath, "r") as f:
-            content = f.read()
-        processed_content = replace_m3_m5(content)
-        gcode_text_widget.insert('1.0', processed_content)
-        messagebox.showinfo("Success", f"Loaded {len(processed_content.splitlines())} lines from:\n{filepath}")
+        total = show_file_in_editor(filepath)
+        messagebox.showinfo("Success", f"Loaded {total} lines from:\n{filepath}")
         status_var.set(f"Loaded: {os.path.basename(filepath)}")
     except Exception as e:
         messagebox.showerror("Error", f"Could not open file:\n{e}")
@@ -141,6 +218,10 @@ def clear_editor():
     if gcode_text_widget is None or status_var is None:
         messagebox.showerror("Error", "G-code editor not initialized.")
         return
+    global editor_file, editor_processed
+    editor_file = None
+    editor_processed = False
+    gcode_text_widget.config(state='normal')
     gcode_text_widget.delete('1.0', 'end')
     status_var.set("G-code editor cleared.")
 
@@ -158,7 +239,7 @@ def parse_gcode():
         messagebox.showerror("Error", "Text areas not initialized.")
         return
 
-    lines = gcode_text_widget.get('1.0', 'end').strip().split('\n')
+    lines = editor_text().strip().split('\n')
     if not any(line.strip() for line in lines):
         messagebox.showwarning("Warning", "No G-code loaded to parse.")
         status_var.set("Parsing cancelled: No G-code.")
@@ -179,378 +260,673 @@ def parse_gcode():
     status_var.set("Parsing complete: No movements found.")
 
 
-def on_print_block():
-    """
-    Handles the "Print Block" button click, asks for a save location,
-    calls the print_block logic function, and then loads the generated
-    G-code back into the text widget.
-    """
-    if gcode_text_widget is None or status_var is None or waveform_option is None:
-        messagebox.showerror("Error", "UI elements not initialized. Please ensure the UI is fully loaded before using this function.")
+def go_to_layer():
+    """Asks for a layer number and scrolls the G-code editor to its first line."""
+    if gcode_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "G-code editor not initialized.")
         return
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode",
-                                         filetypes=[("G-code files", "*.gcode"), ("All files", "*.*")])
-    if not path:
-        status_var.set("Print Block generation cancelled.")
+    layers = build_layer_index(editor_text().encode())
+    if not layers:
+        messagebox.showwarning("Warning", "No layers found in the G-code editor.")
+        status_var.set("Go to layer cancelled: No layers.")
         return
 
-    try:
-        z_value = 0.3
-        g0_feed = "1500"
-        g1_feed = "1200"
-        deposition = False
-        x_value = 10.0
-        y_value = 10.0
-        vertical_lift = 0.5
-        delay = 100
-        step = False
-        ultrasound = False
-        next_angle = 90.0
-        a_feed = 800
-        waveform = waveform_option.get()
+    number = simpledialog.askinteger(
+        "Go to Layer",
+        f"Layer number ({layers[0].number}-{layers[-1].number}):",
+        minvalue=layers[0].number, maxvalue=layers[-1].number
+    )
+    if number is None:
+        status_var.set("Go to layer cancelled by user.")
+        return
 
-        temp_gcode_buffer = io.StringIO()
-
-        new_ultrasound_state = print_block(
-            destination=temp_gcode_buffer,
-            z_value=z_value,
-            g0_xy_feed=g0_feed,
-            g1_xy_feed=g1_feed,
-            deposition=deposition,
-            x_value=x_value,
-            y_value=y_value,
-            vertical_lift=vertical_lift,
-            delay_time=delay,
-            step_button=step,
-            ultrasound_state=ultrasound,
-            z_feed=int(g0_feed),
-            next_tool_angle=next_angle,
-            a_feed=a_feed,
-            waveform=waveform
-        )
-
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
-
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
-
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-
-        messagebox.showinfo("Success", f"Print Block G-code generated and saved to:\n{path}\nContent loaded into editor. Ultrasound state: {new_ultrasound_state}")
-        status_var.set(f"Print Block G-code generated. Ultrasound: {new_ultrasound_state}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Print Block G-code:\n{e}")
-        status_var.set("Error generating Print Block G-code.")
+    layer = next((layer for layer in layers if layer.number == number), None)
+    if layer is None:
+        messagebox.showwarning("Warning", f"Layer {number} not found.")
+        return
 
+    gcode_text_widget.tag_remove('sel', '1.0', 'end')
+    gcode_text_widget.tag_add('sel', f"{layer.first_line}.0",
+                              f"{layer.first_line + layer.line_count}.0")
+    gcode_text_widget.mark_set('insert', f"{layer.first_line}.0")
+    gcode_text_widget.see(f"{layer.first_line}.0")
+    status_var.set(f"Layer {layer.number} at Z{layer.z:.3f}: line {layer.first_line}, {layer.line_count} lines.")
 
-def on_clean_block():
-    """
-    Handles the "Clean Block" button click, generates G-code using
-    clean_block logic, and loads it into the G-code text editor.
-    """
-    if gcode_text_widget is None or status_var is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
+
+def get_profile() -> MachineProfile:
+    """Loads the configured machine profile, or the default limits."""
+    return load_profile(MACHINE_PROFILE)
+
+
+def validate_gcode():
+    """Checks the editor's G-code against the machine profile and lists the problems."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
+        return
+    text = gcode_text_widget.get('1.0', 'end-1c')
+    if not text.strip():
+        messagebox.showwarning("Warning", "No G-code to validate.")
+        status_var.set("Validation cancelled: No G-code.")
         return
+    try:
+        if editor_file is not None:
+            report = validate_file(editor_file, get_profile())
+        else:
+            report = validate_text(text, get_profile())
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Could not load machine profile:\n{e}")
+        status_var.set("Validation failed.")
+        return
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_validation(report))
+    if report.ok:
+        status_var.set(f"Validation passed: {report.lines} lines.")
+    else:
+        status_var.set(f"Validation found problems with {len(report.violations)} rules.")
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode", filetypes=[("G-code Files", "*.gcode"), ("All Files", "*.*")])
-    if not path:
-        status_var.set("Clean Block G-code generation cancelled.")
+
+def plan_feeds():
+    """Rewrites the editor's feeds to what the machine's acceleration allows."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
+        return
+    text = editor_text()
+    if not text.strip():
+        messagebox.showwarning("Warning", "No G-code to plan.")
+        status_var.set("Feed planning cancelled: No G-code.")
+        return
+    try:
+        planned, report = plan_feeds_text(text)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        status_var.set("Feed planning failed.")
         return
+    gcode_text_widget.delete('1.0', 'end')
+    gcode_text_widget.insert('1.0', planned)
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_feed_report(report))
+    status_var.set(f"Feeds planned: {report.changed} of {report.moves} moves lowered.")
+
 
+def plan_rotations():
+    """Merges the editor's A-axis moves and rotates the short way round."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
+        return
+    text = editor_text()
+    if not text.strip():
+        messagebox.showwarning("Warning", "No G-code to plan.")
+        status_var.set("Rotation planning cancelled: No G-code.")
+        return
+    continuous = messagebox.askyesno("Plan Rotations", "Is the A axis continuous (no end stops)?")
     try:
-        temp_gcode_buffer = io.StringIO()
-
-        x_value = 0.0
-        y_value = 0.0
-        z_value = 0.3
-        g0_xy_feed = 5000
-        g1_xy_feed = 1000
-        delay_time = 0.1
-        
-        clean_block(
-            temp_gcode_buffer,
-            x_value,
-            y_value,
-            z_value,
-            g0_xy_feed,
-            g1_xy_feed,
-            delay_time
-        ) 
-
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
-
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
-
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", "Clean Block G-code generated and loaded.")
-        status_var.set("Clean Block G-code generated.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Clean Block G-code:\n{e}")
-        status_var.set("Error generating Clean Block G-code.")
+        planned, report = plan_rotations_text(text, continuous)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        status_var.set("Rotation planning failed.")
+        return
+    gcode_text_widget.delete('1.0', 'end')
+    gcode_text_widget.insert('1.0', planned)
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_rotation_report(report))
+    status_var.set(f"Rotations planned: {report.travel_saved:.1f} deg of A travel saved.")
 
 
-def on_clean_no_tool_block():
-    """
-    Handles the "Clean No Tool Block" button click, generates G-code using
-    clean_no_tool_block logic, and loads it into the G-code text editor.
-    """
-    if gcode_text_widget is None or status_var is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
+def resample_segments():
+    """Merges or slows the editor's short feed segments to the controller's segment rate."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
+        return
+    text = editor_text()
+    if not text.strip():
+        messagebox.showwarning("Warning", "No G-code to resample.")
+        status_var.set("Resampling cancelled: No G-code.")
+        return
+    max_rate = simpledialog.askfloat("Resample Segments", "Segments per second the controller keeps up with:",
+                                     initialvalue=100.0, minvalue=1.0)
+    if max_rate is None:
+        status_var.set("Resampling cancelled by user.")
+        return
+    tolerance = simpledialog.askfloat("Resample Segments", "Largest waveform deviation allowed (mm):",
+                                      initialvalue=0.02, minvalue=0.0)
+    if tolerance is None:
+        status_var.set("Resampling cancelled by user.")
+        return
+    try:
+        resampled, report = resample_text(text, max_rate, tolerance)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        status_var.set("Resampling failed.")
         return
+    gcode_text_widget.delete('1.0', 'end')
+    gcode_text_widget.insert('1.0', resampled)
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_resample_report(report))
+    status_var.set(f"Resampled: peak segment rate {report.peak_rate_before:.0f} -> {report.peak_rate_after:.0f} /s.")
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode")
-    if not path:
-        status_var.set("Clean No Tool Block generation cancelled.")
+
+def schedule_ultrasound():
+    """Switches the editor's ultrasound on and off only at deposit/travel transitions."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
         return
+    text = editor_text()
+    if not text.strip():
+        messagebox.showwarning("Warning", "No G-code to schedule.")
+        status_var.set("Ultrasound scheduling cancelled: No G-code.")
+        return
+    merge_gap = simpledialog.askfloat("Schedule Ultrasound",
+                                      "Keep ultrasound on across travel up to (mm):",
+                                      initialvalue=0.0, minvalue=0.0)
+    if merge_gap is None:
+        status_var.set("Ultrasound scheduling cancelled by user.")
+        return
+    scheduled, report = schedule_ultrasound_text(text, merge_gap)
+    gcode_text_widget.delete('1.0', 'end')
+    gcode_text_widget.insert('1.0', scheduled)
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_ultrasound_report(report))
+    status_var.set(f"Ultrasound scheduled: {report.regions} deposit regions.")
 
-    try:
-        temp_gcode_buffer = io.StringIO()
 
-        x_value = 0.0
-        y_value = 0.0
-        z_value = 0.3
-        z_feed = 800
-        delay_time = 400
+def show_layer_stats():
+    """Shows per-layer lengths, ultrasound calls, dwells and times of the editor's program."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
+        return
+    if editor_file is not None:
+        stats = stats_file(editor_file)
+    else:
+        text = gcode_text_widget.get('1.0', 'end-1c')
+        if not text.strip():
+            messagebox.showwarning("Warning", "No G-code to analyse.")
+            status_var.set("Layer statistics cancelled: No G-code.")
+            return
+        stats = stats_bytes(text.encode("ascii", "replace"))
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_program_stats(stats))
+    status_var.set(f"Layer statistics: {len(stats.layers)} layers, {stats.total.duration:.1f} s estimated.")
 
-        clean_no_tool_block(temp_gcode_buffer, x_value, y_value, z_value, z_feed, delay_time)
+    path = filedialog.asksaveasfilename(title="Save statistics (cancel to skip)", defaultextension=".csv",
+                                        filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json")])
+    if not path:
+        return
+    try:
+        with open(path, 'w', newline='') as destination:
+            write = write_stats_json if path.lower().endswith(".json") else write_stats_csv
+            write(stats, destination)
+        status_var.set(f"Layer statistics saved to {os.path.basename(path)}.")
+    except OSError as e:
+        messagebox.showerror("Error", f"Could not save statistics:\n{e}")
 
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
 
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
+def estimate_cycle_time():
+    """Shows the estimated run time of the editor's program per operation and per layer."""
+    if gcode_text_widget is None or result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "Text areas not initialized.")
+        return
+    if editor_file is not None:
+        report = estimate_file(editor_file)
+    else:
+        text = gcode_text_widget.get('1.0', 'end-1c')
+        if not text.strip():
+            messagebox.showwarning("Warning", "No G-code to estimate.")
+            status_var.set("Cycle time estimate cancelled: No G-code.")
+            return
+        report = estimate_text(text)
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', format_cycle_time(report))
+    status_var.set(f"Estimated cycle time: {report.total.total / 60.0:.1f} min.")
 
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", "Clean No Tool Block G-code generated and loaded.")
-        status_var.set("Clean No Tool Block G-code generated.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Clean No Tool Block G-code:\n{e}")
-        status_var.set("Error generating Clean No Tool Block G-code.")
 
-def on_print_cylinder():
+def show_preview():
     """
-    Handles the "Print Cylinder" button click, generates G-code using print_cylinder logic,
-    and loads it into the G-code text editor.
+    Opens a 2D toolpath preview of the G-code editor contents.
+
+    The program is parsed once; each redraw decimates the selected layers
+    to the canvas resolution before creating canvas items.
     """
     if gcode_text_widget is None or status_var is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
+        messagebox.showerror("Error", "G-code editor not initialized.")
         return
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode")
+    if editor_file is not None:
+        segments = preview_file(editor_file)
+    else:
+        segments = preview_text(gcode_text_widget.get('1.0', 'end-1c'))
+    if len(segments.x0) == 0:
+        messagebox.showwarning("Warning", "No moves to preview.")
+        status_var.set("Preview cancelled: No moves.")
+        return
+
+    window = tk.Toplevel()
+    window.title("Toolpath Preview")
+    window.geometry("700x600")
+    controls = tk.Frame(window)
+    controls.pack(side="top", fill="x", padx=5, pady=5)
+    canvas = tk.Canvas(window, bg="white", highlightthickness=0)
+    canvas.pack(fill="both", expand=True)
+
+    last_layer = len(segments.heights) - 1
+    layer_var = tk.IntVar(value=0)
+    all_layers_var = tk.BooleanVar(value=False)
+    travel_var = tk.BooleanVar(value=True)
+    info_var = tk.StringVar()
+
+    def redraw(*_):
+        started = time.perf_counter()
+        first = 0 if all_layers_var.get() else layer_var.get()
+        last = last_layer if all_layers_var.get() else first
+        selection = select_layers(segments, first, last)
+        if not travel_var.get():
+            selection = selection[~segments.travel[selection]]
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        canvas.delete("all")
+        polylines = decimate(segments, selection, width, height)
+        for travel, coords in polylines:
+            canvas.create_line(coords.tolist(), width=1,
+                               fill=PREVIEW_TRAVEL_COLOR if travel else PREVIEW_DEPOSIT_COLOR)
+        elapsed = (time.perf_counter() - started) * 1000
+        info_var.set(f"Z{segments.heights[first]:.3f}"
+                     + (f"-Z{segments.heights[last]:.3f}" if last != first else "")
+                     + f" | {len(selection)} segments -> {len(polylines)} items | {elapsed:.0f} ms")
+
+    tk.Label(controls, text="Layer:").pack(side="left")
+    tk.Scale(controls, variable=layer_var, from_=0, to=last_layer, orient="horizontal",
+             showvalue=True, length=200, command=redraw).pack(side="left")
+    tk.Checkbutton(controls, text="All layers", variable=all_layers_var, command=redraw).pack(side="left")
+    tk.Checkbutton(controls, text="Travel", variable=travel_var, command=redraw).pack(side="left")
+    tk.Label(controls, textvariable=info_var).pack(side="left", padx=10)
+    canvas.bind("<Configure>", redraw)
+    status_var.set(f"Preview opened: {len(segments.x0)} segments on {last_layer + 1} layers.")
+
+
+def get_verbosity() -> str:
+    """Returns the selected comment level for generated G-code."""
+    return verbosity_option.get() if verbosity_option is not None else "full"
+
+
+def get_pipeline() -> Pipeline:
+    """Builds the configured post-processing pipeline; one per file, as stages keep state."""
+    return load_pipeline(POSTPROCESS_CONFIG)
+
+
+def get_pipeline_config() -> Optional[list]:
+    """Returns the configured pipeline stages, for work that builds its own pipelines."""
+    return read_pipeline_config(POSTPROCESS_CONFIG)
+
+
+def get_output_cache() -> OutputCache:
+    """Returns the shared cache of generated operation output."""
+    global output_cache
+    if output_cache is None:
+        output_cache = OutputCache(max_bytes=OUTPUT_CACHE_MAX_BYTES)
+    return output_cache
+
+
+def cache_summary() -> str:
+    """Describes the hit/miss counters of the output cache."""
+    stats = get_output_cache().stats
+    return f"Cache: {stats.hits} hits, {stats.misses} misses, {stats.evictions} evictions."
+
+
+def generate_operation(operation: str, title: str, result_label: Optional[str] = None,
+                       overrides: Optional[dict] = None):
+    """
+    Asks for a save location, generates the G-code of an operation with its
+    default parameters (with ``overrides`` applied) and the selected
+    waveform, saves it and loads it into the editor. Output for the same operation, parameters and waveform is
+    streamed from the on-disk cache instead of being regenerated.
+    """
+    if gcode_text_widget is None or status_var is None or waveform_option is None:
+        messagebox.showerror("Error", "UI elements not initialized. Please ensure the UI is fully loaded before using this function.")
+        return
+
+    path = filedialog.asksaveasfilename(defaultextension=".gcode",
+                                         filetypes=[("G-code files", "*.gcode"), ("All files", "*.*")])
     if not path:
-        status_var.set("Print Cylinder generation cancelled.")
+        status_var.set(f"{title} G-code generation cancelled.")
         return
 
     try:
-        temp_gcode_buffer = io.StringIO()
-
-        x_center = 10.0
-        y_center = 10.0
-        z_value = 0.3
-        radius = 5.0
-        segments = 36
-        feedrate = 1200
+        parameters = operation_parameters(operation, **(overrides or {}))
+        waveform = waveform_option.get()
+        verbosity = get_verbosity()
 
-        print_cylinder(temp_gcode_buffer, x_center, y_center, z_value, radius, segments, feedrate)
+        def write(destination):
+            # Stream the generator's pieces to the cache file without collecting them first.
+            lines = iter_operation(operation, parameters, waveform, verbosity)
+            destination.writelines(lines)
+            return lines.result
 
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
+        # The cache holds the raw output, so pipeline settings apply to cached programs too.
+        cached_path, result, hit = get_output_cache().get_or_generate(operation, parameters, waveform, write, verbosity)
+        get_pipeline().process_file(cached_path, path)
 
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
+        show_file_in_editor(path, processed=True)
 
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", f"Print Cylinder G-code generated and loaded.")
-        status_var.set("Print Cylinder G-code generated.")
+        source = "loaded from cache" if hit else "generated"
+        detail = f" {result_label}: {result}" if result_label else ""
+        messagebox.showinfo("Success", f"{title} G-code {source} and saved to:\n{path}\nContent loaded into editor.{detail}")
+        status_var.set(f"{title} G-code {source}.{detail} {cache_summary()}")
     except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Print Cylinder G-code:\n{e}")
-        status_var.set("Error generating Print Cylinder G-code.")
+        messagebox.showerror("Error", f"Could not generate/save {title} G-code:\n{e}")
+        status_var.set(f"Error generating {title} G-code.")
 
-def on_print_layer0():
+
+def open_job_builder():
     """
-    Handles the "Print Layer0" button click, generates G-code using
-    print_layer0 logic, and loads it into the G-code text editor.
+    Opens the job builder: an ordered list of operations with editable
+    parameters that can be saved as JSON and run to one output file.
     """
-    if gcode_text_widget is None or status_var is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
+    if status_var is None or waveform_option is None:
+        messagebox.showerror("Error", "UI not fully initialized.")
         return
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode")
-    if not path:
-        status_var.set("Print Layer0 generation cancelled.")
+    job = Job()
+    window = tk.Toplevel()
+    window.title("Job Builder")
+    window.geometry("620x420")
+
+    left = tk.Frame(window)
+    left.pack(side="left", fill="both", expand=True, padx=5, pady=5)
+    steps_list = tk.Listbox(left, font=("Consolas", 10), exportselection=False)
+    steps_list.pack(fill="both", expand=True)
+    parameters_text = Text(left, height=8, font=("Consolas", 9))
+    parameters_text.pack(fill="x", pady=(5, 0))
+
+    right = tk.Frame(window)
+    right.pack(side="right", fill="y", padx=5, pady=5)
+    operation_var = tk.StringVar(value="print_block")
+    ttk.Combobox(right, textvariable=operation_var, values=sorted(OPERATIONS),
+                 state="readonly", width=20).pack(pady=(0, 5))
+
+    def refresh(select: Optional[int] = None):
+        steps_list.delete(0, 'end')
+        for i, step in enumerate(job.steps, 1):
+            tool = f" [{step.tool}]" if step.tool else ""
+            steps_list.insert('end', f"{i}. {step.operation} ({step.waveform}){tool}")
+        if select is not None and job.steps:
+            steps_list.selection_set(select)
+            show_step()
+
+    def selected() -> Optional[int]:
+        selection = steps_list.curselection()
+        return selection[0] if selection else None
+
+    def show_step(*_):
+        index = selected()
+        parameters_text.delete('1.0', 'end')
+        if index is not None:
+            step = job.steps[index]
+            parameters = operation_parameters(step.operation, **step.parameters)
+            parameters_text.insert('1.0', json.dumps(parameters, indent=1))
+
+    def add_step():
+        operation = operation_var.get()
+        tool = tool_selection_var.get() if tool_selection_var is not None else None
+        job.steps.append(JobStep(operation, operation_parameters(operation), waveform_option.get(), tool))
+        refresh(len(job.steps) - 1)
+
+    def apply_parameters():
+        index = selected()
+        if index is None:
+            return
+        try:
+            parameters = json.loads(parameters_text.get('1.0', 'end'))
+            operation_parameters(job.steps[index].operation, **parameters)
+        except (ValueError, TypeError) as e:
+            messagebox.showerror("Error", f"Invalid parameters:\n{e}", parent=window)
+            return
+        job.steps[index].parameters = parameters
+
+    def remove_step():
+        index = selected()
+        if index is not None:
+            del job.steps[index]
+            refresh(min(index, len(job.steps) - 1))
+
+    def move_step(offset: int):
+        index = selected()
+        if index is None or not 0 <= index + offset < len(job.steps):
+            return
+        job.steps[index], job.steps[index + offset] = job.steps[index + offset], job.steps[index]
+        refresh(index + offset)
+
+    def save():
+        path = filedialog.asksaveasfilename(defaultextension=".json", parent=window,
+                                            filetypes=[("Job files", "*.json"), ("All files", "*.*")])
+        if path:
+            save_job(job, path)
+            status_var.set(f"Job saved: {os.path.basename(path)}")
+
+    def load():
+        path = filedialog.askopenfilename(parent=window, filetypes=[("Job files", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            job.steps = load_job(path).steps
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Could not load job:\n{e}", parent=window)
+            return
+        refresh(0)
+
+    def run(multi_tool: bool = False):
+        if not job.steps:
+            messagebox.showwarning("Warning", "The job has no steps.", parent=window)
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".gcode", parent=window,
+                                            filetypes=[("G-code files", "*.gcode"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            started = time.perf_counter()
+            report = None
+            job.verbosity = get_verbosity()
+            with open(path, 'w') as destination:
+                if multi_tool:
+                    report = build_multi_tool_program(job, destination, pipeline=get_pipeline())
+                else:
+                    run_job(job, destination, pipeline=get_pipeline())
+            elapsed = time.perf_counter() - started
+            if gcode_text_widget is not None:
+                show_file_in_editor(path, processed=True)
+            status_var.set(f"Job with {len(job.steps)} steps written to {os.path.basename(path)} in {elapsed:.2f} s.")
+            if report is not None:
+                messagebox.showinfo("Multi-Tool Plan", format_report(report), parent=window)
+        except Exception as e:
+            messagebox.showerror("Error", f"Job failed:\n{e}", parent=window)
+            status_var.set("Job failed.")
+
+    for label, command in (("Add Step", add_step), ("Apply Parameters", apply_parameters),
+                           ("Remove Step", remove_step), ("Move Up", lambda: move_step(-1)),
+                           ("Move Down", lambda: move_step(1)), ("Load Job...", load),
+                           ("Save Job...", save), ("Run Job...", run),
+                           ("Run Multi-Tool...", lambda: run(multi_tool=True))):
+        tk.Button(right, text=label, command=command, width=20).pack(pady=2)
+    steps_list.bind("<<ListboxSelect>>", show_step)
+
+
+def run_parameter_sweep():
+    """Writes every variant of a sweep file's parameter grid to a chosen directory."""
+    if result_text_widget is None or status_var is None:
+        messagebox.showerror("Error", "UI not fully initialized.")
+        return
+    sweep_path = filedialog.askopenfilename(title="Sweep file", filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+    if not sweep_path:
+        status_var.set("Sweep cancelled: no sweep file.")
+        return
+    directory = filedialog.askdirectory(title="Output directory for the variants")
+    if not directory:
+        status_var.set("Sweep cancelled: no output directory.")
         return
-
     try:
-        temp_gcode_buffer = io.StringIO()
-
-        x_start = 0.0
-        y_start = 0.0
-        x_end = 20.0
-        y_end = 0.0
-        z_value = 0.3
-        feedrate = 1000
-
-        print_layer0(temp_gcode_buffer, x_start, y_start, x_end, y_end, z_value, feedrate)
+        sweep = load_sweep(sweep_path)
+        started = time.perf_counter()
+        variants = run_sweep(sweep, directory, pipeline_config=get_pipeline_config())
+        summary = format_sweep(sweep, variants, time.perf_counter() - started)
+    except Exception as e:
+        messagebox.showerror("Error", f"Sweep failed:\n{e}")
+        status_var.set("Sweep failed.")
+        return
+    result_text_widget.delete('1.0', 'end')
+    result_text_widget.insert('1.0', summary + "\n\n" + "\n".join(
+        f"{variant.file}  {json.dumps(variant.parameters)}" for variant in variants))
+    status_var.set(f"Sweep written to {directory}: {summary}")
 
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
 
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
+def show_cache_stats():
+    """Shows the output cache location, size and hit/miss counters."""
+    cache = get_output_cache()
+    messagebox.showinfo("Output Cache", f"Directory: {cache.directory}\n"
+                        f"Size: {cache.size() / 1e6:.1f} MB of {cache.max_bytes / 1e6:.0f} MB\n"
+                        f"{cache_summary()}")
 
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", "Print Layer0 G-code generated and loaded.")
-        status_var.set("Print Layer0 G-code generated.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Print Layer0 G-code:\n{e}")
-        status_var.set("Error generating Print Layer0 G-code.")
 
-def on_rotate():
+def send_to_machine():
     """
-    Handles the "Rotate" button click, generates G-code using rotate logic,
-    and loads it into the G-code text editor.
+    Streams the editor's G-code to a controller in a background thread,
+    with a small window to pause, resume or abort the stream.
     """
     if gcode_text_widget is None or status_var is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
+        messagebox.showerror("Error", "UI not fully initialized.")
         return
-
-    path = filedialog.asksaveasfilename(defaultextension=".gcode")
-    if not path:
-        status_var.set("Rotate G-code generation cancelled.")
+    source = editor_file
+    if source is not None:
+        # Stream the previewed file from its memory map instead of the editor.
+        lines = None
+        total = count_file_lines(source)
+    else:
+        lines = gcode_text_widget.get('1.0', 'end-1c').splitlines()
+        total = len(lines)
+        if not any(line.strip() for line in lines):
+            messagebox.showwarning("Warning", "No G-code to send.")
+            status_var.set("Send cancelled: No G-code.")
+            return
+    try:
+        if source is not None:
+            report = validate_file(source, get_profile())
+        else:
+            report = validate_text('\n'.join(lines), get_profile())
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Error", f"Could not load machine profile:\n{e}")
+        status_var.set("Send cancelled.")
+        return
+    if not report.ok and not messagebox.askyesno(
+            "Send to Machine", format_validation(report) + "\n\nSend anyway?"):
+        status_var.set("Send cancelled: Validation failed.")
+        return
+    endpoint = simpledialog.askstring("Send to Machine", "Controller (host:port or serial port):",
+                                      initialvalue=DEFAULT_CONTROLLER)
+    if not endpoint:
+        status_var.set("Send cancelled by user.")
         return
 
-    try:
-        temp_gcode_buffer = io.StringIO()
+    state = {}
+
+    def keep_sender(sender):
+        state["sender"] = sender
+        state["loop"] = asyncio.get_running_loop()
+
+    def worker():
+        try:
+            program = iter_mapped_lines(source) if source is not None else lines
+            state["stats"] = asyncio.run(stream(endpoint, program, on_sender=keep_sender))
+        except Exception as e:
+            state["error"] = e
+
+    def control(action, *args):
+        if "sender" in state:
+            state["loop"].call_soon_threadsafe(getattr(state["sender"], action), *args)
+
+    window = tk.Toplevel()
+    window.title("Send to Machine")
+    progress_var = tk.StringVar(value=f"Connecting to {endpoint}...")
+    tk.Label(window, textvariable=progress_var, width=50, anchor="w").pack(padx=10, pady=(10, 5))
+    buttons = tk.Frame(window)
+    buttons.pack(pady=(0, 10))
+    for label, command in (("Pause", lambda: control("pause", True)),
+                           ("Resume", lambda: control("resume")),
+                           ("Abort", lambda: control("abort"))):
+        tk.Button(buttons, text=label, command=command, width=10).pack(side="left", padx=3)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    def poll():
+        sender = state.get("sender")
+        if thread.is_alive():
+            if sender is not None:
+                paused = " (paused)" if sender.paused else ""
+                progress_var.set(f"{sender.stats.acknowledged} of {total} lines done{paused}")
+            window.after(100, poll)
+        elif "error" in state:
+            progress_var.set(f"Failed: {state['error']}")
+            status_var.set("Send failed.")
+        else:
+            summary = format_stats(state["stats"])
+            progress_var.set(summary)
+            status_var.set(summary)
 
-        current_angle = 0
-        rotate_by = 90
-        x_value = 10.0
-        y_value = 10.0
-        z_value = 0.3
-        feedrate = 1200
+    poll()
 
-        new_angle = rotate(temp_gcode_buffer, current_angle, rotate_by, x_value, y_value, z_value, feedrate)
 
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
+def on_print_block():
+    """Handles the "Print Block" button click."""
+    generate_operation("print_block", "Print Block", result_label="Ultrasound state")
 
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
 
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", f"Rotate G-code generated and loaded. New angle: {new_angle}")
-        status_var.set(f"Rotate G-code generated. New angle: {new_angle}")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Rotate G-code:\n{e}")
-        status_var.set("Error generating Rotate G-code.")
+def on_print_block_array():
+    """Handles the "Print Block Array" button click."""
+    generate_operation("print_block_array", "Print Block Array", result_label="Blocks")
 
-def on_slicer():
-    global gcode_text_widget, status_var, waveform_option
 
-    if gcode_text_widget is None or status_var is None or waveform_option is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
-        return
+def on_clean_block():
+    """Handles the "Clean Block" button click."""
+    generate_operation("clean_block", "Clean Block")
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode")
-    if not path:
-        status_var.set("Slicer G-code generation cancelled.")
-        return
 
-    try:
-        temp_gcode_buffer = io.StringIO()
-
-        x_min_val = 0.0
-        x_max_val = 20.0
-        y_min_val = 0.0
-        y_max_val = 20.0
-        
-        z_height = 1.5
-        fill_density = 0.8
-        layer_thickness = 0.3
-        nozzle_diameter = 0.4
-        g0_feed = 5000
-        g1_feed = 1000
-        waveform = waveform_option.get()
+def on_clean_no_tool_block():
+    """Handles the "Clean No Tool Block" button click."""
+    generate_operation("clean_no_tool_block", "Clean No Tool Block")
 
-        slicer(
-            destination=temp_gcode_buffer,
-            z_height=z_height,
-            fill_density=fill_density,
-            layer_thickness=layer_thickness,
-            nozzle_diameter=nozzle_diameter,
-            g0_feed=g0_feed,
-            g1_feed=g1_feed,
-            x_min=x_min_val,
-            x_max=x_max_val,
-            y_min=y_min_val,
-            y_max=y_max_val,
-            waveform=waveform
-        )
-
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
-
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
-
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", "Slicer G-code generated and loaded.")
-        status_var.set("Slicer G-code generated.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Slicer G-code:\n{e}")
-        status_var.set("Error generating Slicer G-code.")
 
+def on_print_cylinder():
+    """Handles the "Print Cylinder" button click."""
+    generate_operation("print_cylinder", "Print Cylinder")
 
-def on_print_zigzag():
-    """
-    Handles the "Print ZigZag" button click, generates G-code using
-    print_zigzag logic, and loads it into the G-code text editor.
-    """
-    if gcode_text_widget is None or status_var is None:
-        messagebox.showerror("Error", "G-code text editor or status bar is not initialized.")
-        return
 
-    path = filedialog.asksaveasfilename(defaultextension=".gcode")
-    if not path:
-        status_var.set("Print ZigZag generation cancelled.")
-        return
+def on_print_layer0():
+    """Handles the "Print Layer0" button click."""
+    generate_operation("print_layer0", "Print Layer0")
 
-    try:
-        temp_gcode_buffer = io.StringIO()
 
-        x_start = 0.0
-        x_end = 20.0
-        y_value = 10.0
-        z_value = 0.3
-        passes = 10
-        feedrate = 1000
+def on_rotate():
+    """Handles the "Rotate" button click."""
+    generate_operation("rotate", "Rotate")
 
-        print_zigzag(temp_gcode_buffer, x_start, x_end, y_value, z_value, passes, feedrate)
 
-        gcode_content = temp_gcode_buffer.getvalue()
-        processed_gcode_content = replace_m3_m5(gcode_content)
+def on_slicer():
+    """Handles the "Slicer" button click."""
+    generate_operation("slicer", "Slicer")
 
-        with open(path, 'w') as f:
-            f.write(processed_gcode_content)
 
-        gcode_text_widget.delete('1.0', 'end')
-        gcode_text_widget.insert('1.0', processed_gcode_content)
-        messagebox.showinfo("Success", "Print ZigZag G-code generated and loaded.")
-        status_var.set("Print ZigZag G-code generated.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not generate/save Print ZigZag G-code:\n{e}")
-        status_var.set("Error generating Print ZigZag G-code.")
+def on_slice_stl():
+    """Handles the "Slice STL" button click: slices a mesh into layer contours."""
+    if status_var is None:
+        messagebox.showerror("Error", "UI not fully initialized.")
+        return
+    stl_path = filedialog.askopenfilename(filetypes=[("STL files", "*.stl"), ("All files", "*.*")])
+    if not stl_path:
+        status_var.set("Slice STL cancelled: no mesh.")
+        return
+    generate_operation("slicer", "Slice STL", overrides={"stl_path": stl_path})
+
+
+def on_print_zigzag():
+    """Handles the "Print ZigZag" button click."""
+    generate_operation("print_zigzag", "Print ZigZag")
 
 def on_convert_gcode():
     if status_var is None or waveform_option is None:
@@ -575,20 +951,15 @@ def on_convert_gcode():
     waveform = waveform_option.get()
 
     try:
-        with open(input_path, "r") as infile, open(output_path, "w") as outfile:
-            outfile.write(f"; Converted with {waveform} waveform\n")
-            for line in infile:
-                line = re.sub(r"^\s*M3(\s*;.*)?$", 'M98 P"us.g"\n', line)
-                line = re.sub(r"^\s*M5(\s*;.*)?$", ';M5\n', line)
-                outfile.write(line)
+        pipeline = get_pipeline()
+        pipeline.process_file(input_path, output_path,
+                              header=f"; Converted with {waveform} waveform\n")
 
         messagebox.showinfo("Success", f"Converted G-code written to:\n{output_path}")
-        status_var.set("Conversion completed successfully.")
+        status_var.set(f"Conversion completed successfully ({format_timings(pipeline)}).")
 
         if gcode_text_widget is not None:
-            with open(output_path, "r") as f:
-                gcode_text_widget.delete('1.0', 'end')
-                gcode_text_widget.insert('1.0', f.read())
+            show_file_in_editor(output_path, processed=True)
 
     except Exception as e:
         messagebox.showerror("Error", f"Conversion failed:\n{e}")
@@ -597,7 +968,7 @@ def on_convert_gcode():
 
 def create_ui():
     """Creates and lays out the main UI elements of the application."""
-    global gcode_text_widget, result_text_widget, tool_selection_var, status_var, waveform_option
+    global gcode_text_widget, result_text_widget, tool_selection_var, status_var, waveform_option, verbosity_option
 
     root = tk.Tk()
     root.title("Simplified3D G-code Converter")
@@ -632,17 +1003,36 @@ def create_ui():
     tk.Radiobutton(waveform_frame, text="Saw-tooth", variable=waveform_option, value="sawtooth", bg="#eaeaea").pack(anchor="w")
     tk.Radiobutton(waveform_frame, text="Square wave", variable=waveform_option, value="square", bg="#eaeaea").pack(anchor="w")
 
+    ttk.Label(controls_panel, text="Comments:", font=("Segoe UI", 10, "bold"), background="#eaeaea").pack(anchor="w", padx=5, pady=(0, 2))
+    verbosity_option = tk.StringVar(value="full")
+    verbosity_combo = ttk.Combobox(controls_panel, textvariable=verbosity_option,
+                                   values=list(VERBOSITY_LEVELS), width=10, state="readonly")
+    verbosity_combo.pack(anchor="w", padx=5, pady=(0, 10))
+    show_tooltip(verbosity_combo, "none: no comments; structure: start/end and layer markers; full: everything")
+
     add_button(controls_panel, "Load G-code File", load_gcode_file, "Open a G-code file into the editor")
     add_button(controls_panel, "Save G-code File", save_gcode_file, "Save current G-code editor contents")
-    add_button(controls_panel, "Clear Editor", clear_editor, "Clear all text from the G-code editor", pady_val=(2,10))
+    add_button(controls_panel, "Open Full File", open_full_file, "Load the whole file when the editor shows a preview of a long file")
+    add_button(controls_panel, "Clear Editor", clear_editor, "Clear all text from the G-code editor")
+    add_button(controls_panel, "Send to Machine", send_to_machine, "Stream the editor's G-code to a controller", pady_val=(2,10))
     add_button(controls_panel, "Convert G-code", on_convert_gcode, "Convert input file to output file using selected waveform")
 
     add_button(controls_panel, "Create G-code", create_gcode, "Insert a sample G-code block")
     add_button(controls_panel, "Parse G-code", parse_gcode, "Show all X,Y,Z for loaded G-code")
+    add_button(controls_panel, "Preview Toolpath", show_preview, "Draw the editor's toolpath layer by layer")
+    add_button(controls_panel, "Validate G-code", validate_gcode, "Check the editor's G-code against the machine limits")
+    add_button(controls_panel, "Plan Feeds", plan_feeds, "Lower feeds to what acceleration allows on short segments")
+    add_button(controls_panel, "Plan Rotations", plan_rotations, "Merge A-axis moves and take the shortest direction")
+    add_button(controls_panel, "Resample Segments", resample_segments, "Merge or slow short waveform segments to the controller's segment rate")
+    add_button(controls_panel, "Schedule Ultrasound", schedule_ultrasound, "Switch ultrasound only between travel and deposit; drop idle dwells")
+    add_button(controls_panel, "Layer Stats", show_layer_stats, "Per-layer deposit/travel length, ultrasound calls, dwells and time")
+    add_button(controls_panel, "Estimate Time", estimate_cycle_time, "Cycle time with acceleration, junctions, dwells and A rotations")
+    add_button(controls_panel, "Go to Layer", go_to_layer, "Jump to a layer in the G-code editor")
     add_button(controls_panel, "Clear Results", clear_results, "Clear all text from the results display", pady_val=(2,10))
 
     ttk.Label(controls_panel, text="Operations:", font=("Segoe UI", 10, "bold"), background="#eaeaea").pack(anchor="w", padx=5, pady=(12,2))
     add_button(controls_panel, "Print Block", on_print_block, "Generate Print Block G-code", pady_val=1)
+    add_button(controls_panel, "Print Block Array", on_print_block_array, "Generate an N x M array of blocks", pady_val=1)
     add_button(controls_panel, "Print Cylinder", on_print_cylinder, "Generate Print Cylinder G-code", pady_val=1)
     add_button(controls_panel, "Print ZigZag", on_print_zigzag, "Generate ZigZag pattern G-code", pady_val=1)
     add_button(controls_panel, "Clean Block", on_clean_block, "Generate Clean Block G-code", pady_val=1)
@@ -650,6 +1040,10 @@ def create_ui():
     add_button(controls_panel, "Print Layer0", on_print_layer0, "Generate Layer0 G-code", pady_val=1)
     add_button(controls_panel, "Rotate", on_rotate, "Rotate tool position and emit G-code", pady_val=1)
     add_button(controls_panel, "Slicer", on_slicer, "Run slicer and emit G-code", pady_val=1)
+    add_button(controls_panel, "Slice STL", on_slice_stl, "Slice a binary STL mesh into layer contours", pady_val=1)
+    add_button(controls_panel, "Job Builder", open_job_builder, "Compose operations into one program and run it", pady_val=(10, 1))
+    add_button(controls_panel, "Parameter Sweep", run_parameter_sweep, "Generate every variant of a sweep file's parameter grid", pady_val=1)
+    add_button(controls_panel, "Cache Stats", show_cache_stats, "Show output cache size and hit/miss counts", pady_val=1)
 
     right_frame = tk.Frame(main_frame)
     right_frame.pack(side="left", fill="both", expand=True, padx=(5,10), pady=10)